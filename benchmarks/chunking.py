@@ -0,0 +1,74 @@
+"""
+Chunking throughput and packing quality of the native token-aware chunker
+versus the notebook's LangChain `RecursiveCharacterTextSplitter`.
+
+    python -m benchmarks.chunking                                  # fixture pages
+    python -m benchmarks.chunking --docs data/processed/all_documents.jsonl
+    python -m benchmarks.chunking --docs ... --workers 4
+
+The LangChain side needs the optional `benchmarks` extra
+(`pip install -e .[benchmarks]`); without it only the native chunker runs.
+"""
+import argparse
+import statistics
+import time
+
+from benchmarks.parse_modes import load_fixture_pages, parse_page
+from src.preprocessing.chunk_documents import (
+    CHUNK_TOKENS, chunk_document_langchain, chunk_documents, count_tokens,
+)
+from src.preprocessing.format_documents import FORMATTERS, iter_jsonl
+from src.scraping.reparse import kind_for_url
+
+
+def load_fixture_documents(copies):
+    """
+    Formats the fixture pages into documents, repeated `copies` times.
+    """
+    documents = []
+    for url, html in load_fixture_pages():
+        record = parse_page(url, html, fast=True)
+        documents.append(FORMATTERS[kind_for_url(url)](record))
+    return documents * copies
+
+
+def run(name, chunk_fn, documents):
+    started = time.perf_counter()
+    chunks = [chunk for doc_chunks in chunk_fn(documents) for chunk in doc_chunks]
+    elapsed = time.perf_counter() - started
+
+    # Token counts are measured the same way for both splitters, outside the timing.
+    tokens = [count_tokens(chunk['page_content']) for chunk in chunks]
+    megabytes = sum(len(doc['text'].encode('utf-8')) for doc in documents) / 2**20
+    small = sum(1 for t in tokens if t < CHUNK_TOKENS // 4)
+    print(f"{name:<10} {elapsed:>8.2f} {len(documents) / elapsed:>9.0f} {megabytes / elapsed:>7.2f} "
+          f"{len(chunks):>8} {statistics.mean(tokens):>8.0f} {max(tokens):>7} {small:>7}")
+    return elapsed, len(chunks)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark document chunking")
+    parser.add_argument("--docs", help="all_documents.jsonl to chunk instead of the fixtures")
+    parser.add_argument("--copies", type=int, default=250, help="Fixture repetitions")
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    documents = list(iter_jsonl(args.docs)) if args.docs else load_fixture_documents(args.copies)
+
+    print(f"{len(documents)} documents, native budget {CHUNK_TOKENS} tokens\n")
+    print(f"{'splitter':<10} {'seconds':>8} {'docs/s':>9} {'MB/s':>7} "
+          f"{'chunks':>8} {'mean tok':>8} {'max tok':>7} {'<25%':>7}")
+    native_s, native_n = run("native", lambda docs: chunk_documents(docs, workers=args.workers),
+                             documents)
+    try:
+        langchain_s, langchain_n = run("langchain", lambda docs: map(chunk_document_langchain, docs),
+                                       documents)
+    except ImportError:
+        print("langchain   not installed, skipped")
+        return
+    print(f"\nnative vs langchain: {langchain_s / native_s:.1f}x speedup, "
+          f"{1 - native_n / langchain_n:.0%} fewer chunks")
+
+
+if __name__ == "__main__":
+    main()
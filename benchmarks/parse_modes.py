@@ -0,0 +1,102 @@
+"""
+Per-page parse time and peak memory of the full `html.parser` tree versus the
+lxml + SoupStrainer fast mode, with a check that both modes produce identical
+records. Parity with the parsers from before the fast mode is tested in
+tests/test_parse_parity.py.
+
+    python -m benchmarks.parse_modes                  # fixture pages
+    python -m benchmarks.parse_modes --store data/raw/html --limit 500
+"""
+import argparse
+import contextlib
+import io
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+from src.scraping.crawl import BASE_URL, TARGETS
+from src.scraping.html_store import HtmlStore
+from src.scraping.reparse import kind_for_url
+
+
+FIXTURES_DIR = Path(__file__).resolve().parent / "fixtures" / "pages"
+
+
+def load_fixture_pages(fixtures_dir=FIXTURES_DIR):
+    """
+    Returns (url, html) pairs for the checked-in synthetic fixture pages
+    (see fixtures/README.md). The file stem is the wiki page name, e.g.
+    `Chapter_1050.html`.
+    """
+    return [(BASE_URL + path.stem, path.read_bytes())
+            for path in sorted(Path(fixtures_dir).glob("*.html"))]
+
+
+def load_store_pages(store_dir, limit=None):
+    store = HtmlStore(store_dir)
+    urls = store.urls()[:limit] if limit else store.urls()
+    return [(url, store.read(url)) for url in urls]
+
+
+def parse_page(url, html, fast):
+    parse_fn = TARGETS[kind_for_url(url)][0]
+    # The parsers log progress with print(); keep it out of the timings.
+    with contextlib.redirect_stdout(io.StringIO()):
+        return parse_fn(url, html=html, fast=fast)
+
+
+def time_page(url, html, fast, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        parse_page(url, html, fast)
+        timings.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    parse_page(url, html, fast)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return statistics.median(timings), peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark parse modes")
+    parser.add_argument("--store", help="Use pages from a raw HTML store instead of fixtures")
+    parser.add_argument("--limit", type=int, help="Max pages taken from the store")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    pages = load_store_pages(args.store, args.limit) if args.store else load_fixture_pages()
+
+    mismatches = []
+    totals = {'full': 0.0, 'fast': 0.0}
+    print(f"{'page':<40} {'KB':>7} {'full ms':>9} {'fast ms':>9} {'speedup':>8} "
+          f"{'full MB':>8} {'fast MB':>8}")
+    for url, html in pages:
+        if parse_page(url, html, fast=False) != parse_page(url, html, fast=True):
+            mismatches.append(url)
+
+        full_s, full_peak = time_page(url, html, False, args.repeat)
+        fast_s, fast_peak = time_page(url, html, True, args.repeat)
+        totals['full'] += full_s
+        totals['fast'] += fast_s
+        print(f"{url.rsplit('/', 1)[-1][:40]:<40} {len(html) / 1024:>7.0f} "
+              f"{full_s * 1000:>9.2f} {fast_s * 1000:>9.2f} {full_s / fast_s:>7.1f}x "
+              f"{full_peak / 2**20:>8.1f} {fast_peak / 2**20:>8.1f}")
+
+    print(f"\n{len(pages)} pages: full {len(pages) / totals['full']:.1f} pages/s, "
+          f"fast {len(pages) / totals['fast']:.1f} pages/s "
+          f"({totals['full'] / totals['fast']:.1f}x)")
+
+    if mismatches:
+        print(f"PARITY FAILED for {len(mismatches)} pages:")
+        for url in mismatches:
+            print(f"  {url}")
+        sys.exit(1)
+    print("Parity OK: fast mode output is identical on every page.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,379 @@
+"""
+Offline benchmark suite over the fixture pages: parse, format, chunk, dedup,
+embed, and exact / BM25 search on synthetic corpora of several sizes.
+
+Every stage runs in its own subprocess so its peak RSS is its own. Results
+are compared against `benchmarks/baseline.json`; a throughput drop or a
+latency / memory increase beyond the tolerance is reported as a regression.
+A stage is only compared when it ran with the baseline's settings (e.g.
+--copies for the corpus stages).
+
+    python -m benchmarks.run                          # all stages, compare to baseline
+    python -m benchmarks.run --stages parse chunk     # a subset
+    python -m benchmarks.run --sizes 10000 100000     # search corpus sizes
+    python -m benchmarks.run --check                  # exit 1 on regressions
+    python -m benchmarks.run --save-baseline          # record a new baseline
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+from benchmarks.parse_modes import load_fixture_pages, parse_page
+from src.preprocessing.format_documents import FORMATTERS
+from src.scraping.reparse import kind_for_url
+
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+BASELINE_PATH = BENCHMARKS_DIR / "baseline.json"
+STAGES = ['parse', 'format', 'chunk', 'dedup', 'embed', 'exact_search', 'bm25_search']
+SEARCH_SIZES = [10000, 50000, 100000]
+TOLERANCE = 0.25
+# Latency changes smaller than this are timer noise, not regressions.
+MIN_DELTA_MS = 0.5
+QUERIES = 200
+WARMUP_QUERIES = 10
+DIM = 384
+# Synthetic corpora are generated this many rows at a time.
+BLOCK_ROWS = 10000
+# The settings each stage's numbers depend on; a stage is only compared with
+# a baseline recorded with the same values.
+STAGE_SETTINGS = {
+    'parse': ('repeat',),
+    'format': ('copies',),
+    'chunk': ('copies',),
+    'dedup': ('copies',),
+    'embed': ('copies',),
+    'exact_search': ('sizes',),
+    'bm25_search': ('sizes',),
+}
+
+
+def _mb(n_bytes):
+    return n_bytes / 2**20
+
+
+def _latencies(fn, queries):
+    for query in queries[:WARMUP_QUERIES]:
+        fn(query)
+    timings = []
+    for query in queries:
+        started = time.perf_counter()
+        fn(query)
+        timings.append(time.perf_counter() - started)
+    timings = np.asarray(timings) * 1000
+    return float(np.percentile(timings, 50)), float(np.percentile(timings, 99))
+
+
+def _records():
+    return [(kind_for_url(url), parse_page(url, html, fast=True)) for url, html in load_fixture_pages()]
+
+
+def _documents(copies):
+    documents = [FORMATTERS[kind](record) for kind, record in _records()]
+    return [dict(doc, metadata=dict(doc['metadata'], url=f"{doc['metadata']['url']}#{i}"))
+            for i in range(copies) for doc in documents]
+
+
+def _paragraphs(copies):
+    return [{'page_content': paragraph,
+             'metadata': {'url': doc['metadata']['url'], 'token_count': len(paragraph) // 4}}
+            for doc in _documents(copies) for paragraph in doc['text'].split("\n\n") if paragraph]
+
+
+def bench_parse(args):
+    pages = load_fixture_pages()
+    results = {}
+    for fast, mode in ((True, 'fast'), (False, 'full')):
+        by_kind = {}
+        for url, html in pages:
+            timings = []
+            for _ in range(args.repeat):
+                started = time.perf_counter()
+                parse_page(url, html, fast)
+                timings.append(time.perf_counter() - started)
+            seconds, count, size = by_kind.get(kind_for_url(url), (0.0, 0, 0))
+            by_kind[kind_for_url(url)] = (seconds + float(np.median(timings)), count + 1,
+                                          size + len(html))
+        for kind, (seconds, count, _) in by_kind.items():
+            results[f"{mode}_{kind}_pages_per_s"] = count / seconds
+        seconds = sum(s for s, _, _ in by_kind.values())
+        results[f"{mode}_pages_per_s"] = sum(c for _, c, _ in by_kind.values()) / seconds
+        results[f"{mode}_mb_per_s"] = _mb(sum(b for _, _, b in by_kind.values())) / seconds
+    return results
+
+
+def bench_format(args):
+    records = _records() * args.copies
+    started = time.perf_counter()
+    documents = [FORMATTERS[kind](record) for kind, record in records]
+    seconds = time.perf_counter() - started
+    size = sum(len(doc['text'].encode('utf-8')) for doc in documents)
+    return {'docs_per_s': len(documents) / seconds, 'mb_per_s': _mb(size) / seconds}
+
+
+def bench_chunk(args):
+    from src.preprocessing.chunk_documents import chunk_documents, get_encoding
+    try:
+        get_encoding()
+    except Exception as e:
+        return {'skipped': f"tokenizer unavailable ({type(e).__name__})"}
+    documents = _documents(args.copies)
+    started = time.perf_counter()
+    chunks = [chunk for doc_chunks in chunk_documents(documents) for chunk in doc_chunks]
+    seconds = time.perf_counter() - started
+    size = sum(len(doc['text'].encode('utf-8')) for doc in documents)
+    return {'docs_per_s': len(documents) / seconds, 'mb_per_s': _mb(size) / seconds,
+            'chunks_per_s': len(chunks) / seconds}
+
+
+def bench_dedup(args):
+    from src.preprocessing.dedup import dedup_chunks
+    chunks = _paragraphs(args.copies)
+    started = time.perf_counter()
+    unique, _ = dedup_chunks(chunks)
+    seconds = time.perf_counter() - started
+    return {'chunks_per_s': len(chunks) / seconds, 'unique_fraction': len(unique) / len(chunks)}
+
+
+def bench_embed(args):
+    from src.embeddings.backends import HashingBackend
+    texts = [chunk['page_content'] for chunk in _paragraphs(args.copies)]
+    backend = HashingBackend(DIM)
+    started = time.perf_counter()
+    for i in range(0, len(texts), backend.batch_size):
+        backend.embed(texts[i:i + backend.batch_size])
+    seconds = time.perf_counter() - started
+    size = sum(len(text.encode('utf-8')) for text in texts)
+    return {'texts_per_s': len(texts) / seconds, 'mb_per_s': _mb(size) / seconds}
+
+
+def bench_exact_search(args):
+    from src.retrieval.exact import ExactSearch
+    rng = np.random.default_rng(0)
+    results = {}
+    for size in args.sizes:
+        vectors = np.empty((size, DIM), dtype=np.float16)
+        for start in range(0, size, BLOCK_ROWS):
+            block = rng.standard_normal((min(BLOCK_ROWS, size - start), DIM), dtype=np.float32)
+            vectors[start:start + len(block)] = block / np.linalg.norm(block, axis=1, keepdims=True)
+        search = ExactSearch(vectors, rng.integers(0, 3, size, dtype=np.uint8),
+                             rng.integers(1, 1100, size).astype(np.int32),
+                             ['chapter', 'episode', 'character'])
+        queries = rng.standard_normal((QUERIES, DIM), dtype=np.float32)
+        p50, p99 = _latencies(lambda q: search.search(q, 10), queries)
+        results[f"n{size}_p50_ms"], results[f"n{size}_p99_ms"] = p50, p99
+        p50, p99 = _latencies(lambda q: search.search(q, 10, source_types={'chapter'},
+                                                      number_range=(1000, 1100)), queries)
+        results[f"n{size}_filtered_p50_ms"], results[f"n{size}_filtered_p99_ms"] = p50, p99
+    return results
+
+
+def bench_bm25_search(args):
+    from src.retrieval.bm25 import BM25Builder, tokenize
+    # Synthetic documents drawn from the fixture vocabulary with Zipf-like
+    # term frequencies, so postings lengths look like real text.
+    vocabulary = sorted({token for chunk in _paragraphs(1) for token in tokenize(chunk['page_content'])})
+    vocabulary += [str(n) for n in range(1, 1200)]
+    rng = np.random.default_rng(0)
+    weights = 1.0 / np.arange(1, len(vocabulary) + 1)
+    weights /= weights.sum()
+    results = {}
+    for size in args.sizes:
+        builder = BM25Builder()
+        seconds = 0.0
+        for start in range(0, size, BLOCK_ROWS):
+            texts = [" ".join(vocabulary[t] for t in row) for row in
+                     rng.choice(len(vocabulary), size=(min(BLOCK_ROWS, size - start), 120), p=weights)]
+            started = time.perf_counter()
+            for text in texts:
+                builder.add(text)
+            seconds += time.perf_counter() - started
+        started = time.perf_counter()
+        index = builder.build()
+        results[f"n{size}_build_docs_per_s"] = size / (seconds + time.perf_counter() - started)
+        queries = [" ".join(vocabulary[t] for t in rng.choice(len(vocabulary), 4))
+                   for _ in range(QUERIES)]
+        p50, p99 = _latencies(lambda q: index.search(q, 10), queries)
+        results[f"n{size}_p50_ms"], results[f"n{size}_p99_ms"] = p50, p99
+    return results
+
+
+BENCHMARKS = {
+    'parse': bench_parse,
+    'format': bench_format,
+    'chunk': bench_chunk,
+    'dedup': bench_dedup,
+    'embed': bench_embed,
+    'exact_search': bench_exact_search,
+    'bm25_search': bench_bm25_search,
+}
+
+
+def run_stage(stage, args):
+    """
+    Runs one stage in a fresh interpreter and returns its metrics, including
+    the subprocess's peak RSS.
+    """
+    with tempfile.TemporaryDirectory() as tmp:
+        out = Path(tmp) / "result.json"
+        command = [sys.executable, "-m", "benchmarks.run", "--_stage", stage, "--_out", str(out),
+                   "--copies", str(args.copies), "--repeat", str(args.repeat),
+                   "--sizes", *map(str, args.sizes)]
+        subprocess.run(command, check=True, cwd=BENCHMARKS_DIR.parent)
+        with open(out, "r", encoding="utf-8") as f:
+            return json.load(f)
+
+
+def _run_in_process(stage, args, out):
+    started = time.perf_counter()
+    metrics = BENCHMARKS[stage](args)
+    metrics['seconds'] = time.perf_counter() - started
+    # ru_maxrss is KB on Linux and bytes on macOS
+    scale = 1 if sys.platform == "darwin" else 1024
+    metrics['peak_rss_mb'] = _mb(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale)
+    with open(out, "w", encoding="utf-8") as f:
+        json.dump(metrics, f)
+
+
+def lower_is_better(metric):
+    return metric.endswith("_ms") or metric.endswith("rss_mb")
+
+
+def is_compared(metric):
+    """
+    Throughput, latency and memory metrics are compared with the baseline;
+    ratios such as `unique_fraction` and the stage's wall time are not.
+    """
+    return metric.endswith("_per_s") or lower_is_better(metric)
+
+
+def mismatched_settings(stage, settings, baseline_settings):
+    """
+    Returns the settings `stage` depends on that differ from the baseline's,
+    as {name: (baseline, current)}.
+    """
+    return {name: (baseline_settings.get(name), settings.get(name))
+            for name in STAGE_SETTINGS.get(stage, ())
+            if baseline_settings.get(name) != settings.get(name)}
+
+
+def _setting(value):
+    return " ".join(map(str, value)) if isinstance(value, list) else value
+
+
+def compare(results, baseline, tolerance=TOLERANCE):
+    """
+    Returns (stage, metric, baseline, current, relative change, regressed)
+    rows for the compared metrics present in both runs. Changes are signed
+    so that positive is better; latency changes under MIN_DELTA_MS never
+    count as regressions.
+    """
+    rows = []
+    for stage, metrics in results.items():
+        for metric, value in metrics.items():
+            old = baseline.get(stage, {}).get(metric)
+            if not is_compared(metric) or not isinstance(value, (int, float)) \
+                    or not isinstance(old, (int, float)) or not old:
+                continue
+            change = (old - value) / old if lower_is_better(metric) else (value - old) / old
+            regressed = change < -tolerance
+            if metric.endswith("_ms") and value - old < MIN_DELTA_MS:
+                regressed = False
+            rows.append((stage, metric, old, value, change, regressed))
+    return rows
+
+
+def machine_info():
+    return {'python': platform.python_version(), 'platform': platform.platform(),
+            'processor': platform.processor(), 'cpus': os.cpu_count()}
+
+
+def print_results(results):
+    for stage, metrics in results.items():
+        print(f"\n{stage}")
+        for metric, value in metrics.items():
+            print(f"  {metric:<32} {value:>12.2f}" if isinstance(value, float)
+                  else f"  {metric:<32} {value!s:>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the offline benchmark suite")
+    parser.add_argument("--stages", nargs="+", choices=STAGES, default=STAGES)
+    parser.add_argument("--sizes", nargs="+", type=int, default=SEARCH_SIZES,
+                        help="Synthetic corpus sizes for the search stages")
+    parser.add_argument("--copies", type=int, default=50, help="Fixture repetitions per stage")
+    parser.add_argument("--repeat", type=int, default=5, help="Parses per fixture page (median is used)")
+    parser.add_argument("--baseline", default=str(BASELINE_PATH))
+    parser.add_argument("--tolerance", type=float, default=TOLERANCE)
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--out", help="Also write the results JSON here")
+    parser.add_argument("--check", action="store_true", help="Exit 1 on regressions")
+    parser.add_argument("--_stage", help=argparse.SUPPRESS)
+    parser.add_argument("--_out", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args._stage:
+        _run_in_process(args._stage, args, args._out)
+        return
+
+    results = {}
+    for stage in args.stages:
+        print(f"Running {stage}...", flush=True)
+        results[stage] = run_stage(stage, args)
+    print_results(results)
+
+    report = {'machine': machine_info(), 'settings': {'copies': args.copies, 'repeat': args.repeat,
+                                                       'sizes': args.sizes}, 'results': results}
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nSaved baseline to {args.baseline}")
+        return
+
+    if not Path(args.baseline).exists():
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline to record one.")
+        return
+    with open(args.baseline, "r", encoding="utf-8") as f:
+        baseline = json.load(f)
+    if baseline.get('machine') != report['machine']:
+        print("\nNote: the baseline was recorded on a different machine:", baseline.get('machine'))
+    comparable = {}
+    for stage, metrics in results.items():
+        mismatched = mismatched_settings(stage, report['settings'], baseline.get('settings', {}))
+        if mismatched:
+            used = [(f"--{name} {_setting(old)}", f"--{name} {_setting(new)}")
+                    for name, (old, new) in mismatched.items()]
+            print(f"\nNot comparing {stage}: the baseline used {', '.join(old for old, _ in used)}, "
+                  f"this run {', '.join(new for _, new in used)}")
+        else:
+            comparable[stage] = metrics
+    if not comparable:
+        print("\nNothing to compare; rerun with the baseline's settings.")
+        if args.check:
+            sys.exit(1)
+        return
+    rows = compare(comparable, baseline['results'], args.tolerance)
+    print(f"\n{'stage':<14} {'metric':<32} {'baseline':>10} {'current':>10} {'change':>8}")
+    for stage, metric, old, value, change, regressed in rows:
+        flag = "  REGRESSION" if regressed else ""
+        print(f"{stage:<14} {metric:<32} {old:>10.2f} {value:>10.2f} {change:>+8.0%}{flag}")
+    regressions = [row for row in rows if row[-1]]
+    print(f"\n{len(regressions)} regressions beyond {args.tolerance:.0%}")
+    if regressions and args.check:
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -9,5 +9,10 @@ setup(
         'requests',
         'beautifulsoup4',
         'python-dateutil',
+        'numpy',
     ],
+    extras_require={
+        # only benchmarks/chunking.py's comparison with the notebook splitter
+        'benchmarks': ['langchain-text-splitters'],
+    },
 )
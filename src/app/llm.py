@@ -0,0 +1,106 @@
+import asyncio
+import re
+
+
+SYSTEM_PROMPT = (
+    "You are a One Piece expert. Answer the question using only the numbered wiki "
+    "excerpts provided. Cite the excerpts you use as [n]. If the excerpts do not "
+    "contain the answer, say so."
+)
+
+_SENTENCE = re.compile(r"(?<=[.!?])\s+")
+
+
+class FakeLLM:
+    """
+    Local stand-in for a chat model, for offline runs and load tests.
+
+    Streams the first sentences of the first context excerpt back word by
+    word, after `first_token_delay` seconds and then at `tokens_per_second`,
+    so time-to-first-token and streaming behave like a remote model without
+    a network call.
+
+    Args:
+        first_token_delay (float): Seconds before the first token.
+        tokens_per_second (float): Streaming rate after the first token.
+        max_tokens (int): Tokens per answer.
+    """
+
+    remote = False
+
+    def __init__(self, first_token_delay=0.2, tokens_per_second=100.0, max_tokens=60):
+        self.first_token_delay = first_token_delay
+        self.tokens_per_second = tokens_per_second
+        self.max_tokens = max_tokens
+        self.name = "fake"
+
+    @staticmethod
+    def _answer(messages):
+        prompt = messages[-1]['content']
+        # skip the "[1] title (url)" header line of the first excerpt
+        excerpt = prompt.split("[1]", 1)[1].split("\n", 1)[-1] if "[1]" in prompt else prompt
+        sentences = _SENTENCE.split(excerpt.strip())
+        return " ".join(sentences[:3]) + " [1]"
+
+    async def stream(self, messages):
+        await asyncio.sleep(self.first_token_delay)
+        interval = 1.0 / self.tokens_per_second if self.tokens_per_second else 0
+        for i, word in enumerate(self._answer(messages).split()[:self.max_tokens]):
+            if i and interval:
+                await asyncio.sleep(interval)
+            yield word if i == 0 else " " + word
+
+
+class OpenAIChat:
+    """
+    OpenAI chat completions, streamed. The async client is created on first
+    use and reads OPENAI_API_KEY from the environment (or a .env file) unless
+    `api_key` is given.
+
+    Args:
+        model (str): Chat model name.
+        temperature (float): Sampling temperature.
+        max_tokens (int): Completion token limit.
+        api_key (str): API key override.
+    """
+
+    remote = True
+
+    def __init__(self, model="gpt-4o-mini", temperature=0.0, max_tokens=512, api_key=None):
+        self.model = model
+        self.name = f"openai/{model}"
+        self.temperature = temperature
+        self.max_tokens = max_tokens
+        self.api_key = api_key
+        self._client = None
+
+    def _load(self):
+        if self._client is None:
+            from dotenv import load_dotenv
+            from openai import AsyncOpenAI
+            load_dotenv()
+            self._client = AsyncOpenAI(api_key=self.api_key) if self.api_key else AsyncOpenAI()
+        return self._client
+
+    async def stream(self, messages):
+        response = await self._load().chat.completions.create(
+            model=self.model, messages=messages, temperature=self.temperature,
+            max_tokens=self.max_tokens, stream=True)
+        async for chunk in response:
+            if chunk.choices and chunk.choices[0].delta.content:
+                yield chunk.choices[0].delta.content
+
+
+LLMS = {
+    'fake': FakeLLM,
+    'openai': OpenAIChat,
+}
+
+
+def get_llm(name, **kwargs):
+    """
+    Creates an LLM client by name: 'fake' or 'openai'.
+    """
+    if name not in LLMS:
+        raise ValueError(f"Unknown LLM '{name}', expected one of {sorted(LLMS)}")
+    return LLMS[name](**kwargs)
@@ -0,0 +1,399 @@
+import argparse
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from src.app.llm import LLMS, SYSTEM_PROMPT, get_llm
+from src.app.snapshot import open_snapshot
+from src.embeddings.backends import BACKENDS, get_backend
+from src.embeddings.cache import text_hash
+from src.embeddings.store import DEFAULT_STORE_DIR, EmbeddingStore
+from src.instrumentation import metrics, profiling
+from src.instrumentation.profiling import SlowestProfiles
+from src.retrieval.answer_cache import AnswerCache
+from src.retrieval.bm25 import DEFAULT_BM25_DIR, BM25Index, hybrid_search
+from src.retrieval.context import CONTEXT_TOKENS, pack_context
+from src.retrieval.entities import DEFAULT_ENTITY_PATH, EntityIndex
+from src.retrieval.exact import ExactSearch
+
+
+# Longest a query embedding waits for others to share its backend call.
+BATCH_WINDOW = 0.005
+MAX_BATCH = 64
+
+
+class QueryBatcher:
+    """
+    Coalesces concurrent query embeddings into one backend call.
+
+    The first query of a batch starts a `window`-second timer; every query
+    arriving before it fires (up to `max_batch`) joins the same
+    `backend.embed()` call, which runs on `executor` so the event loop keeps
+    serving.
+
+    Args:
+        backend: An embedding backend (see `src.embeddings.backends`).
+        executor (Executor): Where backend calls run.
+        window (float): Seconds to wait for more queries.
+        max_batch (int): Flush as soon as this many queries are waiting.
+    """
+
+    def __init__(self, backend, executor, window=BATCH_WINDOW, max_batch=MAX_BATCH):
+        self.backend = backend
+        self.executor = executor
+        self.window = window
+        self.max_batch = max_batch
+        self._pending = []
+        self._timer = None
+        self.stats = {'queries': 0, 'batches': 0}
+
+    async def embed(self, text):
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((text, future))
+        self.stats['queries'] += 1
+        if len(self._pending) >= self.max_batch:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+        return await future
+
+    def _flush(self):
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        batch, self._pending = self._pending, []
+        if not batch:
+            return
+        self.stats['batches'] += 1
+        texts = [text for text, _ in batch]
+        metrics.count("embed.texts", len(texts), backend=self.backend.name)
+        call = asyncio.get_running_loop().run_in_executor(self.executor, self._embed, texts)
+        call.add_done_callback(lambda done: self._resolve(batch, done))
+
+    def _embed(self, texts):
+        with metrics.timer("embed.batch_seconds", backend=self.backend.name):
+            return self.backend.embed(texts)
+
+    @staticmethod
+    def _resolve(batch, done):
+        error = done.exception()
+        for i, (_, future) in enumerate(batch):
+            if future.done():
+                continue
+            if error is not None:
+                future.set_exception(error)
+            else:
+                future.set_result(np.asarray(done.result()[i], dtype=np.float32))
+
+
+def build_messages(query, context):
+    """
+    Chat messages for a query and its packed context (see `pack_context`).
+    """
+    return [
+        {'role': 'system', 'content': SYSTEM_PROMPT},
+        {'role': 'user', 'content': f"Excerpts:\n{context['text']}\n\nQuestion: {query}"},
+    ]
+
+
+class RagService:
+    """
+    Asyncio front end: structured lookup, answer cache, retrieval, streamed
+    generation.
+
+    The answer cache is consulted between embedding and search, so a hit
+    costs one (batched) embedding and no retrieval.
+
+    `ask()` is an async generator of events, so a UI can render the sources
+    and each token as soon as they exist:
+
+    - {'type': 'sources', 'rows': [...], 'urls': [...], 'citations': [...]}
+    - {'type': 'token', 'text': ...}
+    - {'type': 'done', 'source': 'entities' | 'cache' | 'llm', 'timings': {...}}
+
+    Query embeddings are micro-batched across concurrent requests (see
+    QueryBatcher); vector and BM25 search run on a thread pool, where the
+    NumPy kernels release the GIL.
+
+    Args:
+        store (EmbeddingStore): Chunks and vectors.
+        backend: Query embedding backend; must match `store.model`.
+        llm: Client with an async `stream(messages)` (see `src.app.llm`).
+        dense: ExactSearch or AnnIndex over the store; exact by default.
+        bm25 (BM25Index): Lexical index for hybrid retrieval, or None.
+        entities (EntityIndex): Structured answers, or None.
+        answer_cache (AnswerCache): Semantic answer cache, or None.
+        k (int): Chunks retrieved per query; overlapping ones are merged
+            and the result packed into `context_tokens`.
+        context_tokens (int): Token budget of the prompt context.
+        candidates (int): Results per engine before fusion.
+        workers (int): Search / embedding threads.
+        profiles (SlowestProfiles): Profiles the retrieval and packing of
+            each query, keeping the slowest; off by default.
+    """
+
+    def __init__(self, store, backend, llm, dense=None, bm25=None, entities=None,
+                 answer_cache=None, k=8, candidates=50, context_tokens=CONTEXT_TOKENS, workers=4,
+                 profiles=None):
+        if backend.name != store.model:
+            raise ValueError(f"Backend '{backend.name}' does not match store model '{store.model}'")
+        self.store = store
+        self.backend = backend
+        self.llm = llm
+        self.dense = dense if dense is not None else ExactSearch.from_store(store)
+        self.bm25 = bm25
+        self.entities = entities
+        self.answer_cache = answer_cache
+        self.k = k
+        self.candidates = candidates
+        self.context_tokens = context_tokens
+        self.profiles = profiles if profiles is not None else SlowestProfiles()
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="rag")
+        self.batcher = QueryBatcher(backend, self.executor)
+
+    def close(self):
+        self.executor.shutdown(wait=False)
+
+    def _search(self, query, vector, source_types=None, number_range=None):
+        if self.bm25 is not None:
+            fused = hybrid_search(query, vector, self.bm25, self.dense, k=self.k,
+                                  candidates=self.candidates, source_types=source_types,
+                                  number_range=number_range)
+            return [row for row, _ in fused], [score for _, score in fused]
+        scores, rows = self.dense.search(vector, self.k, source_types=source_types,
+                                         number_range=number_range)
+        found = rows[0] >= 0
+        return [int(row) for row in rows[0][found]], [float(score) for score in scores[0][found]]
+
+    def _context(self, query, vector, source_types=None, number_range=None):
+        with self.profiles.profile(query):
+            rows, scores = self._search(query, vector, source_types, number_range)
+            chunks = [self.store.chunk(row) for row in rows]
+            return rows, chunks, pack_context(chunks, scores, rows, max_tokens=self.context_tokens)
+
+    async def retrieve(self, query, vector=None, source_types=None, number_range=None):
+        """
+        Returns (query vector, store rows, packed context) for a query.
+        """
+        if vector is None:
+            vector = await self.batcher.embed(query)
+        rows, _, context = await asyncio.get_running_loop().run_in_executor(
+            self.executor, self._context, query, vector, source_types, number_range)
+        return vector, rows, context
+
+    async def ask(self, query, source_types=None, number_range=None):
+        """
+        Answers a query as a stream of events (see the class docstring).
+        """
+        started = time.perf_counter()
+        timings = {}
+
+        def elapsed():
+            return time.perf_counter() - started
+
+        if self.entities is not None:
+            answer = self.entities.answer(query)
+            if answer is not None:
+                timings['first_token'] = timings['total'] = elapsed()
+                yield {'type': 'token', 'text': answer}
+                _record_timings('entities', timings)
+                yield {'type': 'done', 'source': 'entities', 'timings': timings}
+                return
+
+        vector = await self.batcher.embed(query)
+        timings['embedding'] = elapsed()
+
+        if self.answer_cache is not None:
+            cached = self.answer_cache.get(query, vector)
+            if cached is not None:
+                yield {'type': 'sources', 'rows': cached['chunk_ids'],
+                       'urls': [citation['url'] for citation in cached['citations']],
+                       'citations': cached['citations']}
+                timings['first_token'] = timings['total'] = elapsed()
+                yield {'type': 'token', 'text': cached['answer']}
+                _record_timings('cache', timings)
+                yield {'type': 'done', 'source': 'cache', 'timings': timings}
+                return
+
+        rows, chunks, context = await asyncio.get_running_loop().run_in_executor(
+            self.executor, self._context, query, vector, source_types, number_range)
+        timings['retrieval'] = elapsed()
+
+        yield {'type': 'sources', 'rows': rows,
+               'urls': [citation['url'] for citation in context['citations']],
+               'citations': context['citations']}
+
+        generation_started = time.perf_counter()
+        parts = []
+        async for token in self.llm.stream(build_messages(query, context)):
+            if not parts:
+                timings['first_token'] = elapsed()
+            parts.append(token)
+            yield {'type': 'token', 'text': token}
+        timings['total'] = elapsed()
+
+        if self.answer_cache is not None and parts:
+            self.answer_cache.put(query, vector, "".join(parts), rows,
+                                  [text_hash(chunk['page_content']) for chunk in chunks],
+                                  cost=time.perf_counter() - generation_started,
+                                  citations=context['citations'])
+        _record_timings('llm', timings)
+        yield {'type': 'done', 'source': 'llm', 'timings': timings}
+
+    async def answer(self, query, **filters):
+        """
+        Collects `ask()` into (answer text, urls, done event).
+        """
+        parts, urls, done = [], [], None
+        async for event in self.ask(query, **filters):
+            if event['type'] == 'token':
+                parts.append(event['text'])
+            elif event['type'] == 'sources':
+                urls = event['urls']
+            else:
+                done = event
+        return "".join(parts), urls, done
+
+
+def _record_timings(source, timings):
+    """
+    Records a finished request: its count and the time from its start to
+    each step (embedding, retrieval, first_token, total) by answer source.
+    """
+    metrics.count("service.requests", source=source)
+    for step, seconds in timings.items():
+        metrics.observe("service.elapsed_seconds", seconds, source=source, step=step)
+
+
+def _percentiles(values):
+    if not values:
+        return {'p50': None, 'p99': None}
+    values = np.asarray(values) * 1000
+    return {'p50': float(np.percentile(values, 50)), 'p99': float(np.percentile(values, 99))}
+
+
+async def load_test(service, queries, requests=200, concurrency=16):
+    """
+    Runs `requests` questions (cycling through `queries`) from `concurrency`
+    concurrent clients.
+
+    Returns:
+        dict: Throughput, time-to-first-token and total latency percentiles
+            (ms), answer sources and embedding batch statistics.
+    """
+    first_token, total, sources = [], [], {}
+    counter = iter(range(requests))
+
+    async def client():
+        for i in counter:
+            _, _, done = await service.answer(queries[i % len(queries)])
+            first_token.append(done['timings'].get('first_token', done['timings']['total']))
+            total.append(done['timings']['total'])
+            sources[done['source']] = sources.get(done['source'], 0) + 1
+
+    started = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    batches = service.batcher.stats
+    return {
+        'requests': requests,
+        'concurrency': concurrency,
+        'seconds': elapsed,
+        'requests_per_second': requests / elapsed,
+        'first_token_ms': _percentiles(first_token),
+        'total_ms': _percentiles(total),
+        'sources': sources,
+        'embedding_batches': batches['batches'],
+        'mean_batch_size': batches['queries'] / batches['batches'] if batches['batches'] else 0,
+    }
+
+
+def sample_questions(store, count=50, seed=0):
+    """
+    Questions built from store titles, for offline load tests.
+    """
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(store), size=min(count, len(store)), replace=False)
+    return [f"What happens in {store.string('title', int(row))}?" for row in rows]
+
+
+def build_service(args):
+    if args.snapshot:
+        snapshot = open_snapshot(args.snapshot)
+        store, backend, bm25, entities = snapshot.store, snapshot.backend(), snapshot.bm25, snapshot.entities
+    else:
+        store = EmbeddingStore(args.store)
+        kwargs = {'model' if args.backend == 'openai' else 'model_name': args.model} if args.model else {}
+        backend = get_backend(args.backend, **kwargs)
+        bm25 = BM25Index.load(args.bm25) if Path(args.bm25, "meta.json").exists() else None
+        entities = EntityIndex(args.entities) if Path(args.entities).exists() else None
+    cache = AnswerCache(store.dim) if args.answer_cache else None
+    return RagService(store, backend, get_llm(args.llm), bm25=bm25, entities=entities,
+                      answer_cache=cache, k=args.k, context_tokens=args.context_tokens, workers=args.workers,
+                      profiles=profiling.from_args(args))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ask questions or load-test the RAG service")
+    parser.add_argument("question", nargs="?", help="Question to answer (streamed to stdout)")
+    parser.add_argument("--snapshot", metavar="ROOT",
+                        help="Serve the current snapshot under ROOT (see src.app.snapshot) "
+                             "instead of --store/--bm25/--entities/--backend")
+    parser.add_argument("--store", default=str(DEFAULT_STORE_DIR))
+    parser.add_argument("--bm25", default=str(DEFAULT_BM25_DIR))
+    parser.add_argument("--entities", default=str(DEFAULT_ENTITY_PATH))
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="hashing")
+    parser.add_argument("--model", help="Model name for the sentence-transformers/openai backends")
+    parser.add_argument("--llm", choices=sorted(LLMS), default="fake")
+    parser.add_argument("--answer-cache", action="store_true")
+    parser.add_argument("--k", type=int, default=8)
+    parser.add_argument("--context-tokens", type=int, default=CONTEXT_TOKENS)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--load-test", type=int, metavar="REQUESTS",
+                        help="Run this many sampled questions instead of one question")
+    parser.add_argument("--concurrency", type=int, default=16)
+    metrics.add_arguments(parser)
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+    metrics.start(args)
+
+    service = build_service(args)
+
+    async def ask():
+        async for event in service.ask(args.question):
+            if event['type'] == 'token':
+                print(event['text'], end="", flush=True)
+            elif event['type'] == 'done':
+                timings = {name: f"{value * 1000:.0f} ms" for name, value in event['timings'].items()}
+                print(f"\n\n({event['source']}: {timings})")
+            else:
+                print("Sources:\n" + "\n".join(f"  {url}" for url in event['urls']) + "\n")
+
+    try:
+        if args.load_test:
+            report = asyncio.run(load_test(service, sample_questions(service.store),
+                                           args.load_test, args.concurrency))
+            print(f"{report['requests']} requests, concurrency {report['concurrency']}: "
+                  f"{report['requests_per_second']:.1f} req/s")
+            print(f"  first token ms: p50 {report['first_token_ms']['p50']:.1f}, "
+                  f"p99 {report['first_token_ms']['p99']:.1f}")
+            print(f"  total ms:       p50 {report['total_ms']['p50']:.1f}, "
+                  f"p99 {report['total_ms']['p99']:.1f}")
+            print(f"  sources: {report['sources']}; {report['embedding_batches']} embedding batches "
+                  f"(mean size {report['mean_batch_size']:.1f})")
+        elif args.question:
+            asyncio.run(ask())
+        else:
+            parser.error("give a question or --load-test")
+    finally:
+        service.close()
+    metrics.finish(args, command="service")
+    profiling.finish(service.profiles, args)
+
+
+if __name__ == "__main__":
+    main()
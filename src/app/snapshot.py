@@ -0,0 +1,402 @@
+import argparse
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+import time
+from pathlib import Path
+
+from src.embeddings.backends import get_backend
+from src.embeddings.store import DEFAULT_STORE_DIR, EmbeddingStore
+from src.retrieval.bm25 import DEFAULT_BM25_DIR, BM25Index, index_meta, index_store, indexed_rows
+from src.retrieval.entities import DEFAULT_ENTITY_PATH, EntityIndex
+from src.retrieval.exact import ExactSearch
+
+
+ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_SNAPSHOT_ROOT = ROOT / "data" / "serving"
+FORMAT_VERSION = 1
+CURRENT_FILE = "CURRENT"
+MANIFEST_FILE = "manifest.json"
+# Versions kept by `build_snapshot`, the current one included.
+KEEP_VERSIONS = 3
+
+# Cold-start probe, run in a fresh interpreter by `measure_cold_start`.
+PROBE = """
+import asyncio, json, sys, time
+started = time.perf_counter()
+from src.app.llm import FakeLLM
+from src.app.service import RagService
+from src.app.snapshot import open_snapshot
+imported = time.perf_counter()
+mode, root, query = sys.argv[1:4]
+snapshot = open_snapshot(root)
+if mode == "rebuild":
+    from src.retrieval.bm25 import index_store
+    store = snapshot.store
+    bm25, _ = index_store(store)
+else:
+    store, bm25 = snapshot.store, snapshot.bm25
+service = RagService(store, snapshot.backend(), FakeLLM(), dense=snapshot.dense, bm25=bm25,
+                     entities=snapshot.entities, workers=1)
+opened = time.perf_counter()
+asyncio.run(service.retrieve(query))
+answered = time.perf_counter()
+service.close()
+print(json.dumps({"import_ms": (imported - started) * 1000, "open_ms": (opened - imported) * 1000,
+                  "first_query_ms": (answered - opened) * 1000}))
+"""
+
+
+def backend_for_model(model):
+    """
+    Creates the embedding backend named by a store's `model`, e.g.
+    'hashing-384' or 'sentence-transformers/all-MiniLM-L6-v2'.
+    """
+    if model.startswith("hashing-"):
+        return get_backend('hashing', dim=int(model.split("-", 1)[1]))
+    if model.startswith("sentence-transformers/"):
+        return get_backend('sentence-transformers', model_name=model.split("/", 1)[1])
+    if model.startswith("openai/"):
+        return get_backend('openai', model=model.split("/", 1)[1])
+    raise ValueError(f"No embedding backend for model '{model}'")
+
+
+def _write_text(path, text):
+    tmp_path = Path(str(path) + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp_path, path)
+
+
+def list_versions(root=DEFAULT_SNAPSHOT_ROOT):
+    """
+    Returns the complete snapshot versions under `root`, oldest first.
+    """
+    root = Path(root)
+    if not root.exists():
+        return []
+    # `.<version>.tmp` directories are builds in progress
+    return sorted(path.name for path in root.iterdir()
+                  if path.is_dir() and not path.name.startswith(".") and (path / MANIFEST_FILE).exists())
+
+
+def current_version(root=DEFAULT_SNAPSHOT_ROOT):
+    path = Path(root) / CURRENT_FILE
+    if not path.exists():
+        return None
+    return path.read_text(encoding="utf-8").strip() or None
+
+
+def activate(root, version):
+    """
+    Points CURRENT at `version`. The pointer is swapped atomically, so a
+    reader sees either the old version or the new one.
+    """
+    root = Path(root)
+    if not (root / version / MANIFEST_FILE).exists():
+        raise ValueError(f"No snapshot '{version}' in {root}")
+    _write_text(root / CURRENT_FILE, version + "\n")
+
+
+def prune(root=DEFAULT_SNAPSHOT_ROOT, keep=KEEP_VERSIONS):
+    """
+    Deletes the oldest versions beyond `keep`, never the current one.
+
+    Returns:
+        list: The deleted versions.
+    """
+    current = current_version(root)
+    versions = [version for version in list_versions(root) if version != current]
+    room = keep - 1 if current is not None else keep
+    stale = versions[:max(0, len(versions) - room)]
+    for version in stale:
+        shutil.rmtree(Path(root) / version)
+    return stale
+
+
+def _file_sizes(directory):
+    return {str(path.relative_to(directory)): path.stat().st_size
+            for path in sorted(Path(directory).rglob("*")) if path.is_file()}
+
+
+def build_snapshot(root=DEFAULT_SNAPSHOT_ROOT, store_dir=DEFAULT_STORE_DIR, bm25_dir=DEFAULT_BM25_DIR,
+                   entities_path=DEFAULT_ENTITY_PATH, ann_dir=None, ann_kind=None,
+                   activate_version=True, keep=KEEP_VERSIONS):
+    """
+    Writes a new serving snapshot: one versioned directory with everything a
+    query needs, opened by `open_snapshot` without rebuilding anything.
+
+    Layout of `<root>/<version>/`:
+
+    - `store/`: a copy of the embedding store (memory-mapped vectors and
+      chunk metadata columns);
+    - `bm25/`: the lexical index, copied when `bm25_dir` was built from
+      exactly this store (same checksum), extended with the missing rows
+      when its indexed texts match a prefix of the store, and built from
+      the store otherwise;
+    - `entities.sqlite`: the entity index, if `entities_path` exists;
+    - `ann/`: the `ann_kind` ANN index from `ann_dir`, if given;
+    - `manifest.json`: version, model, row count, store checksum, the
+      components present and every file's size; written last.
+
+    The store is copied rather than linked because `EmbeddingStore.append`
+    writes in place. The directory is assembled under a temporary name and
+    renamed, then CURRENT is switched, so readers never see a partial
+    snapshot.
+
+    Returns:
+        str: The new version, `<YYYYmmdd-HHMMSS>-<store checksum prefix>`.
+    """
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    source = EmbeddingStore(store_dir)
+    if not source.verify():
+        raise ValueError(f"{store_dir} does not match its manifest checksum")
+
+    checksum = source.manifest['checksum']
+    version = f"{time.strftime('%Y%m%d-%H%M%S')}-{checksum[:8]}"
+    tmp_dir = root / f".{version}.tmp"
+    if tmp_dir.exists():
+        shutil.rmtree(tmp_dir)
+    tmp_dir.mkdir()
+
+    shutil.copytree(store_dir, tmp_dir / "store", ignore=shutil.ignore_patterns("*.tmp"))
+    store = EmbeddingStore(tmp_dir / "store")
+
+    indexed = -1
+    if bm25_dir is not None and Path(bm25_dir, "meta.json").exists():
+        with open(Path(bm25_dir, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        indexed = indexed_rows(meta, store)
+    if indexed == len(store) and meta.get('store_checksum') == checksum:
+        shutil.copytree(bm25_dir, tmp_dir / "bm25")
+    else:
+        previous = BM25Index.load(bm25_dir, mmap=False) if indexed >= 0 else None
+        bm25, _ = index_store(store, previous)
+        bm25.save(tmp_dir / "bm25", **index_meta(store))
+
+    components = {'store': True, 'bm25': True, 'entities': False, 'ann': None}
+    if entities_path is not None and Path(entities_path).exists():
+        shutil.copy2(entities_path, tmp_dir / "entities.sqlite")
+        components['entities'] = True
+    if ann_dir is not None:
+        from src.retrieval.ann import index_paths
+        (tmp_dir / "ann").mkdir()
+        for path in index_paths(ann_dir, ann_kind):
+            shutil.copy2(path, tmp_dir / "ann" / Path(path).name)
+        components['ann'] = ann_kind
+
+    manifest = {
+        'format_version': FORMAT_VERSION,
+        'version': version,
+        'created': time.strftime("%Y-%m-%dT%H:%M:%S"),
+        'model': store.model,
+        'dim': store.dim,
+        'count': len(store),
+        'store_checksum': checksum,
+        'components': components,
+        'files': _file_sizes(tmp_dir),
+    }
+    with open(tmp_dir / MANIFEST_FILE, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+
+    os.replace(tmp_dir, root / version)
+    if activate_version:
+        activate(root, version)
+        prune(root, keep)
+    return version
+
+
+class Snapshot:
+    """
+    Read-only view of one snapshot version.
+
+    Components are opened on first access and then kept: the store and
+    BM25 arrays are memory-mapped, so opening costs a few small JSON reads
+    and the pages are shared through the OS page cache with every other
+    process serving the same version. All attributes are safe to share
+    between threads (and Streamlit sessions) of one process.
+
+    Args:
+        path (str | Path): The version directory.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path / MANIFEST_FILE, "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        if self.manifest['format_version'] != FORMAT_VERSION:
+            raise ValueError(f"{self.path} has snapshot format {self.manifest['format_version']}, "
+                             f"expected {FORMAT_VERSION}")
+        self.version = self.manifest['version']
+        self._components = {}
+        # re-entrant: opening `dense` opens `store`
+        self._lock = threading.RLock()
+
+    def _get(self, name, open_component):
+        with self._lock:
+            if name not in self._components:
+                self._components[name] = open_component()
+            return self._components[name]
+
+    @property
+    def store(self):
+        return self._get('store', lambda: EmbeddingStore(self.path / "store"))
+
+    @property
+    def bm25(self):
+        return self._get('bm25', lambda: BM25Index.load(self.path / "bm25"))
+
+    @property
+    def entities(self):
+        if not self.manifest['components']['entities']:
+            return None
+        return self._get('entities', lambda: EntityIndex(self.path / "entities.sqlite"))
+
+    @property
+    def dense(self):
+        """
+        The ANN index when the snapshot has one, exact search otherwise.
+        """
+        kind = self.manifest['components']['ann']
+        if kind is None:
+            return self._get('dense', lambda: ExactSearch.from_store(self.store))
+
+        def open_ann():
+            from src.retrieval.ann import AnnIndex
+            return AnnIndex(self.path / "ann", kind, store=self.store)
+        return self._get('dense', open_ann)
+
+    def backend(self):
+        """
+        A new query embedding backend matching the snapshot's model.
+        """
+        return backend_for_model(self.manifest['model'])
+
+    def verify(self):
+        """
+        Returns True if every file has its manifest size and the vectors
+        match the store checksum.
+        """
+        files = _file_sizes(self.path)
+        files.pop(MANIFEST_FILE, None)
+        return files == self.manifest['files'] and self.store.verify()
+
+    def close(self):
+        with self._lock:
+            entities = self._components.pop('entities', None)
+        if entities is not None:
+            entities.close()
+
+
+_open_snapshots = {}
+_open_lock = threading.Lock()
+
+
+def open_snapshot(root=DEFAULT_SNAPSHOT_ROOT, version=None):
+    """
+    Returns the Snapshot for `version` (CURRENT by default), shared by every
+    caller in the process: reruns and sessions reuse the open store and
+    indexes instead of reloading them. After CURRENT moves, the next call
+    returns the new version; callers holding the old one keep working.
+    """
+    root = Path(root)
+    version = version or current_version(root)
+    if version is None:
+        raise FileNotFoundError(f"No current snapshot in {root}; build one first")
+    path = (root / version).resolve()
+    with _open_lock:
+        snapshot = _open_snapshots.get(path)
+        if snapshot is None:
+            snapshot = _open_snapshots[path] = Snapshot(path)
+        return snapshot
+
+
+def measure_cold_start(root=DEFAULT_SNAPSHOT_ROOT, query="Who is Roronoa Zoro?", modes=("snapshot",),
+                       repeat=3):
+    """
+    Times a cold start in fresh interpreters: importing the service,
+    opening the snapshot and the first retrieval (embedding, search and
+    context packing). Mode 'rebuild' builds the BM25 index from the store
+    instead of loading it, as an app without a prebuilt index would.
+
+    Returns:
+        dict: mode -> median {'import_ms', 'open_ms', 'first_query_ms',
+            'process_ms'} over `repeat` runs; process_ms includes
+            interpreter start-up.
+    """
+    results = {}
+    for mode in modes:
+        runs = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            output = subprocess.run([sys.executable, "-c", PROBE, mode, str(root), query],
+                                    check=True, capture_output=True, text=True, cwd=ROOT).stdout
+            run = json.loads(output.strip().splitlines()[-1])
+            run['process_ms'] = (time.perf_counter() - started) * 1000
+            runs.append(run)
+        results[mode] = {key: sorted(run[key] for run in runs)[len(runs) // 2] for key in runs[0]}
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and manage versioned serving snapshots")
+    parser.add_argument("--root", default=str(DEFAULT_SNAPSHOT_ROOT))
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    build = commands.add_parser("build", help="Snapshot the current store and indexes")
+    build.add_argument("--store", default=str(DEFAULT_STORE_DIR))
+    build.add_argument("--bm25", default=str(DEFAULT_BM25_DIR))
+    build.add_argument("--entities", default=str(DEFAULT_ENTITY_PATH))
+    build.add_argument("--ann", help="ANN index directory to include")
+    build.add_argument("--ann-kind", default="ivfpq")
+    build.add_argument("--no-activate", action="store_true", help="Build without switching CURRENT")
+    build.add_argument("--keep", type=int, default=KEEP_VERSIONS)
+
+    commands.add_parser("list", help="List versions")
+    use = commands.add_parser("activate", help="Point CURRENT at a version (e.g. to roll back)")
+    use.add_argument("version")
+    commands.add_parser("verify", help="Check the current snapshot's files and checksum")
+
+    bench = commands.add_parser("bench", help="Measure import time and time-to-first-query")
+    bench.add_argument("--query", default="Who is Roronoa Zoro?")
+    bench.add_argument("--repeat", type=int, default=3)
+    bench.add_argument("--compare-rebuild", action="store_true",
+                       help="Also time building the BM25 index at start-up")
+    args = parser.parse_args()
+
+    if args.command == "build":
+        started = time.perf_counter()
+        version = build_snapshot(args.root, args.store, args.bm25, args.entities, args.ann,
+                                 args.ann_kind, activate_version=not args.no_activate, keep=args.keep)
+        manifest = Snapshot(Path(args.root) / version).manifest
+        size = sum(manifest['files'].values()) / 2**20
+        print(f"Built snapshot {version}: {manifest['count']} rows of {manifest['model']}, "
+              f"{size:.1f} MB in {time.perf_counter() - started:.1f}s"
+              + ("" if args.no_activate else " (current)"))
+    elif args.command == "list":
+        current = current_version(args.root)
+        for version in list_versions(args.root):
+            print(("* " if version == current else "  ") + version)
+    elif args.command == "activate":
+        activate(args.root, args.version)
+        print(f"Current snapshot: {args.version}")
+    elif args.command == "verify":
+        snapshot = open_snapshot(args.root)
+        ok = snapshot.verify()
+        print(f"{snapshot.version}: {'ok' if ok else 'CORRUPT'}")
+        sys.exit(0 if ok else 1)
+    else:
+        modes = ("snapshot", "rebuild") if args.compare_rebuild else ("snapshot",)
+        results = measure_cold_start(args.root, args.query, modes, args.repeat)
+        print(f"{'mode':<10} {'import ms':>10} {'open ms':>10} {'1st query ms':>13} {'process ms':>11}")
+        for mode, result in results.items():
+            print(f"{mode:<10} {result['import_ms']:>10.1f} {result['open_ms']:>10.1f} "
+                  f"{result['first_query_ms']:>13.1f} {result['process_ms']:>11.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,133 @@
+import re
+import zlib
+
+import numpy as np
+
+
+_WORD = re.compile(r"[a-z0-9]+")
+
+
+class HashingBackend:
+    """
+    Deterministic local embedding for offline runs and tests.
+
+    Lowercased word unigrams and bigrams are hashed (CRC32) into `dim` signed
+    buckets, i.e. a sparse random projection of the bag of words, and the
+    result is L2-normalized. No model download, same vectors on every machine.
+
+    Args:
+        dim (int): Embedding dimension.
+    """
+
+    remote = False
+    batch_size = 1024
+    max_batch_tokens = None
+
+    def __init__(self, dim=384):
+        self.dim = dim
+        self.name = f"hashing-{dim}"
+
+    def _embed_one(self, text):
+        words = _WORD.findall(text.lower())
+        features = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+        vector = np.zeros(self.dim, dtype=np.float32)
+        if not features:
+            return vector
+        hashes = np.fromiter((zlib.crc32(f.encode('utf-8')) for f in features),
+                             dtype=np.uint32, count=len(features))
+        signs = np.where(hashes & 0x80000000, -1.0, 1.0).astype(np.float32)
+        np.add.at(vector, hashes % self.dim, signs)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def embed(self, texts):
+        return np.vstack([self._embed_one(text) for text in texts]) if texts else \
+            np.empty((0, self.dim), dtype=np.float32)
+
+
+class SentenceTransformerBackend:
+    """
+    Local sentence-transformers model, imported and loaded on first use.
+
+    Args:
+        model_name (str): Hugging Face model id.
+        device (str): Torch device, or None to let the library choose.
+    """
+
+    remote = False
+    batch_size = 64
+    max_batch_tokens = None
+
+    def __init__(self, model_name="all-MiniLM-L6-v2", device=None):
+        self.model_name = model_name
+        self.name = f"sentence-transformers/{model_name}"
+        self.device = device
+        self._model = None
+        self.dim = None
+
+    def _load(self):
+        if self._model is None:
+            from sentence_transformers import SentenceTransformer
+            self._model = SentenceTransformer(self.model_name, device=self.device)
+            self.dim = self._model.get_sentence_embedding_dimension()
+        return self._model
+
+    def embed(self, texts):
+        vectors = self._load().encode(list(texts), batch_size=self.batch_size,
+                                      normalize_embeddings=True, show_progress_bar=False)
+        return np.asarray(vectors, dtype=np.float32)
+
+
+class OpenAIBackend:
+    """
+    OpenAI embeddings API. The client is created on first use and reads
+    OPENAI_API_KEY from the environment (or a .env file) unless `api_key`
+    is given.
+
+    Args:
+        model (str): Embedding model name.
+        api_key (str): API key override.
+    """
+
+    remote = True
+    batch_size = 256
+    # Well under the per-request token limit of the embeddings endpoint.
+    max_batch_tokens = 100000
+
+    def __init__(self, model="text-embedding-3-small", api_key=None):
+        self.model = model
+        self.name = f"openai/{model}"
+        self.api_key = api_key
+        self._client = None
+        self.dim = None
+
+    def _load(self):
+        if self._client is None:
+            from dotenv import load_dotenv
+            from openai import OpenAI
+            load_dotenv()
+            self._client = OpenAI(api_key=self.api_key) if self.api_key else OpenAI()
+        return self._client
+
+    def embed(self, texts):
+        response = self._load().embeddings.create(input=list(texts), model=self.model)
+        data = sorted(response.data, key=lambda item: item.index)
+        vectors = np.asarray([item.embedding for item in data], dtype=np.float32)
+        self.dim = vectors.shape[1]
+        return vectors
+
+
+BACKENDS = {
+    'hashing': HashingBackend,
+    'sentence-transformers': SentenceTransformerBackend,
+    'openai': OpenAIBackend,
+}
+
+
+def get_backend(name, **kwargs):
+    """
+    Creates a backend by name: 'hashing', 'sentence-transformers' or 'openai'.
+    """
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown embedding backend '{name}', expected one of {sorted(BACKENDS)}")
+    return BACKENDS[name](**kwargs)
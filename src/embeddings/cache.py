@@ -0,0 +1,98 @@
+import hashlib
+import sqlite3
+import threading
+from pathlib import Path
+
+import numpy as np
+
+
+ROOT = Path(__file__).resolve().parents[2]
+EMBEDDINGS_PATH = ROOT / "data" / "embeddings"
+DEFAULT_CACHE_PATH = EMBEDDINGS_PATH / "cache.sqlite"
+
+# Stay below SQLite's limit on bound parameters per statement.
+_MAX_PARAMS = 500
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class EmbeddingCache:
+    """
+    On-disk embedding cache keyed by (model, SHA-256 of the text).
+
+    Vectors are stored as float32 blobs in a single SQLite table (WAL mode),
+    so a re-run only embeds texts it has never seen for that model, and
+    results survive crashes mid-run.
+
+    Args:
+        path (str | Path): SQLite file.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH):
+        self.path = Path(path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " model TEXT NOT NULL, text_hash TEXT NOT NULL, dim INTEGER NOT NULL,"
+            " vector BLOB NOT NULL, PRIMARY KEY (model, text_hash)) WITHOUT ROWID")
+        self._conn.commit()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def count(self, model):
+        with self._lock:
+            return self._conn.execute(
+                "SELECT COUNT(*) FROM embeddings WHERE model = ?", (model,)).fetchone()[0]
+
+    def _select(self, columns, model, hashes):
+        rows = []
+        hashes = list(hashes)
+        with self._lock:
+            for i in range(0, len(hashes), _MAX_PARAMS):
+                batch = hashes[i:i + _MAX_PARAMS]
+                placeholders = ",".join("?" * len(batch))
+                rows.extend(self._conn.execute(
+                    f"SELECT {columns} FROM embeddings"
+                    f" WHERE model = ? AND text_hash IN ({placeholders})",
+                    [model] + batch))
+        return rows
+
+    def existing(self, model, hashes):
+        """
+        Returns the subset of `hashes` already cached for `model`.
+        """
+        return {row[0] for row in self._select("text_hash", model, hashes)}
+
+    def get_many(self, model, hashes):
+        """
+        Returns {text_hash: float32 vector} for the cached subset of `hashes`.
+        """
+        return {h: np.frombuffer(blob, dtype=np.float32)
+                for h, blob in self._select("text_hash, vector", model, hashes)}
+
+    def put_many(self, model, hashes, vectors):
+        """
+        Stores one vector per hash and commits.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32)
+        rows = [(model, h, vectors.shape[1], vector.tobytes())
+                for h, vector in zip(hashes, vectors)]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (model, text_hash, dim, vector)"
+                " VALUES (?, ?, ?, ?)", rows)
+            self._conn.commit()
@@ -0,0 +1,224 @@
+import argparse
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+
+import numpy as np
+
+from src.embeddings.backends import BACKENDS, get_backend
+from src.embeddings.cache import DEFAULT_CACHE_PATH, EmbeddingCache, text_hash
+from src.instrumentation import metrics
+from src.preprocessing.format_documents import PROCESSED_DATA_PATH, iter_jsonl
+from src.scraping.ratelimit import TokenBucket, backoff_delay
+
+
+# Chunks looked up in the cache per query while streaming.
+LOOKUP_SIZE = 512
+
+
+def default_chunks_path(processed_dir=PROCESSED_DATA_PATH):
+    """
+    The deduplicated chunks when the pipeline produced them, else all chunks.
+    """
+    unique = Path(processed_dir) / "unique_chunks.jsonl"
+    return unique if unique.exists() else Path(processed_dir) / "all_chunks.jsonl"
+
+
+def _chunk_tokens(chunk):
+    return chunk['metadata'].get('token_count') or len(chunk['page_content']) // 4
+
+
+def iter_batches(chunks, batch_size, max_batch_tokens=None):
+    """
+    Groups chunks into batches capped by count and, optionally, by tokens.
+    """
+    batch = []
+    tokens = 0
+    for chunk in chunks:
+        chunk_tokens = _chunk_tokens(chunk)
+        if batch and (len(batch) >= batch_size or
+                      (max_batch_tokens and tokens + chunk_tokens > max_batch_tokens)):
+            yield batch
+            batch, tokens = [], 0
+        batch.append(chunk)
+        tokens += chunk_tokens
+    if batch:
+        yield batch
+
+
+class Embedder:
+    """
+    Streams chunks through an embedding backend, embedding only what the
+    cache does not already hold for that model.
+
+    Chunks are read lazily, checked against the cache in groups, and the
+    misses are sent to the backend in batches on a pool of threads (network
+    bound for API backends). At most `2 * workers` batches are in flight, so
+    memory stays flat however large the input is.
+
+    Args:
+        backend: An embedding backend (see `src.embeddings.backends`).
+        cache (EmbeddingCache): Vector cache.
+        workers (int): Concurrent batches.
+        rate (float): Backend requests per second, or None for no limit.
+        batch_size (int): Texts per request; the backend default if None.
+        max_retries (int): Retries per failed batch, with exponential backoff.
+    """
+
+    def __init__(self, backend, cache, workers=1, rate=None, batch_size=None, max_retries=3):
+        self.backend = backend
+        self.cache = cache
+        self.workers = max(1, workers)
+        self.batch_size = batch_size or backend.batch_size
+        self.max_retries = max_retries
+        self.rate_limiter = TokenBucket(rate, capacity=self.workers) if rate else None
+        self.stats = {'chunks': 0, 'cached': 0, 'embedded': 0, 'requests': 0, 'retries': 0}
+        self._stats_lock = threading.Lock()
+
+    def _embed_batch(self, batch):
+        texts = [chunk['page_content'] for chunk in batch]
+        attempt = 0
+        while True:
+            if self.rate_limiter:
+                self.rate_limiter.acquire()
+            try:
+                with metrics.timer("embed.batch_seconds", backend=self.backend.name):
+                    vectors = self.backend.embed(texts)
+                break
+            except Exception:
+                metrics.count("embed.errors", backend=self.backend.name)
+                if attempt >= self.max_retries:
+                    raise
+                time.sleep(backoff_delay(attempt))
+                attempt += 1
+                with self._stats_lock:
+                    self.stats['retries'] += 1
+        metrics.count("embed.texts", len(texts), backend=self.backend.name)
+        return [text_hash(text) for text in texts], vectors
+
+    def _uncached(self, chunks):
+        model = self.backend.name
+        seen = set()
+        group = []
+
+        def misses():
+            existing = self.cache.existing(model, (h for h, _ in group))
+            for h, chunk in group:
+                if h in existing:
+                    self.stats['cached'] += 1
+                elif h not in seen:
+                    seen.add(h)
+                    yield chunk
+
+        for chunk in chunks:
+            self.stats['chunks'] += 1
+            group.append((text_hash(chunk['page_content']), chunk))
+            if len(group) >= LOOKUP_SIZE:
+                yield from misses()
+                group = []
+        yield from misses()
+
+    def run(self, chunks, progress=True):
+        """
+        Makes sure every chunk has a cached embedding.
+
+        Returns:
+            dict: Counts of chunks seen, cache hits, texts embedded, requests.
+        """
+        from tqdm import tqdm
+
+        model = self.backend.name
+        batches = iter_batches(self._uncached(chunks), self.batch_size,
+                               self.backend.max_batch_tokens)
+        bar = tqdm(desc=f"Embedding ({model})", unit="chunk", disable=not progress)
+
+        def store(futures):
+            for future in futures:
+                hashes, vectors = future.result()
+                self.cache.put_many(model, hashes, vectors)
+                self.stats['embedded'] += len(hashes)
+                self.stats['requests'] += 1
+                bar.update(len(hashes))
+
+        pending = set()
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            for batch in batches:
+                if len(pending) >= 2 * self.workers:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    store(done)
+                pending.add(pool.submit(self._embed_batch, batch))
+            store(pending)
+        bar.close()
+        return dict(self.stats)
+
+
+def iter_chunk_vectors(chunks, backend, cache, group_size=LOOKUP_SIZE):
+    """
+    Yields (chunk, vector) for chunks whose embedding is cached, in input order.
+    """
+    group = []
+
+    def emit():
+        hashes = [text_hash(chunk['page_content']) for chunk in group]
+        vectors = cache.get_many(backend.name, hashes)
+        for chunk, h in zip(group, hashes):
+            vector = vectors.get(h)
+            if vector is not None:
+                yield chunk, vector
+
+    for chunk in chunks:
+        group.append(chunk)
+        if len(group) >= group_size:
+            yield from emit()
+            group = []
+    yield from emit()
+
+
+@metrics.timed("embed.query_seconds")
+def embed_query(text, backend, cache=None):
+    """
+    Embeds one query string. A vector already cached for the same text is
+    reused, but query vectors are never written to the cache, which holds
+    the chunk embeddings and would otherwise grow with every question.
+    """
+    if cache is not None:
+        cached = cache.get_many(backend.name, [text_hash(text)])
+        if cached:
+            return next(iter(cached.values()))
+    return np.asarray(backend.embed([text])[0], dtype=np.float32)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embed chunks into the embedding cache")
+    parser.add_argument("--input", help="Chunks JSONL (default: unique_chunks.jsonl or all_chunks.jsonl)")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="hashing")
+    parser.add_argument("--model", help="Model name for the sentence-transformers/openai backends")
+    parser.add_argument("--cache", default=str(DEFAULT_CACHE_PATH))
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--rate", type=float, help="Requests per second (API backends)")
+    parser.add_argument("--batch-size", type=int)
+    metrics.add_arguments(parser)
+    args = parser.parse_args()
+    metrics.start(args)
+
+    kwargs = {}
+    if args.model:
+        kwargs['model' if args.backend == 'openai' else 'model_name'] = args.model
+    backend = get_backend(args.backend, **kwargs)
+    path = args.input or default_chunks_path()
+
+    started = time.perf_counter()
+    with EmbeddingCache(args.cache) as cache:
+        embedder = Embedder(backend, cache, workers=args.workers, rate=args.rate,
+                            batch_size=args.batch_size)
+        stats = embedder.run(iter_jsonl(path))
+    elapsed = time.perf_counter() - started
+    print(f"{stats['chunks']} chunks from {path}: {stats['cached']} cached, "
+          f"{stats['embedded']} embedded in {stats['requests']} requests "
+          f"({elapsed:.1f}s, {stats['retries']} retries)")
+    metrics.finish(args, command="embed")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,331 @@
+import argparse
+import hashlib
+import json
+import os
+import struct
+from pathlib import Path
+
+import numpy as np
+
+from src.embeddings.backends import BACKENDS, get_backend
+from src.embeddings.cache import DEFAULT_CACHE_PATH, EMBEDDINGS_PATH, EmbeddingCache
+from src.embeddings.embed import default_chunks_path, iter_chunk_vectors
+from src.preprocessing.format_documents import iter_jsonl
+
+
+DEFAULT_STORE_DIR = EMBEDDINGS_PATH / "store"
+FORMAT_VERSION = 1
+MANIFEST_FILE = "manifest.json"
+VECTORS_FILE = "vectors.npy"
+
+SOURCE_TYPES = ['chapter', 'episode', 'character']
+# Fixed-width numeric columns: name -> dtype. Missing values are -1.
+NUMERIC_COLUMNS = {
+    'source_type': np.uint8,
+    'number': np.int32,
+    'char_start': np.int32,
+    'char_end': np.int32,
+    'token_count': np.int32,
+}
+# Variable-length UTF-8 columns, stored as <name>.bin + <name>.offsets.npy.
+STRING_COLUMNS = ['title', 'url', 'source_urls', 'text']
+
+# .npy headers are written at this fixed size (a multiple of 64, as numpy
+# requires) so appends can rewrite the shape in place.
+NPY_HEADER_SIZE = 128
+
+
+def _write_npy_header(f, dtype, shape):
+    header = repr({'descr': np.lib.format.dtype_to_descr(np.dtype(dtype)),
+                   'fortran_order': False, 'shape': tuple(shape)})
+    header = header.ljust(NPY_HEADER_SIZE - 10 - 1) + "\n"
+    f.seek(0)
+    f.write(np.lib.format.magic(1, 0))
+    f.write(struct.pack("<H", len(header)))
+    f.write(header.encode("latin1"))
+
+
+def _create_npy(path, dtype, row_shape=()):
+    with open(path, "wb") as f:
+        _write_npy_header(f, dtype, (0,) + tuple(row_shape))
+
+
+def _append_npy(path, rows, keep):
+    """
+    Appends rows to a .npy file after its first `keep` rows and rewrites the
+    header; anything past `keep` (a crashed earlier append) is overwritten.
+    """
+    rows = np.ascontiguousarray(rows)
+    with open(path, "r+b") as f:
+        np.lib.format.read_magic(f)
+        shape, _, dtype = np.lib.format.read_array_header_1_0(f)
+        row_bytes = dtype.itemsize * int(np.prod(shape[1:], dtype=np.int64))
+        f.seek(NPY_HEADER_SIZE + keep * row_bytes)
+        f.truncate()
+        f.write(rows.astype(dtype, copy=False).tobytes())
+        _write_npy_header(f, dtype, (keep + len(rows),) + tuple(shape[1:]))
+
+
+def _load_npy(path, count):
+    array = np.load(path, mmap_mode="r")
+    return array[:count]
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return -1
+
+
+class EmbeddingStore:
+    """
+    On-disk vector store: a contiguous `.npy` matrix plus columnar metadata.
+
+    Layout of the store directory:
+
+    - `vectors.npy`: (count, dim) float16 or float32, L2-normalized rows;
+    - `<column>.npy`: one fixed-width numeric column per `NUMERIC_COLUMNS`;
+    - `<column>.bin` + `<column>.offsets.npy`: UTF-8 blob and int64 offsets
+      (count + 1) per `STRING_COLUMNS`;
+    - `manifest.json`: model, dim, dtype, count, source type codes and the
+      SHA-256 of the vector data.
+
+    Everything is opened with `mmap_mode='r'`, so loading is zero-copy and
+    several processes reading the same store share its pages through the OS
+    page cache. The manifest is written last and its `count` is
+    authoritative, so a crashed append leaves the previous contents readable.
+    Appends extend a running checksum with the new rows, so the vector file
+    is read back at most once per opened store, not on every append.
+
+    Use `EmbeddingStore.create()` for a new store and `EmbeddingStore(path)`
+    to open one.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        with open(self.path / MANIFEST_FILE, "r", encoding="utf-8") as f:
+            self.manifest = json.load(f)
+        self.model = self.manifest['model']
+        self.dim = self.manifest['dim']
+        self.source_types = self.manifest['source_types']
+        # running SHA-256 of the vector data, started on the first append
+        self._digest = None
+        self._map()
+
+    def _map(self):
+        count = self.manifest['count']
+        self.vectors = _load_npy(self.path / VECTORS_FILE, count)
+        self.columns = {name: _load_npy(self.path / f"{name}.npy", count)
+                        for name in NUMERIC_COLUMNS}
+        self._offsets = {name: _load_npy(self.path / f"{name}.offsets.npy", count + 1)
+                         for name in STRING_COLUMNS}
+        self._blobs = {}
+        for name in STRING_COLUMNS:
+            blob_path = self.path / f"{name}.bin"
+            size = int(self._offsets[name][-1])
+            self._blobs[name] = (np.memmap(blob_path, dtype=np.uint8, mode="r", shape=(size,))
+                                 if size else np.empty(0, dtype=np.uint8))
+
+    @classmethod
+    def create(cls, path, model, dim, dtype="float16"):
+        """
+        Creates an empty store (replacing any store at `path`).
+        """
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        _create_npy(path / VECTORS_FILE, dtype, (dim,))
+        for name, column_dtype in NUMERIC_COLUMNS.items():
+            _create_npy(path / f"{name}.npy", column_dtype)
+        for name in STRING_COLUMNS:
+            open(path / f"{name}.bin", "wb").close()
+            _create_npy(path / f"{name}.offsets.npy", np.int64)
+            _append_npy(path / f"{name}.offsets.npy", np.zeros(1, dtype=np.int64), 0)
+
+        manifest = {
+            'format_version': FORMAT_VERSION,
+            'model': model,
+            'dim': dim,
+            'dtype': np.dtype(dtype).name,
+            'count': 0,
+            'source_types': list(SOURCE_TYPES),
+            'checksum': hashlib.sha256().hexdigest(),
+        }
+        cls._write_manifest(path, manifest)
+        return cls(path)
+
+    @staticmethod
+    def _write_manifest(path, manifest):
+        tmp_path = Path(path) / (MANIFEST_FILE + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(manifest, f, indent=2)
+        os.replace(tmp_path, Path(path) / MANIFEST_FILE)
+
+    def __len__(self):
+        return self.manifest['count']
+
+    def source_type_code(self, source_type):
+        return self.source_types.index(source_type)
+
+    def string(self, column, index):
+        offsets = self._offsets[column]
+        start, end = int(offsets[index]), int(offsets[index + 1])
+        return bytes(self._blobs[column][start:end]).decode("utf-8")
+
+    def metadata(self, index):
+        """
+        Returns the metadata dict of row `index`, in the chunk metadata format.
+        """
+        number = int(self.columns['number'][index])
+        source_urls = self.string('source_urls', index)
+        return {
+            'source_type': self.source_types[self.columns['source_type'][index]],
+            'title': self.string('title', index),
+            'number': number if number >= 0 else None,
+            'url': self.string('url', index),
+            'source_urls': source_urls.split("\n") if source_urls else [],
+            'char_start': int(self.columns['char_start'][index]),
+            'char_end': int(self.columns['char_end'][index]),
+            'token_count': int(self.columns['token_count'][index]),
+        }
+
+    def chunk(self, index):
+        """
+        Returns row `index` as a {'page_content', 'metadata'} chunk.
+        """
+        return {'page_content': self.string('text', index), 'metadata': self.metadata(index)}
+
+    def append(self, vectors, chunks):
+        """
+        Appends embedded chunks.
+
+        Args:
+            vectors (array): (n, dim) embeddings; normalized before storing.
+            chunks (list): The n {'page_content', 'metadata'} chunks.
+        """
+        vectors = np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim)
+        if len(vectors) != len(chunks):
+            raise ValueError("vectors and chunks differ in length")
+        if not len(chunks):
+            return
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        vectors = (vectors / np.where(norms == 0, 1, norms)).astype(self.vectors.dtype)
+
+        count = len(self)
+        if self._digest is None:
+            self._digest = self._vector_digest()
+        numeric = {name: [] for name in NUMERIC_COLUMNS}
+        strings = {name: [] for name in STRING_COLUMNS}
+        for chunk in chunks:
+            metadata = chunk['metadata']
+            source_type = metadata.get('source_type')
+            if source_type not in self.source_types:
+                self.source_types.append(source_type)
+            numeric['source_type'].append(self.source_type_code(source_type))
+            numeric['number'].append(_to_int(metadata.get('number')))
+            for name in ('char_start', 'char_end', 'token_count'):
+                numeric[name].append(_to_int(metadata.get(name)))
+            strings['title'].append(metadata.get('title') or metadata.get('name') or "")
+            strings['url'].append(metadata.get('url') or "")
+            strings['source_urls'].append("\n".join(metadata.get('source_urls') or []))
+            strings['text'].append(chunk['page_content'])
+
+        _append_npy(self.path / VECTORS_FILE, vectors, count)
+        self._digest.update(vectors.tobytes())
+        for name, values in numeric.items():
+            _append_npy(self.path / f"{name}.npy", np.asarray(values), count)
+        for name, values in strings.items():
+            offsets_path = self.path / f"{name}.offsets.npy"
+            end = int(self._offsets[name][-1])
+            encoded = [value.encode("utf-8") for value in values]
+            with open(self.path / f"{name}.bin", "r+b") as f:
+                f.seek(end)
+                f.truncate()
+                f.write(b"".join(encoded))
+            new_offsets = end + np.cumsum([len(value) for value in encoded], dtype=np.int64)
+            _append_npy(offsets_path, new_offsets, count + 1)
+
+        self.manifest['count'] = count + len(chunks)
+        self.manifest['source_types'] = self.source_types
+        self.manifest['checksum'] = self._digest.hexdigest()
+        self._write_manifest(self.path, self.manifest)
+        self._map()
+
+    def _vector_digest(self):
+        """
+        Hashes the data of the first `len(self)` vectors from disk, so
+        anything left past them by a crashed append is ignored.
+        """
+        digest = hashlib.sha256()
+        remaining = self.vectors.nbytes
+        with open(self.path / VECTORS_FILE, "rb") as f:
+            f.seek(NPY_HEADER_SIZE)
+            while remaining:
+                block = f.read(min(1 << 20, remaining))
+                if not block:
+                    break
+                digest.update(block)
+                remaining -= len(block)
+        return digest
+
+    def verify(self):
+        """
+        Returns True if the vector data matches the manifest checksum.
+        """
+        return self._vector_digest().hexdigest() == self.manifest['checksum']
+
+
+def build_store(chunks, backend, cache, path=DEFAULT_STORE_DIR, dtype="float16", batch_size=4096):
+    """
+    Writes every cached embedding of `chunks` into a new store.
+
+    Returns:
+        EmbeddingStore: The store, opened read-only.
+    """
+    store = None
+    batch = []
+
+    def flush():
+        nonlocal store
+        if store is None:
+            store = EmbeddingStore.create(path, backend.name, len(batch[0][1]), dtype=dtype)
+        store.append(np.vstack([vector for _, vector in batch]), [chunk for chunk, _ in batch])
+
+    for chunk, vector in iter_chunk_vectors(chunks, backend, cache):
+        batch.append((chunk, vector))
+        if len(batch) >= batch_size:
+            flush()
+            batch = []
+    if batch:
+        flush()
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the memory-mapped embedding store")
+    parser.add_argument("--input", help="Chunks JSONL (default: unique_chunks.jsonl or all_chunks.jsonl)")
+    parser.add_argument("--backend", choices=sorted(BACKENDS), default="hashing")
+    parser.add_argument("--model", help="Model name for the sentence-transformers/openai backends")
+    parser.add_argument("--cache", default=str(DEFAULT_CACHE_PATH))
+    parser.add_argument("--out", default=str(DEFAULT_STORE_DIR))
+    parser.add_argument("--dtype", choices=["float16", "float32"], default="float16")
+    args = parser.parse_args()
+
+    kwargs = {}
+    if args.model:
+        kwargs['model' if args.backend == 'openai' else 'model_name'] = args.model
+    backend = get_backend(args.backend, **kwargs)
+    path = args.input or default_chunks_path()
+
+    with EmbeddingCache(args.cache) as cache:
+        store = build_store(iter_jsonl(path), backend, cache, args.out, dtype=args.dtype)
+    if store is None:
+        print(f"No cached embeddings for {path}; run src.embeddings.embed first.")
+        return
+    size = store.vectors.nbytes / 2**20
+    print(f"Stored {len(store)} x {store.dim} {store.manifest['dtype']} vectors "
+          f"({size:.1f} MB) for {store.model} in {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,409 @@
+import bisect
+import itertools
+import json
+import math
+import os
+import threading
+import time
+from pathlib import Path
+
+
+# Set to 1 to record metrics from the start (e.g. in process-pool workers).
+ENV_VAR = "ONE_PIECE_METRICS"
+PROMETHEUS_PREFIX = "onepiece_"
+# Histogram upper bounds, in seconds for the *_seconds metrics.
+BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5,
+           1.0, 2.5, 5.0, 10.0, 30.0, 60.0, math.inf)
+
+_enabled = os.environ.get(ENV_VAR, "") not in ("", "0")
+
+
+def enable(flag=True):
+    """
+    Turns recording on or off for this process.
+    """
+    global _enabled
+    _enabled = bool(flag)
+
+
+def enabled():
+    return _enabled
+
+
+def _key(name, labels):
+    return name, tuple(sorted((k, str(v)) for k, v in labels.items()))
+
+
+class Histogram:
+    """
+    Count, sum, min, max and fixed-bucket counts of observed values.
+    """
+
+    __slots__ = ('count', 'sum', 'min', 'max', 'buckets')
+
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        self.buckets = [0] * len(BUCKETS)
+
+    def observe(self, value):
+        self.count += 1
+        self.sum += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self.buckets[bisect.bisect_left(BUCKETS, value)] += 1
+
+    def quantile(self, q):
+        """
+        Upper bound of the bucket holding the q-quantile.
+        """
+        target = q * self.count
+        seen = 0
+        for bound, n in zip(BUCKETS, self.buckets):
+            seen += n
+            if seen >= target:
+                return min(bound, self.max)
+        return self.max
+
+
+class Registry:
+    """
+    Thread-safe store of counters and histograms keyed by (name, labels).
+    """
+
+    def __init__(self):
+        self.counters = {}
+        self.histograms = {}
+        self._lock = threading.Lock()
+
+    def count(self, name, value, labels):
+        key = _key(name, labels)
+        with self._lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def observe(self, name, value, labels):
+        key = _key(name, labels)
+        with self._lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = Histogram()
+            histogram.observe(value)
+
+    def reset(self):
+        with self._lock:
+            self.counters.clear()
+            self.histograms.clear()
+
+    def snapshot(self):
+        """
+        Returns every series as plain dicts (JSON-serializable).
+        """
+        with self._lock:
+            counters = [{'name': name, 'labels': dict(labels), 'value': value}
+                        for (name, labels), value in sorted(self.counters.items())]
+            histograms = [{'name': name, 'labels': dict(labels), 'count': h.count, 'sum': h.sum,
+                           'min': h.min, 'max': h.max, 'buckets': list(h.buckets)}
+                          for (name, labels), h in sorted(self.histograms.items())]
+        return {'counters': counters, 'histograms': histograms}
+
+    def merge(self, snapshot):
+        """
+        Adds a snapshot from another process (see `snapshot()`).
+        """
+        with self._lock:
+            for series in snapshot['counters']:
+                key = _key(series['name'], series['labels'])
+                self.counters[key] = self.counters.get(key, 0) + series['value']
+            for series in snapshot['histograms']:
+                key = _key(series['name'], series['labels'])
+                histogram = self.histograms.get(key)
+                if histogram is None:
+                    histogram = self.histograms[key] = Histogram()
+                histogram.count += series['count']
+                histogram.sum += series['sum']
+                histogram.min = min(histogram.min, series['min'])
+                histogram.max = max(histogram.max, series['max'])
+                histogram.buckets = [a + b for a, b in zip(histogram.buckets, series['buckets'])]
+
+
+REGISTRY = Registry()
+
+
+class _NullTimer:
+    """
+    Shared no-op returned while recording is off.
+    """
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+    def lap(self, section):
+        pass
+
+
+_NULL_TIMER = _NullTimer()
+
+
+class Timer:
+    __slots__ = ('name', 'labels', 'started')
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        REGISTRY.observe(self.name, time.perf_counter() - self.started, self.labels)
+        return False
+
+
+class LapTimer:
+    """
+    Times consecutive sections of one function: each `lap(section)` records
+    the time since the previous lap under the `section` label.
+    """
+
+    __slots__ = ('name', 'labels', 'last')
+
+    def __init__(self, name, labels):
+        self.name = name
+        self.labels = labels
+        self.last = time.perf_counter()
+
+    def lap(self, section):
+        now = time.perf_counter()
+        REGISTRY.observe(self.name, now - self.last, dict(self.labels, section=section))
+        self.last = now
+
+
+def timer(name, **labels):
+    """
+    Context manager recording its block's duration in the `name` histogram.
+    A shared no-op while recording is off.
+    """
+    return Timer(name, labels) if _enabled else _NULL_TIMER
+
+
+def lap_timer(name, **labels):
+    """
+    Returns a LapTimer, or a no-op whose `lap()` does nothing while
+    recording is off.
+    """
+    return LapTimer(name, labels) if _enabled else _NULL_TIMER
+
+
+def timed(name, **labels):
+    """
+    Decorator recording every call's duration in the `name` histogram.
+    """
+    def decorator(fn):
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return fn(*args, **kwargs)
+            with Timer(name, labels):
+                return fn(*args, **kwargs)
+        wrapper.__name__ = fn.__name__
+        wrapper.__qualname__ = fn.__qualname__
+        wrapper.__doc__ = fn.__doc__
+        wrapper.__module__ = fn.__module__
+        wrapper.__wrapped__ = fn
+        return wrapper
+    return decorator
+
+
+def count(name, value=1, **labels):
+    if _enabled:
+        REGISTRY.count(name, value, labels)
+
+
+def observe(name, value, **labels):
+    if _enabled:
+        REGISTRY.observe(name, value, labels)
+
+
+_worker_pid = None
+
+
+class _RecordedBatch:
+    """
+    Picklable task for `pool_imap`: applies `fn` to a batch of items in a
+    worker and returns the results with the metrics recorded meanwhile.
+    """
+
+    def __init__(self, fn):
+        self.fn = fn
+
+    def __call__(self, items):
+        global _worker_pid
+        if _worker_pid != os.getpid():
+            # a forked worker starts with a copy of the parent's series
+            REGISTRY.reset()
+            _worker_pid = os.getpid()
+        results = [self.fn(item) for item in items]
+        recorded = None
+        if _enabled:
+            recorded = REGISTRY.snapshot()
+            REGISTRY.reset()
+        return results, recorded
+
+
+def pool_imap(pool, fn, items, chunksize=1):
+    """
+    Like `pool.imap(fn, items, chunksize)`, but the metrics each worker
+    records are sent back with every batch and merged into this process's
+    registry, so timings taken in workers are not lost.
+
+    Yields:
+        The results of `fn`, in input order.
+    """
+    items = iter(items)
+    batches = iter(lambda: list(itertools.islice(items, chunksize)), [])
+    for results, recorded in pool.imap(_RecordedBatch(fn), batches):
+        if recorded is not None:
+            REGISTRY.merge(recorded)
+        yield from results
+
+
+def write_jsonl(path, **context):
+    """
+    Appends one JSON line per series, stamped with the time, pid and
+    `context` (e.g. command="pipeline").
+    """
+    stamp = dict(context, time=time.time(), pid=os.getpid())
+    snapshot = REGISTRY.snapshot()
+    Path(path).parent.mkdir(parents=True, exist_ok=True)
+    with open(path, "a", encoding="utf-8") as f:
+        for kind in ('counters', 'histograms'):
+            for series in snapshot[kind]:
+                f.write(json.dumps(dict(stamp, type=kind[:-1], **series)) + "\n")
+
+
+def _prometheus_name(name):
+    return PROMETHEUS_PREFIX + "".join(c if c.isalnum() else "_" for c in name)
+
+
+def _prometheus_labels(labels, **extra):
+    labels = dict(labels, **extra)
+    if not labels:
+        return ""
+    escaped = (str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+               for v in labels.values())
+    return "{" + ",".join(f'{k}="{v}"' for k, v in zip(labels, escaped)) + "}"
+
+
+def prometheus_text():
+    """
+    Renders every series in the Prometheus text exposition format.
+    """
+    snapshot = REGISTRY.snapshot()
+    lines = []
+    typed = set()
+    for series in snapshot['counters']:
+        name = _prometheus_name(series['name']) + "_total"
+        if name not in typed:
+            typed.add(name)
+            lines.append(f"# TYPE {name} counter")
+        lines.append(f"{name}{_prometheus_labels(series['labels'])} {series['value']}")
+    for series in snapshot['histograms']:
+        name = _prometheus_name(series['name'])
+        if name not in typed:
+            typed.add(name)
+            lines.append(f"# TYPE {name} histogram")
+        cumulative = 0
+        for bound, n in zip(BUCKETS, series['buckets']):
+            cumulative += n
+            le = "+Inf" if math.isinf(bound) else repr(bound)
+            lines.append(f"{name}_bucket{_prometheus_labels(series['labels'], le=le)} {cumulative}")
+        lines.append(f"{name}_sum{_prometheus_labels(series['labels'])} {series['sum']}")
+        lines.append(f"{name}_count{_prometheus_labels(series['labels'])} {series['count']}")
+    return "\n".join(lines) + "\n"
+
+
+def serve_prometheus(port=9464, host="127.0.0.1"):
+    """
+    Serves `/metrics` from a daemon thread and returns the server.
+    """
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+    class MetricsHandler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            if self.path.split("?")[0] != "/metrics":
+                self.send_error(404)
+                return
+            body = prometheus_text().encode("utf-8")
+            self.send_response(200)
+            self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, format, *args):
+            pass
+
+    server = ThreadingHTTPServer((host, port), MetricsHandler)
+    threading.Thread(target=server.serve_forever, daemon=True, name="metrics").start()
+    return server
+
+
+def print_summary(limit=None):
+    """
+    Prints the histograms (count, total, mean, ~p50/~p99, max) by total time,
+    then the counters.
+    """
+    histograms = sorted(REGISTRY.histograms.items(), key=lambda item: -item[1].sum)[:limit]
+    if histograms:
+        print(f"{'metric':<64} {'count':>8} {'total s':>9} {'mean ms':>9} "
+              f"{'~p50 ms':>9} {'~p99 ms':>9} {'max ms':>9}")
+    for (name, labels), h in histograms:
+        label = name + ("{" + ",".join(f"{k}={v}" for k, v in labels) + "}" if labels else "")
+        print(f"{label[:64]:<64} {h.count:>8} {h.sum:>9.3f} {h.sum / h.count * 1000:>9.2f} "
+              f"{h.quantile(0.5) * 1000:>9.2f} {h.quantile(0.99) * 1000:>9.2f} {h.max * 1000:>9.2f}")
+    for (name, labels), value in sorted(REGISTRY.counters.items()):
+        label = name + ("{" + ",".join(f"{k}={v}" for k, v in labels) + "}" if labels else "")
+        print(f"{label[:64]:<64} {value:>8}")
+
+
+def add_arguments(parser):
+    """
+    Adds the shared --metrics / --metrics-port / --metrics-summary options.
+    """
+    group = parser.add_argument_group("instrumentation")
+    group.add_argument("--metrics", metavar="PATH", help="Record metrics and append them to this JSONL file")
+    group.add_argument("--metrics-port", type=int, help="Record metrics and serve them for Prometheus")
+    group.add_argument("--metrics-summary", action="store_true",
+                       help="Record metrics and print a summary at exit")
+
+
+def start(args):
+    """
+    Enables recording (and the Prometheus endpoint) if any metrics option was given.
+    """
+    if args.metrics or args.metrics_port or args.metrics_summary:
+        enable()
+        # process-pool workers inherit the environment
+        os.environ[ENV_VAR] = "1"
+    if args.metrics_port:
+        serve_prometheus(args.metrics_port)
+        print(f"Serving metrics on http://127.0.0.1:{args.metrics_port}/metrics")
+
+
+def finish(args, **context):
+    """
+    Writes / prints the recorded metrics as requested by the options.
+    """
+    if args.metrics:
+        write_jsonl(args.metrics, **context)
+    if args.metrics_summary:
+        print_summary()
@@ -0,0 +1,152 @@
+import heapq
+import itertools
+import json
+import re
+import threading
+import time
+from pathlib import Path
+
+
+PROFILERS = ['cprofile', 'pyinstrument']
+
+
+class _NullProfile:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NULL_PROFILE = _NullProfile()
+_active = threading.local()
+
+
+class _Profile:
+    def __init__(self, owner, key):
+        self.owner = owner
+        self.key = key
+
+    def __enter__(self):
+        # Only one profiler may be active per thread; nested calls are not profiled.
+        if getattr(_active, 'profiling', False):
+            self.profiler = None
+            return self
+        _active.profiling = True
+        self.profiler = self.owner._new_profiler()
+        self.started = time.perf_counter()
+        self.profiler.start() if self.owner.profiler == 'pyinstrument' else self.profiler.enable()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if self.profiler is None:
+            return False
+        if self.owner.profiler == 'pyinstrument':
+            self.profiler.stop()
+        else:
+            self.profiler.disable()
+        _active.profiling = False
+        self.owner._offer(time.perf_counter() - self.started, self.key, self.profiler)
+        return False
+
+
+class SlowestProfiles:
+    """
+    Profiles calls and keeps the profiles of the `n` slowest.
+
+    `profile(key)` is a context manager; with `n == 0` it is a shared no-op,
+    so call sites can stay in place when profiling is off. Only the n
+    slowest profiles are held (a min-heap on elapsed time); `dump()` writes
+    them to a directory as `.prof` files (cProfile, readable with `pstats`
+    or snakeviz) or `.html` (pyinstrument), plus a `slowest.json` index.
+
+    Args:
+        n (int): Profiles to keep; 0 disables profiling.
+        profiler (str): 'cprofile' or 'pyinstrument' (imported on first use).
+    """
+
+    def __init__(self, n=0, profiler='cprofile'):
+        if profiler not in PROFILERS:
+            raise ValueError(f"Unknown profiler '{profiler}', expected one of {PROFILERS}")
+        self.n = n
+        self.profiler = profiler
+        self._heap = []
+        self._order = itertools.count()
+        self._lock = threading.Lock()
+
+    def _new_profiler(self):
+        if self.profiler == 'pyinstrument':
+            from pyinstrument import Profiler
+            return Profiler()
+        import cProfile
+        return cProfile.Profile()
+
+    def _offer(self, elapsed, key, profiler):
+        entry = (elapsed, next(self._order), key, profiler)
+        with self._lock:
+            if len(self._heap) < self.n:
+                heapq.heappush(self._heap, entry)
+            elif elapsed > self._heap[0][0]:
+                heapq.heapreplace(self._heap, entry)
+
+    def profile(self, key):
+        return _Profile(self, key) if self.n else _NULL_PROFILE
+
+    def slowest(self):
+        """
+        (seconds, key) pairs, slowest first.
+        """
+        with self._lock:
+            return [(elapsed, key) for elapsed, _, key, _ in sorted(self._heap, reverse=True)]
+
+    def dump(self, directory):
+        """
+        Writes the kept profiles, slowest first; returns their paths.
+        """
+        directory = Path(directory)
+        directory.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            entries = sorted(self._heap, reverse=True)
+        paths = []
+        index = []
+        for rank, (elapsed, _, key, profiler) in enumerate(entries, 1):
+            slug = re.sub(r'[^A-Za-z0-9._-]+', '_', str(key).rsplit('/', 1)[-1])[:80]
+            if self.profiler == 'pyinstrument':
+                path = directory / f"{rank:02d}_{slug}.html"
+                path.write_text(profiler.output_html(), encoding="utf-8")
+            else:
+                path = directory / f"{rank:02d}_{slug}.prof"
+                profiler.dump_stats(str(path))
+            paths.append(path)
+            index.append({'rank': rank, 'key': str(key), 'seconds': elapsed, 'file': path.name})
+        with open(directory / "slowest.json", "w", encoding="utf-8") as f:
+            json.dump(index, f, indent=2)
+        return paths
+
+
+def add_arguments(parser):
+    """
+    Adds the shared --profile-slowest / --profile-dir / --profiler options.
+    """
+    group = parser.add_argument_group("profiling")
+    group.add_argument("--profile-slowest", type=int, default=0, metavar="N",
+                       help="Keep profiles of the N slowest pages / queries")
+    group.add_argument("--profile-dir", default="profiles")
+    group.add_argument("--profiler", choices=PROFILERS, default="cprofile")
+
+
+def from_args(args):
+    return SlowestProfiles(args.profile_slowest, args.profiler)
+
+
+def finish(profiles, args):
+    """
+    Dumps the kept profiles, if any, and lists them.
+    """
+    if not profiles.n:
+        return
+    paths = profiles.dump(args.profile_dir)
+    for (elapsed, key), path in zip(profiles.slowest(), paths):
+        print(f"  {elapsed * 1000:9.1f} ms  {key}  -> {path}")
@@ -0,0 +1,329 @@
+import argparse
+import re
+from collections import deque
+from multiprocessing import Pool
+from pathlib import Path
+
+import numpy as np
+
+from src.instrumentation import metrics
+from src.preprocessing.format_documents import PROCESSED_DATA_PATH, iter_jsonl, write_documents
+
+
+ENCODING_NAME = "cl100k_base"
+CHUNK_TOKENS = 400
+CHUNK_OVERLAP_TOKENS = 50
+# Bumped when chunk boundaries change, so the pipeline rechunks everything.
+CHUNKER_VERSION = 2
+
+# Character-based settings of the LangChain splitter used by notebook 03.
+CHUNK_SIZE = 1000
+CHUNK_OVERLAP = 200
+
+# The formatters start every field with a markdown heading line.
+HEADING_PATTERN = re.compile(r'^#{1,6} ', re.MULTILINE)
+# Finer split points, tried in order, for a section that exceeds the budget.
+SEPARATORS = [
+    re.compile(r'\n\n+'),
+    re.compile(r'\n'),
+    re.compile(r'(?<=[.!?])\s+'),
+    re.compile(r' +'),
+]
+
+_encoding = None
+_text_splitter = None
+
+
+def get_encoding():
+    """
+    Returns the tiktoken encoding, loading it on first use (once per process).
+    """
+    global _encoding
+    if _encoding is None:
+        import tiktoken
+        _encoding = tiktoken.get_encoding(ENCODING_NAME)
+    return _encoding
+
+
+def count_tokens(text):
+    return len(get_encoding().encode_ordinary(text))
+
+
+def section_title(heading_line):
+    """
+    Returns the field name of a heading line: '## Summary' -> 'Summary',
+    '# Title: Romance Dawn' -> 'Title'.
+    """
+    return heading_line.lstrip('#').split(':', 1)[0].strip()
+
+
+def _trim(text, start, end):
+    while start < end and text[start].isspace():
+        start += 1
+    while end > start and text[end - 1].isspace():
+        end -= 1
+    return start, end
+
+
+def split_sections(text):
+    """
+    Splits a formatted document at its heading lines.
+
+    Returns:
+        list: (start, end) character spans, one per heading block, with any
+            text before the first heading as its own block.
+    """
+    starts = [match.start() for match in HEADING_PATTERN.finditer(text)]
+    if not starts or starts[0] != 0:
+        starts.insert(0, 0)
+    spans = []
+    for start, end in zip(starts, starts[1:] + [len(text)]):
+        start, end = _trim(text, start, end)
+        if start < end:
+            spans.append((start, end))
+    return spans
+
+
+def _token_starts(text, start, end, tokens):
+    """
+    Returns the character offsets (into `text`) at which each of `tokens`,
+    the encoding of `text[start:end]`, starts.
+    """
+    lengths = [len(token) for token in get_encoding().decode_tokens_bytes(tokens)]
+    starts = np.cumsum([0] + lengths[:-1])
+    piece = text[start:end]
+    if not piece.isascii():
+        # byte offsets -> offsets of the characters holding those bytes
+        data = np.frombuffer(piece.encode("utf-8"), dtype=np.uint8)
+        starts = (np.cumsum((data & 0xC0) != 0x80) - 1)[starts]
+    return starts + start
+
+
+def _split_span(text, start, end, tokens, max_tokens, starts, level=0):
+    """
+    Breaks an over-budget span into (start, end, tokens) pieces of at most
+    `max_tokens`, at the coarsest separator that works.
+
+    Pieces are counted from `starts` (see `_token_starts`) as the tokens of
+    the enclosing section that start inside them, so nothing is re-encoded;
+    the counts are estimates that `_pack` checks.
+    """
+    if tokens <= max_tokens:
+        return [(start, end, tokens)]
+
+    if level >= len(SEPARATORS):
+        # A single "word" longer than the budget: cut it by characters.
+        width = max(1, (end - start) * max_tokens // tokens)
+        bounds = list(range(start, end, width)) + [end]
+    else:
+        bounds = [start]
+        for match in SEPARATORS[level].finditer(text, start, end):
+            if start < match.end() < end:
+                bounds.append(match.end())
+        bounds.append(end)
+        if len(bounds) == 2:
+            return _split_span(text, start, end, tokens, max_tokens, starts, level + 1)
+
+    counts = np.diff(np.searchsorted(starts, bounds))
+    pieces = []
+    for piece_start, piece_end, piece_tokens in zip(bounds, bounds[1:], counts.tolist()):
+        pieces.extend(_split_span(text, piece_start, piece_end, piece_tokens,
+                                  max_tokens, starts, level + 1))
+    return pieces
+
+
+def _split_section(text, start, end, max_tokens, tokens=None):
+    """
+    Encodes `text[start:end]` once and splits it into pieces that fit
+    `max_tokens`. With `tokens` given, splits at least once even if the
+    span's own encoding fits.
+    """
+    encoded = get_encoding().encode_ordinary(text[start:end])
+    if tokens is None and len(encoded) <= max_tokens:
+        return [(start, end, len(encoded))]
+    return _split_span(text, start, end, max(len(encoded), tokens or 0), max_tokens,
+                       _token_starts(text, start, end, encoded))
+
+
+def _pack(text, units, max_tokens, overlap_tokens):
+    """
+    Greedily packs consecutive (start, end, tokens, section) units into
+    chunks of at most `max_tokens`. When a section is split across chunks,
+    the next chunk repeats up to `overlap_tokens` from the end of the previous
+    one; whole sections never overlap.
+
+    The units' counts only estimate a chunk's count, since the tokenizer can
+    merge or split tokens across unit boundaries. So each chunk is
+    re-encoded when it is closed, and units are moved to the next chunk (or
+    split further) until it fits.
+
+    Returns:
+        list: (units, exact token count) per chunk.
+    """
+    chunks = []
+    pending = deque(units)
+
+    def close(members):
+        start, end = _trim(text, members[0][0], members[-1][1])
+        exact = count_tokens(text[start:end])
+        while exact > max_tokens:
+            if len(members) > 1:
+                pending.appendleft(members.pop())
+            else:
+                unit = members.pop()
+                pieces = _split_section(text, unit[0], unit[1], max_tokens, tokens=exact)
+                pending.extendleft(reversed([piece + (unit[3],) for piece in pieces]))
+                members.append(pending.popleft())
+            start, end = _trim(text, members[0][0], members[-1][1])
+            exact = count_tokens(text[start:end])
+        chunks.append((members, exact))
+
+    current = []
+    total = 0
+    while pending or current:
+        if not pending or (current and total + pending[0][2] > max_tokens):
+            close(current)
+            if not pending:
+                break
+            unit = pending[0]
+            carry = []
+            carried = 0
+            for previous in reversed(current[1:]):
+                if previous[3] != unit[3] or carried + previous[2] > overlap_tokens:
+                    break
+                carry.insert(0, previous)
+                carried += previous[2]
+            current, total = carry, carried
+            while current and total + unit[2] > max_tokens:
+                total -= current.pop(0)[2]
+        unit = pending.popleft()
+        current.append(unit)
+        total += unit[2]
+    return chunks
+
+
+def chunk_text(text, max_tokens=CHUNK_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS):
+    """
+    Splits a formatted document into heading-aligned, token-budgeted chunks.
+
+    Each heading block is encoded once, and each chunk once more to get its
+    exact count. Consecutive blocks are packed together while they fit in
+    `max_tokens`; a block that is too large on its own is split at
+    paragraph, line, sentence and finally word boundaries, with
+    `overlap_tokens` of overlap between its pieces.
+
+    Returns:
+        list: (char_start, char_end, token_count, section) per chunk.
+            `text[char_start:char_end]` is the chunk text and `token_count`
+            its exact encoded length, never more than `max_tokens`.
+    """
+    sections = split_sections(text)
+    units = []
+    for index, (start, end) in enumerate(sections):
+        for piece_start, piece_end, piece_tokens in _split_section(text, start, end, max_tokens):
+            units.append((piece_start, piece_end, piece_tokens, index))
+
+    chunks = []
+    for members, total in _pack(text, units, max_tokens, overlap_tokens):
+        start, end = _trim(text, members[0][0], members[-1][1])
+        heading_start, heading_end = sections[members[0][3]]
+        heading = text[heading_start:heading_end].split("\n", 1)[0]
+        title = section_title(heading) if HEADING_PATTERN.match(heading) else None
+        chunks.append((start, end, total, title))
+    return chunks
+
+
+@metrics.timed("chunk.document_seconds")
+def chunk_document(doc, max_tokens=CHUNK_TOKENS, overlap_tokens=CHUNK_OVERLAP_TOKENS):
+    """
+    Splits one {'text', 'metadata'} document into chunks.
+
+    Returns:
+        list: {'page_content', 'metadata'} dicts, the format of all_chunks.jsonl.
+            The metadata adds `chunk_index`, `char_start`, `char_end`,
+            `token_count` and `section` to the document's metadata.
+    """
+    text = doc['text']
+    chunks = []
+    for index, (start, end, tokens, section) in enumerate(chunk_text(text, max_tokens, overlap_tokens)):
+        metadata = dict(doc['metadata'])
+        metadata.update({
+            'chunk_index': index,
+            'char_start': start,
+            'char_end': end,
+            'token_count': tokens,
+            'section': section,
+        })
+        chunks.append({'page_content': text[start:end], 'metadata': metadata})
+    return chunks
+
+
+def chunk_documents(documents, workers=1, chunksize=16):
+    """
+    Lazily chunks documents, preserving order.
+
+    Args:
+        documents (iterable): {'text', 'metadata'} documents.
+        workers (int): Processes to tokenize with; 1 runs in-process.
+            Worker metrics are merged back (see `metrics.pool_imap`).
+        chunksize (int): Documents handed to a worker at a time.
+
+    Yields:
+        list: The chunks of each document.
+    """
+    if workers <= 1:
+        for doc in documents:
+            yield chunk_document(doc)
+        return
+
+    with Pool(workers) as pool:
+        yield from metrics.pool_imap(pool, chunk_document, documents, chunksize=chunksize)
+
+
+def get_text_splitter():
+    """
+    Returns the notebook's LangChain splitter, importing LangChain on first use.
+    Kept for comparison benchmarks.
+    """
+    global _text_splitter
+    if _text_splitter is None:
+        try:
+            from langchain.text_splitter import RecursiveCharacterTextSplitter
+        except ImportError:
+            from langchain_text_splitters import RecursiveCharacterTextSplitter
+        _text_splitter = RecursiveCharacterTextSplitter(
+            chunk_size=CHUNK_SIZE,
+            chunk_overlap=CHUNK_OVERLAP,
+            length_function=len,
+        )
+    return _text_splitter
+
+
+def chunk_document_langchain(doc):
+    """
+    Splits a document the way notebook 03 does.
+    """
+    chunks = get_text_splitter().create_documents([doc['text']], metadatas=[doc['metadata']])
+    return [{'page_content': chunk.page_content, 'metadata': chunk.metadata}
+            for chunk in chunks]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chunk all_documents.jsonl into all_chunks.jsonl")
+    parser.add_argument("--processed-dir", default=str(PROCESSED_DATA_PATH))
+    parser.add_argument("--workers", type=int, default=1)
+    metrics.add_arguments(parser)
+    args = parser.parse_args()
+    metrics.start(args)
+
+    processed_dir = Path(args.processed_dir)
+    documents = iter_jsonl(processed_dir / "all_documents.jsonl")
+    chunks = (chunk for doc_chunks in chunk_documents(documents, workers=args.workers)
+              for chunk in doc_chunks)
+    count = write_documents(chunks, processed_dir / "all_chunks.jsonl")
+    print(f"Successfully saved {count} chunks to {processed_dir / 'all_chunks.jsonl'}")
+    metrics.finish(args, command="chunk")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,363 @@
+import argparse
+import hashlib
+import os
+import re
+from pathlib import Path
+
+import numpy as np
+from numpy.lib.stride_tricks import sliding_window_view
+
+from src.preprocessing.format_documents import PROCESSED_DATA_PATH, iter_jsonl, write_documents
+
+
+SHINGLE_SIZE = 8
+# Keep only shingles whose hash is 0 modulo this. The choice depends on the
+# shingle alone, so both sides of a comparison keep the same subset and the
+# Jaccard estimate stays unbiased while MinHash does a quarter of the work.
+SHINGLE_SAMPLE = 4
+NUM_PERM = 128
+BANDS = 16
+# Estimated Jaccard similarity at or above which two chunks are merged.
+THRESHOLD = 0.8
+# Signatures and LSH pairs of the last run, in the processed directory.
+DEDUP_STATE_FILE = "dedup_state.npz"
+
+MAX_HASH = np.uint64(0xFFFFFFFF)
+ROLLING_BASE = np.uint64(1099511628211)
+_WHITESPACE = re.compile(r'\s+')
+
+
+class MinHasher:
+    """
+    MinHash signatures over character shingles, computed with NumPy.
+
+    Text is lowercased and whitespace-collapsed, then every window of
+    `shingle_size` bytes is hashed with a vectorized polynomial hash. The
+    `num_perm` hash functions are multiply-shift hashes
+    `((a * x + b) mod 2**64) >> 32` with odd `a`, applied to all shingles
+    at once with in-place uint64 arithmetic.
+
+    Args:
+        num_perm (int): Signature length.
+        shingle_size (int): Shingle width in bytes.
+        sample (int): Keep one in `sample` shingles, chosen by hash value.
+        seed (int): Seed of the hash functions; signatures are only
+            comparable between hashers with the same seed.
+    """
+
+    def __init__(self, num_perm=NUM_PERM, shingle_size=SHINGLE_SIZE, sample=SHINGLE_SAMPLE, seed=1):
+        rng = np.random.default_rng(seed)
+        self.num_perm = num_perm
+        self.shingle_size = shingle_size
+        self.sample = np.uint64(sample)
+        self.a = rng.integers(1, 1 << 63, size=num_perm, dtype=np.uint64) | np.uint64(1)
+        self.b = rng.integers(0, 1 << 63, size=num_perm, dtype=np.uint64)
+        # uint64 arithmetic wraps, which is the intended mod 2**64
+        with np.errstate(over='ignore'):
+            self.powers = ROLLING_BASE ** np.arange(shingle_size - 1, -1, -1, dtype=np.uint64)
+
+    def shingles(self, text):
+        """
+        Returns the unique 32-bit shingle hashes of a text.
+        """
+        normalized = _WHITESPACE.sub(' ', text.lower()).strip().encode('utf-8')
+        data = np.frombuffer(normalized, dtype=np.uint8)
+        if len(data) == 0:
+            return np.empty(0, dtype=np.uint64)
+        if len(data) < self.shingle_size:
+            data = np.pad(data, (0, self.shingle_size - len(data)))
+
+        windows = sliding_window_view(data, self.shingle_size).astype(np.uint64)
+        hashes = windows @ self.powers
+        hashes = (hashes ^ (hashes >> np.uint64(32))) & MAX_HASH
+        sampled = hashes[hashes % self.sample == 0]
+        # very short texts may have no sampled shingle; use them all
+        return np.unique(sampled if len(sampled) else hashes)
+
+    def signature(self, text):
+        """
+        Returns the MinHash signature of a text as a uint32 array.
+        """
+        shingles = self.shingles(text)
+        if len(shingles) == 0:
+            return np.full(self.num_perm, MAX_HASH, dtype=np.uint32)
+        with np.errstate(over='ignore'):
+            hashed = np.outer(self.a, shingles)
+            hashed += self.b[:, None]
+        hashed >>= np.uint64(32)
+        return hashed.min(axis=1).astype(np.uint32)
+
+    def signatures(self, texts):
+        """
+        Returns the (len(texts), num_perm) signature matrix.
+        """
+        matrix = np.empty((len(texts), self.num_perm), dtype=np.uint32)
+        for i, text in enumerate(texts):
+            matrix[i] = self.signature(text)
+        return matrix
+
+
+def band_keys(signatures, bands=BANDS):
+    """
+    Returns the (count, bands) uint64 bucket key of each row in each band.
+    """
+    count, num_perm = signatures.shape
+    rows = num_perm // bands
+    coefficients = np.random.default_rng(0).integers(1, 1 << 63, size=rows, dtype=np.uint64) | np.uint64(1)
+    keys = np.empty((count, bands), dtype=np.uint64)
+    for band in range(bands):
+        block = signatures[:, band * rows:(band + 1) * rows].astype(np.uint64)
+        with np.errstate(over='ignore'):
+            keys[:, band] = block @ coefficients
+    return keys
+
+
+def band_pairs(signatures, keys, threshold=THRESHOLD, touched=None):
+    """
+    Checks the LSH buckets: rows with the same key in a band share a bucket,
+    each member is compared with the bucket's first (lowest) row, and kept
+    when the fraction of equal signature values (the Jaccard estimate)
+    reaches `threshold`.
+
+    Args:
+        signatures (array): (count, num_perm) MinHash signatures.
+        keys (array): Their `band_keys`.
+        threshold (float): Minimum estimated Jaccard similarity.
+        touched (list): Per band, the bucket keys to check; all buckets
+            when None.
+
+    Returns:
+        array: (n, 3) int64 rows of (band, first, other).
+    """
+    count, bands = keys.shape
+    found = []
+    for band in range(bands):
+        order = np.argsort(keys[:, band], kind='stable')
+        sorted_keys = keys[order, band]
+        starts = np.flatnonzero(np.r_[True, sorted_keys[1:] != sorted_keys[:-1]])
+        ends = np.r_[starts[1:], count]
+        checked = ends - starts >= 2
+        if touched is not None:
+            checked &= np.isin(sorted_keys[starts], touched[band])
+        for start, end in zip(starts[checked].tolist(), ends[checked].tolist()):
+            first, rest = order[start], order[start + 1:end]
+            similarity = (signatures[rest] == signatures[first]).mean(axis=1)
+            for other in rest[similarity >= threshold].tolist():
+                found.append((band, int(first), other))
+    return np.array(found, dtype=np.int64).reshape(-1, 3)
+
+
+def lsh_pairs(signatures, bands=BANDS, threshold=THRESHOLD):
+    """
+    Finds near-duplicate pairs with LSH banding (see `band_pairs`).
+
+    Returns:
+        list: (i, j) index pairs of near-duplicates.
+    """
+    found = band_pairs(signatures, band_keys(signatures, bands), threshold)
+    return sorted({(int(first), int(other)) for _, first, other in found})
+
+
+def _find(parent, i):
+    while parent[i] != i:
+        parent[i] = parent[parent[i]]
+        i = parent[i]
+    return i
+
+
+def cluster_pairs(count, pairs):
+    """
+    Groups indices connected by pairs (union-find).
+
+    Returns:
+        list: Root index per item.
+    """
+    parent = list(range(count))
+    for i, j in pairs:
+        root_i, root_j = _find(parent, i), _find(parent, j)
+        if root_i != root_j:
+            parent[max(root_i, root_j)] = min(root_i, root_j)
+    return [_find(parent, i) for i in range(count)]
+
+
+def _tokens(chunk):
+    return chunk['metadata'].get('token_count') or len(chunk['page_content']) // 4
+
+
+def chunk_digest(chunk):
+    """
+    Identity of a chunk across runs: its URL and text.
+    """
+    key = f"{chunk['metadata'].get('url')}\0{chunk['page_content']}"
+    return hashlib.sha1(key.encode("utf-8")).digest()
+
+
+def load_dedup_state(path, params):
+    """
+    Returns the saved {'digests', 'signatures', 'pairs'} of the previous run,
+    or None when there is none or it used other parameters.
+    """
+    if path is None or not Path(path).exists():
+        return None
+    with np.load(path, allow_pickle=False) as saved:
+        if saved['params'].tolist() != params:
+            return None
+        return {name: saved[name] for name in ('digests', 'signatures', 'pairs')}
+
+
+def save_dedup_state(path, params, digests, signatures, pairs):
+    """
+    Writes the signatures and (band, first, other) pairs of this run (atomically).
+    """
+    tmp_path = Path(str(path) + ".tmp")
+    with open(tmp_path, "wb") as f:
+        np.savez(f, params=np.array(params, dtype=np.float64), digests=digests,
+                 signatures=signatures, pairs=pairs)
+    os.replace(tmp_path, path)
+
+
+def _match_previous(digests, previous):
+    """
+    Maps each chunk to its row in the previous run (-1 if new); repeated
+    digests are matched in order.
+    """
+    rows = {}
+    for row, digest in enumerate(previous['digests'].tolist()):
+        rows.setdefault(digest, []).append(row)
+    matched = np.full(len(digests), -1, dtype=np.int64)
+    for i, digest in enumerate(digests.tolist()):
+        candidates = rows.get(digest)
+        if candidates:
+            matched[i] = candidates.pop(0)
+    return matched
+
+
+def _incremental_pairs(signatures, keys, threshold, matched, previous):
+    """
+    Pairs of this run, reusing those of the previous run from buckets that
+    neither gained a new chunk nor lost a removed one.
+
+    Such a bucket holds the same chunks as before, in the same order, so it
+    yields the same pairs; only the other buckets are checked again. The
+    result is what `band_pairs` gives over the whole corpus.
+    """
+    new_rows = np.flatnonzero(matched < 0)
+    removed = np.ones(len(previous['digests']), dtype=bool)
+    removed[matched[matched >= 0]] = False
+    removed_keys = band_keys(previous['signatures'][removed], keys.shape[1])
+    touched = [np.union1d(keys[new_rows, band], removed_keys[:, band])
+               for band in range(keys.shape[1])]
+
+    current = np.full(len(previous['digests']), -1, dtype=np.int64)
+    current[matched[matched >= 0]] = np.flatnonzero(matched >= 0)
+    old = previous['pairs']
+    bands, first, other = old[:, 0], current[old[:, 1]], current[old[:, 2]]
+    kept = (first >= 0) & (other >= 0)
+    for band in range(keys.shape[1]):
+        in_band = kept & (bands == band)
+        kept[in_band] = ~np.isin(keys[first[in_band], band], touched[band])
+    reused = np.stack([bands[kept], first[kept], other[kept]], axis=1)
+    return np.concatenate([reused, band_pairs(signatures, keys, threshold, touched)])
+
+
+def dedup_chunks(chunks, threshold=THRESHOLD, num_perm=NUM_PERM, bands=BANDS, state_path=None):
+    """
+    Collapses near-duplicate chunks into one canonical chunk per cluster.
+
+    The canonical chunk is the longest member (by token count, then earliest);
+    its metadata gains `source_urls`, the URLs of every member. Output keeps
+    the original order of the canonical chunks.
+
+    With `state_path`, the signatures and LSH pairs are saved there, and the
+    next run only computes signatures for new chunks (by URL and text) and
+    only re-checks the buckets whose members changed.
+
+    Returns:
+        tuple: (unique chunks, report dict with chunk and token savings)
+    """
+    chunks = list(chunks)
+    hasher = MinHasher(num_perm=num_perm)
+    params = [num_perm, bands, hasher.shingle_size, int(hasher.sample), threshold]
+    digests = np.array([chunk_digest(chunk) for chunk in chunks], dtype='S20')
+    previous = load_dedup_state(state_path, params)
+    matched = _match_previous(digests, previous) if previous is not None else None
+    if matched is not None and not np.all(np.diff(matched[matched >= 0]) > 0):
+        # reordered chunks change which row leads a bucket; start over
+        matched = None
+
+    if matched is None:
+        signatures = hasher.signatures([chunk['page_content'] for chunk in chunks])
+        keys = band_keys(signatures, bands)
+        pairs = band_pairs(signatures, keys, threshold)
+    else:
+        signatures = np.empty((len(chunks), num_perm), dtype=np.uint32)
+        reused = matched >= 0
+        signatures[reused] = previous['signatures'][matched[reused]]
+        new_rows = np.flatnonzero(~reused)
+        signatures[new_rows] = hasher.signatures([chunks[i]['page_content'] for i in new_rows])
+        keys = band_keys(signatures, bands)
+        pairs = _incremental_pairs(signatures, keys, threshold, matched, previous)
+    if state_path is not None:
+        save_dedup_state(state_path, params, digests, signatures, pairs)
+
+    roots = cluster_pairs(len(chunks), {(int(first), int(other)) for _, first, other in pairs})
+
+    clusters = {}
+    for index, root in enumerate(roots):
+        clusters.setdefault(root, []).append(index)
+
+    canonical = {}
+    for members in clusters.values():
+        best = max(members, key=lambda i: (_tokens(chunks[i]), -i))
+        urls = []
+        for i in [best] + members:
+            url = chunks[i]['metadata'].get('url')
+            if url not in urls:
+                urls.append(url)
+        chunk = {'page_content': chunks[best]['page_content'],
+                 'metadata': dict(chunks[best]['metadata'], source_urls=urls)}
+        canonical[best] = chunk
+
+    unique = [canonical[i] for i in sorted(canonical)]
+    total_tokens = sum(_tokens(chunk) for chunk in chunks)
+    kept_tokens = sum(_tokens(chunk) for chunk in unique)
+    report = {
+        'chunks': len(chunks),
+        'unique_chunks': len(unique),
+        'chunks_saved': len(chunks) - len(unique),
+        'duplicate_clusters': sum(1 for members in clusters.values() if len(members) > 1),
+        'tokens': total_tokens,
+        'tokens_saved': total_tokens - kept_tokens,
+        'signatures_reused': 0 if matched is None else int(np.count_nonzero(matched >= 0)),
+    }
+    return unique, report
+
+
+def print_report(report):
+    saved_share = report['tokens_saved'] / report['tokens'] if report['tokens'] else 0
+    print(f"Dedup: {report['chunks']} -> {report['unique_chunks']} chunks "
+          f"({report['chunks_saved']} saved in {report['duplicate_clusters']} clusters), "
+          f"{report['tokens_saved']} of {report['tokens']} tokens saved ({saved_share:.1%}), "
+          f"{report.get('signatures_reused', 0)} signatures reused")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Collapse near-duplicate chunks before embedding")
+    parser.add_argument("--processed-dir", default=str(PROCESSED_DATA_PATH))
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    parser.add_argument("--full", action="store_true",
+                        help="Recompute every signature instead of reusing the saved ones")
+    args = parser.parse_args()
+
+    processed_dir = Path(args.processed_dir)
+    state_path = processed_dir / DEDUP_STATE_FILE
+    if args.full and state_path.exists():
+        state_path.unlink()
+    unique, report = dedup_chunks(iter_jsonl(processed_dir / "all_chunks.jsonl"),
+                                  threshold=args.threshold, state_path=state_path)
+    write_documents(unique, processed_dir / "unique_chunks.jsonl")
+    print_report(report)
+
+
+if __name__ == "__main__":
+    main()
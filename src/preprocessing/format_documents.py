@@ -0,0 +1,313 @@
+import argparse
+import json
+import os
+from multiprocessing import Pool
+from pathlib import Path
+
+from src.instrumentation import metrics
+
+
+ROOT = Path(__file__).resolve().parents[2]
+RAW_DATA_PATH = ROOT / "data" / "raw"
+PROCESSED_DATA_PATH = ROOT / "data" / "processed"
+
+# kind -> legacy raw file, in all_documents.jsonl order
+SOURCES = {
+    'chapters': "one_piece_chapters.json",
+    'episodes': "one_piece_episodes.json",
+    'characters': "one_piece_characters_data.jsonl",
+}
+
+JSON_WHITESPACE = " \t\r\n"
+
+
+def iter_json_array(path, buffer_size=1 << 16):
+    """
+    Yields the elements of a top-level JSON array one at a time.
+
+    The file is read in `buffer_size` pieces and decoded with
+    `JSONDecoder.raw_decode`, so memory is bounded by the largest element
+    rather than the whole file.
+    """
+    decoder = json.JSONDecoder()
+    with open(path, "r", encoding="utf-8") as f:
+        buffer = ""
+        pos = 0
+        in_array = False
+        eof = False
+        while True:
+            buffer = buffer[pos:].lstrip(JSON_WHITESPACE + ("," if in_array else ""))
+            pos = 0
+            if not buffer:
+                chunk = f.read(buffer_size)
+                if not chunk:
+                    if in_array:
+                        raise ValueError(f"Unterminated JSON array in {path}")
+                    return
+                buffer = chunk
+                continue
+            if not in_array:
+                if buffer[0] != "[":
+                    raise ValueError(f"Expected a JSON array in {path}")
+                in_array = True
+                pos = 1
+                continue
+            if buffer[0] == "]":
+                return
+
+            try:
+                element, end = decoder.raw_decode(buffer)
+            except json.JSONDecodeError:
+                # Element spans past the buffer: read more (doubling, so a
+                # huge element is not re-decoded once per small read).
+                chunk = f.read(max(buffer_size, len(buffer)))
+                if not chunk:
+                    raise
+                buffer += chunk
+                continue
+            after = end
+            while after < len(buffer) and buffer[after] in JSON_WHITESPACE:
+                after += 1
+            if after == len(buffer) or buffer[after] not in ",]":
+                # A number cut off by the read still decodes ("12" of "12345",
+                # "1" of "1.5"): only accept an element once its delimiter is in.
+                chunk = "" if eof else f.read(buffer_size)
+                if chunk:
+                    buffer += chunk
+                    continue
+                eof = True
+                if after < len(buffer):
+                    raise ValueError(f"Malformed JSON array in {path}")
+            pos = end
+            yield element
+
+
+def iter_jsonl(path):
+    """
+    Yields one object per non-empty line of a JSONL file.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def iter_raw_records(path):
+    """
+    Streams records from a JSON array (.json) or JSON Lines (.jsonl) file.
+    """
+    if str(path).endswith(".jsonl"):
+        return iter_jsonl(path)
+    return iter_json_array(path)
+
+
+def format_chapter_characters(char_data):
+    """
+    Formats the nested character dictionary from a chapter record into a
+    readable string, one "Category - Subgroup: names" line per subgroup.
+    """
+    if not isinstance(char_data, dict):
+        return "N/A"
+
+    full_character_list = []
+    for category, subcategories in char_data.items():
+        if isinstance(subcategories, dict):
+            for subcat, members in subcategories.items():
+                if members:  # check if members is not empty
+                    member_str = ", ".join(members)
+                    full_character_list.append(f"{category} - {subcat}: {member_str}")
+
+    return "\n".join(full_character_list) if full_character_list else "N/A"
+
+
+def format_episode_characters(character_string):
+    """
+    Flattens the newline-separated episode character list into one line.
+    """
+    if not isinstance(character_string, str):
+        return "N/A"
+    lines = [line.strip() for line in character_string.splitlines() if line.strip()]
+    return ", ".join(lines)
+
+
+def format_devil_fruit(fruit_data):
+    """
+    Formats the nested devil fruit dictionary into a readable string.
+    """
+    if not isinstance(fruit_data, dict):
+        return "N/A"
+
+    name = fruit_data.get('english_name', 'N/A')
+    jap_name = fruit_data.get('japanese_name', '')
+    fruit_type = fruit_data.get('type', 'N/A')
+
+    formatted_string = f"{name}"
+    if jap_name:
+        formatted_string += f" ({jap_name})"
+    formatted_string += f", Type: {fruit_type}"
+
+    return formatted_string
+
+
+@metrics.timed("format.document_seconds", kind="chapters")
+def format_chapter(record):
+    """
+    Turns a raw chapter record into a {'text', 'metadata'} document.
+    """
+    text_content = (
+        f"# Title: {record.get('chapter_title', 'N/A')}\n"
+        f"## Chapter Number: {record.get('chapter_number', 'N/A')}\n"
+        f"## Release Date: {record.get('release_date', 'N/A')}\n\n"
+        f"## Summary\n{record.get('short_summary', '')}\n{record.get('long_summary', '')}\n\n"
+        f"## Chapter Notes\n{record.get('chapter_notes', 'N/A')}\n\n"
+        f"## Characters Appearing\n{format_chapter_characters(record.get('characters', {}))}\n\n"
+        f"## Trivia\n{record.get('trivia', 'N/A')}"
+    ).strip()
+
+    metadata = {
+        'source_type': 'chapter',
+        'title': record.get('chapter_title', 'N/A'),
+        'number': record.get('chapter_number', 'N/A'),
+        'url': record.get('url', 'N/A'),
+    }
+    return {'text': text_content, 'metadata': metadata}
+
+
+@metrics.timed("format.document_seconds", kind="episodes")
+def format_episode(record):
+    """
+    Turns a raw episode record into a {'text', 'metadata'} document.
+    """
+    text_content = (
+        f"# Title: {record.get('episode_title', 'N/A')}\n"
+        f"## Episode Number: {record.get('episode_number', 'N/A')}\n"
+        f"## Air Date: {record.get('air_date', 'N/A')}\n"
+        f"## Source Chapters: {record.get('source_chapters', 'N/A')}\n\n"
+        f"## Summary\n{record.get('short_summary', '')}\n{record.get('long_summary', '')}\n\n"
+        f"## Characters Appearing\n{format_episode_characters(record.get('characters', 'N/A'))}\n\n"
+        f"## Anime Notes\n{record.get('anime_notes', 'N/A')}\n\n"
+        f"## Trivia\n{record.get('trivia', 'N/A')}"
+    ).strip()
+
+    metadata = {
+        'source_type': 'episode',
+        'title': record.get('episode_title', 'N/A'),
+        'number': record.get('episode_number', 'N/A'),
+        'url': record.get('url', 'N/A'),
+    }
+    return {'text': text_content, 'metadata': metadata}
+
+
+@metrics.timed("format.document_seconds", kind="characters")
+def format_character(record):
+    """
+    Turns a raw character record into a {'text', 'metadata'} document.
+    """
+    text_content = (
+        f"# Name: {record.get('name', 'N/A')}\n"
+        f"## Affiliations: {record.get('affiliations', 'N/A')}\n"
+        f"## Occupations: {record.get('occupations', 'N/A')}\n"
+        f"## Devil Fruit: {format_devil_fruit(record.get('devil_fruit'))}\n"
+        f"## Residence: {record.get('residence', 'N/A')}\n"
+        f"## Status: {record.get('status', 'N/A')}\n"
+        f"## Bounty: {record.get('bounty', 'N/A')}\n"
+        f"## Manga Debut: {record.get('manga_debut', 'N/A')}\n"
+        f"## Anime Debut: {record.get('anime_debut', 'N/A')}\n\n"
+        f"## General Info\n{record.get('general_info', 'N/A')}\n\n"
+        f"## Appearance\n{record.get('appearance', 'N/A')}\n\n"
+        f"## Personality\n{record.get('personality', 'N/A')}\n\n"
+        f"## History\n{record.get('history', 'N/A')}\n\n"
+        f"## Abilities\n{record.get('abilities', 'N/A')}\n\n"
+        f"## Relationships\n{record.get('relationships', 'N/A')}\n\n"
+        f"## Trivia\n{record.get('trivia', 'N/A')}"
+    ).strip()
+
+    metadata = {
+        'source_type': 'character',
+        'name': record.get('name', 'N/A'),
+        'url': record.get('url', 'N/A'),
+    }
+    return {'text': text_content, 'metadata': metadata}
+
+
+# source kind -> formatter
+FORMATTERS = {
+    'chapters': format_chapter,
+    'episodes': format_episode,
+    'characters': format_character,
+}
+
+
+def format_records(records, formatter, workers=1, chunksize=64):
+    """
+    Lazily formats records into documents, preserving input order.
+
+    Args:
+        records (iterable): Raw records; consumed lazily.
+        formatter (callable): One of the `format_*` functions.
+        workers (int): Processes to format with; 1 formats in-process.
+            Worker metrics are merged back (see `metrics.pool_imap`).
+        chunksize (int): Records handed to a worker at a time.
+
+    Yields:
+        dict: {'text', 'metadata'} documents.
+    """
+    if workers <= 1:
+        for record in records:
+            yield formatter(record)
+        return
+
+    with Pool(workers) as pool:
+        yield from metrics.pool_imap(pool, formatter, records, chunksize=chunksize)
+
+
+def write_documents(documents, path):
+    """
+    Streams documents to a JSONL file (via a temporary file).
+
+    Returns:
+        int: Number of documents written.
+    """
+    tmp_path = Path(str(path) + ".tmp")
+    count = 0
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        for document in documents:
+            f.write(json.dumps(document) + "\n")
+            count += 1
+    os.replace(tmp_path, path)
+    return count
+
+
+def format_file(kind, raw_path, out_path, workers=1):
+    """
+    Formats one raw file into its processed JSONL file in constant memory.
+
+    Returns:
+        int: Number of documents written.
+    """
+    documents = format_records(iter_raw_records(raw_path), FORMATTERS[kind], workers=workers)
+    return write_documents(documents, out_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Format raw scraped data into processed_*.jsonl")
+    parser.add_argument("kinds", nargs="*", choices=list(SOURCES), default=list(SOURCES))
+    parser.add_argument("--raw-dir", default=str(RAW_DATA_PATH))
+    parser.add_argument("--processed-dir", default=str(PROCESSED_DATA_PATH))
+    parser.add_argument("--workers", type=int, default=1)
+    metrics.add_arguments(parser)
+    args = parser.parse_args()
+    metrics.start(args)
+
+    processed_dir = Path(args.processed_dir)
+    processed_dir.mkdir(parents=True, exist_ok=True)
+    for kind in args.kinds:
+        raw_path = Path(args.raw_dir) / SOURCES[kind]
+        out_path = processed_dir / f"processed_{kind}.jsonl"
+        count = format_file(kind, raw_path, out_path, workers=args.workers)
+        print(f"Saved {count} {kind} documents to {out_path}")
+    metrics.finish(args, command="format")
+
+
+if __name__ == "__main__":
+    main()
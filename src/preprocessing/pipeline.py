@@ -0,0 +1,236 @@
+import argparse
+import hashlib
+import json
+import os
+from collections import Counter
+from pathlib import Path
+
+from src.instrumentation import metrics
+from src.preprocessing.chunk_documents import (
+    CHUNK_OVERLAP_TOKENS, CHUNK_TOKENS, CHUNKER_VERSION, ENCODING_NAME, chunk_documents,
+)
+from src.preprocessing.dedup import DEDUP_STATE_FILE, dedup_chunks, print_report
+from src.preprocessing.format_documents import (
+    FORMATTERS, PROCESSED_DATA_PATH, RAW_DATA_PATH, SOURCES, iter_jsonl, iter_raw_records,
+    write_documents,
+)
+from src.scraping.storage import DEFAULT_STORE_ROOT, RecordStore
+
+
+STATE_FILE = "pipeline_state.json"
+# bump when the formatters change so every document is rebuilt
+FORMAT_VERSION = 1
+
+
+def content_hash(obj):
+    """
+    Returns a stable SHA-256 of a JSON-serializable object.
+    """
+    payload = json.dumps(obj, sort_keys=True, ensure_ascii=False).encode("utf-8")
+    return hashlib.sha256(payload).hexdigest()
+
+
+def read_jsonl(path):
+    """
+    Yields one object per line of a JSONL file; nothing if the file is missing.
+    """
+    if Path(path).exists():
+        yield from iter_jsonl(path)
+
+
+def load_raw_records(kind, raw_dir=RAW_DATA_PATH, store_root=DEFAULT_STORE_ROOT):
+    """
+    Yields the raw scraped records of one kind.
+
+    Reads the record store `<store_root>/<kind>` when it exists, otherwise the
+    legacy JSON / JSONL file in `raw_dir`.
+    """
+    store_dir = Path(store_root) / kind
+    if store_dir.exists():
+        with RecordStore(store_dir) as store:
+            yield from store.records()
+        return
+
+    path = Path(raw_dir) / SOURCES[kind]
+    if not path.exists():
+        print(f"No raw data for {kind} at {path}")
+        return
+    yield from iter_raw_records(path)
+
+
+def load_state(path):
+    if not Path(path).exists():
+        return {'settings': {}, 'records': {}}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_state(path, state):
+    tmp_path = Path(str(path) + ".tmp")
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def _group_chunks_by_url(chunks):
+    grouped = {}
+    for chunk in chunks:
+        grouped.setdefault(chunk['metadata'].get('url'), []).append(chunk)
+    return grouped
+
+
+def run_pipeline(raw_dir=RAW_DATA_PATH, processed_dir=PROCESSED_DATA_PATH,
+                 store_root=DEFAULT_STORE_ROOT, force=False, workers=1):
+    """
+    Format -> combine -> chunk, redoing only the records whose input changed.
+
+    The state file keeps, per record URL, the hash of the raw record and of
+    the formatted document. A record whose raw hash is unchanged reuses its
+    previous document; a document whose hash is unchanged reuses its previous
+    chunks, and dedup only hashes the chunks it has not seen. The output
+    files are the same ones the notebooks write (`processed_*.jsonl`,
+    `all_documents.jsonl`, `all_chunks.jsonl`), plus `unique_chunks.jsonl`,
+    the near-duplicate-free chunks to embed.
+
+    Args:
+        raw_dir (str | Path): Directory with the legacy raw files.
+        processed_dir (str | Path): Output directory.
+        store_root (str | Path): Record store root, preferred over `raw_dir`.
+        force (bool): Ignore the saved state and rebuild everything.
+        workers (int): Processes used to chunk the changed documents.
+
+    Returns:
+        dict: Stage counters plus `changed_urls`, the URLs whose chunks were
+            rebuilt (what the embedding step needs to redo).
+    """
+    processed_dir = Path(processed_dir)
+    processed_dir.mkdir(parents=True, exist_ok=True)
+    state_path = processed_dir / STATE_FILE
+    laps = metrics.lap_timer("pipeline.stage_seconds")
+
+    settings = {
+        'format_version': FORMAT_VERSION,
+        'encoding': ENCODING_NAME,
+        'chunk_tokens': CHUNK_TOKENS,
+        'chunk_overlap_tokens': CHUNK_OVERLAP_TOKENS,
+        'chunker_version': CHUNKER_VERSION,
+    }
+    state = load_state(state_path)
+    old_settings = state.get('settings', {})
+    reuse_docs = not force and old_settings.get('format_version') == FORMAT_VERSION
+    reuse_chunks = reuse_docs and all(old_settings.get(k) == v for k, v in settings.items())
+    old_records = state.get('records', {}) if reuse_docs else {}
+
+    previous_docs = {}
+    if reuse_docs:
+        for doc in read_jsonl(processed_dir / "all_documents.jsonl"):
+            previous_docs[doc['metadata'].get('url')] = doc
+    previous_chunks = {}
+    if reuse_chunks:
+        previous_chunks = _group_chunks_by_url(read_jsonl(processed_dir / "all_chunks.jsonl"))
+    laps.lap("load_state")
+
+    stats = Counter()
+    records = {}
+    all_documents = []
+
+    # Stage 1 + 2: format each source and combine
+    for kind in SOURCES:
+        formatter = FORMATTERS[kind]
+        documents = []
+        for record in load_raw_records(kind, raw_dir, store_root):
+            url = record.get('url')
+            if url is None or url in records:
+                stats['skipped'] += 1
+                continue
+
+            raw_hash = content_hash(record)
+            old = old_records.get(url)
+            if old and old['raw'] == raw_hash and url in previous_docs:
+                document = previous_docs[url]
+                stats['documents_reused'] += 1
+            else:
+                document = formatter(record)
+                stats['documents_formatted'] += 1
+
+            records[url] = {'kind': kind, 'raw': raw_hash, 'doc': content_hash(document)}
+            documents.append(document)
+
+        write_documents(documents, processed_dir / f"processed_{kind}.jsonl")
+        print(f"{kind}: {len(documents)} documents")
+        all_documents.extend(documents)
+
+    write_documents(all_documents, processed_dir / "all_documents.jsonl")
+    laps.lap("format")
+
+    # Stage 3: chunk, only the documents whose text changed
+    changed_urls = []
+    changed_docs = []
+    for document in all_documents:
+        url = document['metadata'].get('url')
+        old = old_records.get(url)
+        if not (reuse_chunks and old and old['doc'] == records[url]['doc'] and url in previous_chunks):
+            changed_urls.append(url)
+            changed_docs.append(document)
+    rebuilt = dict(zip(changed_urls, chunk_documents(changed_docs, workers=workers)))
+
+    all_chunks = []
+    for document in all_documents:
+        url = document['metadata'].get('url')
+        if url in rebuilt:
+            chunks = rebuilt[url]
+            stats['chunks_built'] += len(chunks)
+        else:
+            chunks = previous_chunks[url]
+            stats['chunks_reused'] += len(chunks)
+        all_chunks.extend(chunks)
+
+    write_documents(all_chunks, processed_dir / "all_chunks.jsonl")
+    laps.lap("chunk")
+
+    # Stage 4: collapse near-duplicate chunks before embedding, reusing the
+    # signatures of unchanged chunks
+    dedup_state = processed_dir / DEDUP_STATE_FILE
+    if force and dedup_state.exists():
+        dedup_state.unlink()
+    unique_chunks, dedup_report = dedup_chunks(all_chunks, state_path=dedup_state)
+    write_documents(unique_chunks, processed_dir / "unique_chunks.jsonl")
+    laps.lap("dedup")
+
+    stats['documents_removed'] = len(set(old_records) - set(records))
+    save_state(state_path, {'settings': settings, 'records': records})
+
+    summary = dict(stats)
+    summary['documents'] = len(all_documents)
+    summary['chunks'] = len(all_chunks)
+    summary['changed_urls'] = changed_urls
+    summary['dedup'] = dedup_report
+    return summary
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Incrementally rebuild processed documents and chunks")
+    parser.add_argument("--raw-dir", default=str(RAW_DATA_PATH))
+    parser.add_argument("--processed-dir", default=str(PROCESSED_DATA_PATH))
+    parser.add_argument("--store-root", default=str(DEFAULT_STORE_ROOT))
+    parser.add_argument("--force", action="store_true", help="Ignore saved hashes and rebuild everything")
+    parser.add_argument("--workers", type=int, default=1, help="Processes used for chunking")
+    metrics.add_arguments(parser)
+    args = parser.parse_args()
+    metrics.start(args)
+
+    summary = run_pipeline(args.raw_dir, args.processed_dir, args.store_root, force=args.force,
+                           workers=args.workers)
+    print(f"Documents: {summary['documents']} "
+          f"({summary.get('documents_formatted', 0)} formatted, "
+          f"{summary.get('documents_reused', 0)} reused, "
+          f"{summary['documents_removed']} removed)")
+    print(f"Chunks: {summary['chunks']} "
+          f"({summary.get('chunks_built', 0)} built, {summary.get('chunks_reused', 0)} reused)")
+    print_report(summary['dedup'])
+    print(f"Changed records: {len(summary['changed_urls'])}")
+    metrics.finish(args, command="pipeline")
+
+
+if __name__ == "__main__":
+    main()
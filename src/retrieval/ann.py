@@ -0,0 +1,348 @@
+import argparse
+import json
+import math
+import time
+from pathlib import Path
+
+import numpy as np
+
+from src.embeddings.cache import EMBEDDINGS_PATH
+from src.embeddings.store import DEFAULT_STORE_DIR, EmbeddingStore
+from src.instrumentation import metrics
+from src.retrieval.exact import ExactSearch
+
+
+DEFAULT_ANN_DIR = EMBEDDINGS_PATH / "ann"
+INDEX_KINDS = ['ivf_flat', 'ivf_pq', 'hnsw']
+# Vectors converted to float32 and added per call while building.
+ADD_BLOCK = 65536
+# Sweep values for each kind's search-time knob.
+SWEEP_VALUES = {
+    'ivf_flat': ('nprobe', [1, 2, 4, 8, 16, 32, 64]),
+    'ivf_pq': ('nprobe', [1, 2, 4, 8, 16, 32, 64]),
+    'hnsw': ('efSearch', [16, 32, 64, 128, 256]),
+}
+
+
+def _faiss():
+    import faiss
+    return faiss
+
+
+def default_nlist(count):
+    """
+    ~4 * sqrt(n) lists, but at least 39 training points per list as faiss wants.
+    """
+    return max(1, min(int(4 * math.sqrt(count)), count // 39))
+
+
+def default_pq_m(dim):
+    """
+    Number of PQ sub-quantizers: the largest divisor of `dim` giving at
+    least 8 dimensions per sub-vector.
+    """
+    for m in range(max(1, dim // 8), 0, -1):
+        if dim % m == 0:
+            return m
+    return 1
+
+
+def factory_string(kind, count, dim, nlist=None, pq_m=None, hnsw_m=32):
+    if kind == 'ivf_flat':
+        return f"IVF{nlist or default_nlist(count)},Flat"
+    if kind == 'ivf_pq':
+        return f"IVF{nlist or default_nlist(count)},PQ{pq_m or default_pq_m(dim)}x8"
+    if kind == 'hnsw':
+        return f"HNSW{hnsw_m},Flat"
+    raise ValueError(f"Unknown index kind '{kind}', expected one of {INDEX_KINDS}")
+
+
+def _float32_blocks(vectors):
+    for start in range(0, len(vectors), ADD_BLOCK):
+        yield np.ascontiguousarray(vectors[start:start + ADD_BLOCK], dtype=np.float32)
+
+
+def build_index(vectors, kind, nlist=None, pq_m=None, hnsw_m=32, ef_construction=200,
+                train_size=100000, seed=0):
+    """
+    Trains and fills an inner-product faiss index over normalized vectors.
+
+    Args:
+        vectors (array): (n, dim) embeddings, float16 or float32 (memmap ok).
+        kind (str): 'ivf_flat', 'ivf_pq' or 'hnsw'.
+        nlist (int): IVF lists; `default_nlist(n)` if None.
+        pq_m (int): PQ sub-quantizers; `default_pq_m(dim)` if None.
+        hnsw_m (int): HNSW graph degree.
+        ef_construction (int): HNSW build-time beam width.
+        train_size (int): Rows sampled to train IVF/PQ.
+
+    Returns:
+        faiss.Index: The filled index; position i is row i of `vectors`.
+    """
+    faiss = _faiss()
+    count, dim = vectors.shape
+    index = faiss.index_factory(dim, factory_string(kind, count, dim, nlist, pq_m, hnsw_m),
+                                faiss.METRIC_INNER_PRODUCT)
+    if kind == 'hnsw':
+        index.hnsw.efConstruction = ef_construction
+
+    if not index.is_trained:
+        rng = np.random.default_rng(seed)
+        sample = np.sort(rng.choice(count, size=min(train_size, count), replace=False))
+        index.train(np.ascontiguousarray(vectors[sample], dtype=np.float32))
+    for block in _float32_blocks(vectors):
+        index.add(block)
+    return index
+
+
+def index_paths(ann_dir, kind):
+    ann_dir = Path(ann_dir)
+    return ann_dir / f"{kind}.faiss", ann_dir / f"{kind}.json"
+
+
+def save_index(index, ann_dir, kind, store, nlist=None, pq_m=None, hnsw_m=32):
+    """
+    Writes `<kind>.faiss` plus `<kind>.json`, which maps the index to the
+    store it was built from (model, row count, vector checksum) and records
+    its factory string; pass the parameters given to `build_index`.
+    """
+    faiss = _faiss()
+    Path(ann_dir).mkdir(parents=True, exist_ok=True)
+    index_path, meta_path = index_paths(ann_dir, kind)
+    faiss.write_index(index, str(index_path))
+    meta = {
+        'kind': kind,
+        'factory': factory_string(kind, len(store), store.dim,
+                                  nlist=nlist or getattr(index, 'nlist', None),
+                                  pq_m=pq_m, hnsw_m=hnsw_m),
+        'model': store.model,
+        'count': len(store),
+        'store_checksum': store.manifest['checksum'],
+    }
+    with open(meta_path, "w", encoding="utf-8") as f:
+        json.dump(meta, f, indent=2)
+
+
+class AnnIndex:
+    """
+    A saved faiss index, loaded read-only.
+
+    IVF indexes are opened with `IO_FLAG_MMAP`, so their inverted lists stay
+    on disk and are shared between processes through the page cache; HNSW
+    is read into memory. Index positions are store row numbers (the index is
+    always built over the whole store), and loading checks the index against
+    the store's checksum.
+
+    Args:
+        ann_dir (str | Path): Directory holding `<kind>.faiss` / `<kind>.json`.
+        kind (str): Index kind.
+        store (EmbeddingStore): Store the index was built from, used for
+            prefilters and to detect a stale index.
+        mmap (bool): Memory-map the index file where faiss supports it.
+    """
+
+    def __init__(self, ann_dir, kind, store=None, mmap=True):
+        faiss = _faiss()
+        index_path, meta_path = index_paths(ann_dir, kind)
+        with open(meta_path, "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        if store is not None and self.meta['store_checksum'] != store.manifest['checksum']:
+            raise ValueError(f"{index_path} was built from a different store; rebuild it")
+
+        self.kind = kind
+        self.store = store
+        self.filters = ExactSearch.from_store(store) if store is not None else None
+        self.index = None
+        if mmap:
+            try:
+                self.index = faiss.read_index(str(index_path), faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+            except RuntimeError:
+                self.index = None
+        if self.index is None:
+            self.index = faiss.read_index(str(index_path))
+
+    def set_params(self, nprobe=None, ef_search=None):
+        if nprobe is not None and hasattr(self.index, 'nprobe'):
+            self.index.nprobe = nprobe
+        if ef_search is not None and hasattr(self.index, 'hnsw'):
+            self.index.hnsw.efSearch = ef_search
+
+    def set_param(self, name, value):
+        self.set_params(**{'nprobe' if name == 'nprobe' else 'ef_search': value})
+
+    @metrics.timed("search.seconds", index="ann")
+    def search(self, queries, k=10, source_types=None, number_range=None, oversample=4,
+               rerank=None):
+        """
+        Approximate top-k, in the same (scores, indices) format as ExactSearch.
+
+        With prefilters, `k * oversample` candidates are fetched and filtered;
+        queries left with fewer than k hits (a selective filter) are answered
+        by ExactSearch over the matching rows instead. With `rerank`, the
+        candidates are rescored against the store's vectors, which recovers
+        most of the recall IVF-PQ loses to its compressed codes.
+
+        Args:
+            rerank (bool): Rescore with exact vectors; on by default for
+                'ivf_pq' when a store is attached.
+        """
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = np.ascontiguousarray(queries / np.where(norms == 0, 1, norms))
+        if rerank is None:
+            rerank = self.kind == 'ivf_pq' and self.store is not None
+
+        mask = self.filters.mask(source_types, number_range) if self.filters else None
+        fetch = k if mask is None and not rerank else k * oversample
+        scores, indices = self.index.search(queries, fetch)
+
+        if rerank:
+            for row, query in enumerate(queries):
+                valid = indices[row] >= 0
+                exact = np.asarray(self.store.vectors[indices[row, valid]], dtype=np.float32) @ query
+                scores[row, valid] = exact
+                order = np.argsort(-np.where(valid, scores[row], -np.inf), kind='stable')
+                scores[row], indices[row] = scores[row, order], indices[row, order]
+
+        if mask is None:
+            return scores[:, :k], indices[:, :k]
+
+        keep = (indices >= 0) & mask[np.maximum(indices, 0)]
+        out_scores = np.full((len(queries), k), -np.inf, dtype=np.float32)
+        out_indices = np.full((len(queries), k), -1, dtype=np.int64)
+        short = []
+        for row in range(len(queries)):
+            hits = np.flatnonzero(keep[row])[:k]
+            out_scores[row, :len(hits)] = scores[row, hits]
+            out_indices[row, :len(hits)] = indices[row, hits]
+            if len(hits) < k:
+                short.append(row)
+        if short:
+            exact_scores, exact_indices = self.filters.search(
+                queries[short], k, source_types=source_types, number_range=number_range)
+            out_scores[short], out_indices[short] = exact_scores, exact_indices
+        return out_scores, out_indices
+
+
+def recall_at_k(found, expected):
+    """
+    Mean fraction of the exact top-k found by the approximate search.
+    """
+    k = expected.shape[1]
+    return float(np.mean([len(set(f[f >= 0]) & set(e[e >= 0])) / k
+                          for f, e in zip(found, expected)]))
+
+
+def sweep(ann, queries, expected, k, param, values):
+    """
+    Measures recall@k and single-query latency for each setting of `param`.
+
+    Returns:
+        list: One dict per value with recall, p50/p99 latency in ms.
+    """
+    rows = []
+    for value in values:
+        ann.set_param(param, value)
+        found = np.empty_like(expected)
+        latencies = []
+        for i, query in enumerate(queries):
+            started = time.perf_counter()
+            _, indices = ann.search(query, k)
+            latencies.append(time.perf_counter() - started)
+            found[i] = indices[0]
+        rows.append({
+            'param': param,
+            'value': value,
+            'recall': recall_at_k(found, expected),
+            'p50_ms': float(np.percentile(latencies, 50) * 1000),
+            'p99_ms': float(np.percentile(latencies, 99) * 1000),
+        })
+    return rows
+
+
+def exact_baseline(store, queries, k):
+    """
+    Exact top-k and single-query latencies for the same queries.
+    """
+    exact = ExactSearch.from_store(store)
+    latencies = []
+    expected = np.empty((len(queries), k), dtype=np.int64)
+    for i, query in enumerate(queries):
+        started = time.perf_counter()
+        _, indices = exact.search(query, k)
+        latencies.append(time.perf_counter() - started)
+        expected[i] = indices[0]
+    return expected, {
+        'param': None, 'value': None, 'recall': 1.0,
+        'p50_ms': float(np.percentile(latencies, 50) * 1000),
+        'p99_ms': float(np.percentile(latencies, 99) * 1000),
+        'bytes': int(store.vectors.nbytes),
+    }
+
+
+def sample_queries(store, count, noise=0.05, seed=0):
+    """
+    Query vectors: random stored rows plus Gaussian noise, renormalized.
+    """
+    rng = np.random.default_rng(seed)
+    rows = np.sort(rng.choice(len(store), size=min(count, len(store)), replace=False))
+    queries = np.asarray(store.vectors[rows], dtype=np.float32)
+    queries += rng.normal(scale=noise / math.sqrt(store.dim), size=queries.shape).astype(np.float32)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def print_sweep(report):
+    print(f"{'index':<10} {'param':<9} {'value':>6} {'recall':>7} {'p50 ms':>8} {'p99 ms':>8} {'MB':>8}")
+    for kind, rows in report['results'].items():
+        for row in rows:
+            print(f"{kind:<10} {row['param'] or '-':<9} {row['value'] or '-':>6} "
+                  f"{row['recall']:>7.3f} {row['p50_ms']:>8.3f} {row['p99_ms']:>8.3f} "
+                  f"{row['bytes'] / 2**20:>8.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build FAISS indexes and sweep recall vs latency")
+    parser.add_argument("command", choices=["build", "sweep"])
+    parser.add_argument("--store", default=str(DEFAULT_STORE_DIR))
+    parser.add_argument("--ann-dir", default=str(DEFAULT_ANN_DIR))
+    parser.add_argument("--kinds", nargs="+", choices=INDEX_KINDS, default=INDEX_KINDS)
+    parser.add_argument("--nlist", type=int)
+    parser.add_argument("--pq-m", type=int, help="PQ sub-quantizers (default: ~dim / 8)")
+    parser.add_argument("--hnsw-m", type=int, default=32)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=10)
+    args = parser.parse_args()
+
+    store = EmbeddingStore(args.store)
+
+    if args.command == "build":
+        for kind in args.kinds:
+            started = time.perf_counter()
+            params = {'nlist': args.nlist, 'pq_m': args.pq_m, 'hnsw_m': args.hnsw_m}
+            index = build_index(store.vectors, kind, **params)
+            save_index(index, args.ann_dir, kind, store, **params)
+            print(f"Built {kind} over {len(store)} vectors in {time.perf_counter() - started:.1f}s")
+        return
+
+    queries = sample_queries(store, args.queries)
+    expected, exact_row = exact_baseline(store, queries, args.k)
+    report = {'count': len(store), 'dim': store.dim, 'k': args.k,
+              'queries': len(queries), 'results': {'exact': [exact_row]}}
+    for kind in args.kinds:
+        ann = AnnIndex(args.ann_dir, kind, store)
+        size = index_paths(args.ann_dir, kind)[0].stat().st_size
+        param, values = SWEEP_VALUES[kind]
+        rows = sweep(ann, queries, expected, args.k, param, values)
+        for row in rows:
+            row['bytes'] = size
+        report['results'][kind] = rows
+
+    print_sweep(report)
+    report_path = Path(args.ann_dir) / "sweep.json"
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(f"\nSaved sweep report to {report_path}")
+
+
+if __name__ == "__main__":
+    main()
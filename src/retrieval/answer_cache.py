@@ -0,0 +1,236 @@
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+from src.embeddings.cache import text_hash
+
+
+MAX_ENTRIES = 1024
+TTL_SECONDS = 24 * 3600
+THRESHOLD = 0.92
+
+
+def normalize_query(query):
+    return " ".join(query.casefold().split())
+
+
+def store_chunk_hashes(store, rows=None):
+    """
+    Content hashes of the store's chunk texts (all rows by default).
+    """
+    rows = range(len(store)) if rows is None else rows
+    return {int(row): text_hash(store.string('text', int(row))) for row in rows}
+
+
+class AnswerCache:
+    """
+    Semantic cache of generated answers.
+
+    Each entry keeps the query embedding, the chunks the answer was built
+    from (store row and content hash) and the answer. A lookup is an exact
+    match on the normalized query text, else one matrix-vector product
+    against every live embedding; the best match is a hit when its cosine
+    similarity reaches `threshold`.
+
+    Embeddings live in a preallocated (max_entries, dim) matrix indexed by
+    slot, so lookups never copy. Entries expire after `ttl` seconds, the
+    least recently used entry is evicted when the cache is full, and
+    `invalidate()` / `validate()` drop entries whose chunks changed.
+
+    Args:
+        dim (int): Embedding dimension.
+        max_entries (int): Capacity.
+        ttl (float): Seconds an entry stays valid, or None for no expiry.
+        threshold (float): Minimum cosine similarity for a hit.
+        clock (callable): Time source, `time.monotonic` by default.
+    """
+
+    def __init__(self, dim, max_entries=MAX_ENTRIES, ttl=TTL_SECONDS, threshold=THRESHOLD,
+                 clock=time.monotonic):
+        self.dim = dim
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.threshold = threshold
+        self.clock = clock
+        self._vectors = np.zeros((max_entries, dim), dtype=np.float32)
+        self._live = np.zeros(max_entries, dtype=bool)
+        self._created = np.zeros(max_entries, dtype=np.float64)
+        self._free = list(range(max_entries - 1, -1, -1))
+        # slot -> entry dict, least recently used first
+        self._entries = OrderedDict()
+        self._by_query = {}
+        self._by_chunk = {}
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'exact_hits': 0, 'misses': 0, 'expired': 0, 'evicted': 0,
+                      'invalidated': 0, 'seconds_saved': 0.0}
+
+    def __len__(self):
+        return len(self._entries)
+
+    @property
+    def hit_rate(self):
+        lookups = self.stats['hits'] + self.stats['misses']
+        return self.stats['hits'] / lookups if lookups else 0.0
+
+    def _remove(self, slot, reason=None):
+        entry = self._entries.pop(slot)
+        self._live[slot] = False
+        self._free.append(slot)
+        if self._by_query.get(entry['key']) == slot:
+            del self._by_query[entry['key']]
+        for chunk_hash in entry['chunk_hashes']:
+            slots = self._by_chunk.get(chunk_hash)
+            if slots is not None:
+                slots.discard(slot)
+                if not slots:
+                    del self._by_chunk[chunk_hash]
+        if reason is not None:
+            self.stats[reason] += 1
+
+    def _remove_expired(self, now):
+        if self.ttl is None:
+            return 0
+        expired = np.flatnonzero(self._live & (now - self._created > self.ttl))
+        for slot in expired.tolist():
+            self._remove(slot, 'expired')
+        return len(expired)
+
+    def get(self, query, query_vector=None):
+        """
+        Returns the cached entry for a query, or None on a miss.
+
+        Expired entries are dropped first, so they neither hit nor hide a
+        live entry that also matches.
+
+        Args:
+            query (str): Query text; an exact (normalized) match skips the
+                vector comparison.
+            query_vector (array): Query embedding, or None to only try the
+                exact match.
+
+        Returns:
+            dict: {'query', 'answer', 'chunk_ids', 'citations', 'similarity', ...}
+                or None.
+        """
+        now = self.clock()
+        with self._lock:
+            self._remove_expired(now)
+            slot = self._by_query.get(normalize_query(query))
+            similarity = 1.0
+            if slot is None and query_vector is not None and self._entries:
+                vector = np.asarray(query_vector, dtype=np.float32).reshape(-1)
+                norm = np.linalg.norm(vector)
+                scores = self._vectors @ (vector / norm if norm else vector)
+                scores[~self._live] = -np.inf
+                best = int(np.argmax(scores))
+                if scores[best] >= self.threshold:
+                    slot, similarity = best, float(scores[best])
+            elif slot is not None:
+                self.stats['exact_hits'] += 1
+
+            if slot is None:
+                self.stats['misses'] += 1
+                return None
+            entry = self._entries[slot]
+            self._entries.move_to_end(slot)
+            entry['hits'] += 1
+            self.stats['hits'] += 1
+            self.stats['seconds_saved'] += entry['cost']
+            return dict(entry, similarity=similarity)
+
+    def put(self, query, query_vector, answer, chunk_ids=(), chunk_hashes=(), cost=0.0,
+            citations=()):
+        """
+        Caches an answer.
+
+        Args:
+            query (str): Query text.
+            query_vector (array): Query embedding.
+            answer (str): Generated answer.
+            chunk_ids (iterable): Store rows the answer was built from.
+            chunk_hashes (iterable): Content hashes of those chunks.
+            cost (float): Seconds the answer took to produce, credited to
+                `stats['seconds_saved']` on every hit.
+            citations (list): The context's citations (see `pack_context`),
+                returned with the entry so a hit can cite the same sources.
+        """
+        vector = np.asarray(query_vector, dtype=np.float32).reshape(-1)
+        norm = np.linalg.norm(vector)
+        key = normalize_query(query)
+        with self._lock:
+            if key in self._by_query:
+                # a replacement, not an eviction
+                self._remove(self._by_query[key])
+            while not self._free:
+                self._remove(next(iter(self._entries)), 'evicted')
+            slot = self._free.pop()
+            self._vectors[slot] = vector / norm if norm else vector
+            self._live[slot] = True
+            created = self._created[slot] = self.clock()
+            chunk_hashes = tuple(chunk_hashes)
+            self._entries[slot] = {
+                'query': query,
+                'key': key,
+                'answer': answer,
+                'chunk_ids': [int(row) for row in chunk_ids],
+                'chunk_hashes': chunk_hashes,
+                'citations': list(citations),
+                'created': created,
+                'cost': cost,
+                'hits': 0,
+            }
+            self._by_query[key] = slot
+            for chunk_hash in chunk_hashes:
+                self._by_chunk.setdefault(chunk_hash, set()).add(slot)
+
+    def invalidate(self, chunk_hashes):
+        """
+        Drops every entry built from any of the given chunk content hashes.
+
+        Returns:
+            int: Entries removed.
+        """
+        removed = 0
+        with self._lock:
+            for chunk_hash in chunk_hashes:
+                for slot in list(self._by_chunk.get(chunk_hash, ())):
+                    self._remove(slot, 'invalidated')
+                    removed += 1
+        return removed
+
+    def validate(self, current_hashes):
+        """
+        Drops entries citing a chunk whose current content hash differs.
+
+        Args:
+            current_hashes (dict): chunk id -> content hash for the chunks
+                now being served (see `store_chunk_hashes`).
+
+        Returns:
+            int: Entries removed.
+        """
+        removed = 0
+        with self._lock:
+            for slot, entry in list(self._entries.items()):
+                if any(current_hashes.get(row) != chunk_hash
+                       for row, chunk_hash in zip(entry['chunk_ids'], entry['chunk_hashes'])):
+                    self._remove(slot, 'invalidated')
+                    removed += 1
+        return removed
+
+    def purge_expired(self):
+        """
+        Drops expired entries; returns how many.
+        """
+        now = self.clock()
+        with self._lock:
+            return self._remove_expired(now)
+
+    def report(self):
+        """
+        Counters plus size and hit rate.
+        """
+        with self._lock:
+            return dict(self.stats, entries=len(self._entries), hit_rate=self.hit_rate)
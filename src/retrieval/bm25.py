@@ -0,0 +1,351 @@
+import argparse
+import hashlib
+import json
+import math
+import re
+import time
+from array import array
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+
+from src.embeddings.cache import EMBEDDINGS_PATH
+from src.embeddings.store import DEFAULT_STORE_DIR, EmbeddingStore
+from src.instrumentation import metrics
+from src.retrieval.exact import top_k
+
+
+DEFAULT_BM25_DIR = EMBEDDINGS_PATH / "bm25"
+K1 = 1.2
+B = 0.75
+RRF_K = 60
+MAX_TF = np.iinfo(np.uint16).max
+
+_TOKEN = re.compile(r"[a-z0-9]+")
+
+
+def tokenize(text):
+    """
+    Lowercased alphanumeric tokens; numbers are kept ("Chapter 1050" ->
+    ['chapter', '1050']).
+    """
+    return _TOKEN.findall(text.lower())
+
+
+class BM25Builder:
+    """
+    Accumulates (term, doc, tf) postings from a stream of texts.
+
+    Document ids are assigned in order, so feeding the store's rows gives
+    ids equal to store row numbers. Postings are kept in compact typed
+    arrays until `build()` sorts them into CSR form.
+
+    Args:
+        index (BM25Index): Existing index to continue from, or None.
+    """
+
+    def __init__(self, index=None):
+        self.vocab = {}
+        self._terms = array('i')
+        self._docs = array('i')
+        self._tfs = array('H')
+        self.doc_len = array('i')
+        if index is not None:
+            self.vocab = dict(index.vocab)
+            counts = np.diff(index.indptr)
+            self._terms.frombytes(np.repeat(np.arange(len(counts), dtype=np.int32), counts).tobytes())
+            self._docs.frombytes(np.asarray(index.doc_ids, dtype=np.int32).tobytes())
+            self._tfs.frombytes(np.asarray(index.tfs, dtype=np.uint16).tobytes())
+            self.doc_len.frombytes(np.asarray(index.doc_len, dtype=np.int32).tobytes())
+
+    def __len__(self):
+        return len(self.doc_len)
+
+    def add(self, text):
+        """
+        Adds one document and returns its id.
+        """
+        doc_id = len(self.doc_len)
+        tokens = tokenize(text)
+        for term, tf in Counter(tokens).items():
+            term_id = self.vocab.get(term)
+            if term_id is None:
+                term_id = self.vocab[term] = len(self.vocab)
+            self._terms.append(term_id)
+            self._docs.append(doc_id)
+            self._tfs.append(min(tf, MAX_TF))
+        self.doc_len.append(len(tokens))
+        return doc_id
+
+    def build(self, k1=K1, b=B):
+        """
+        Sorts the postings by (term, doc) into a BM25Index.
+        """
+        terms = np.frombuffer(self._terms, dtype=np.int32)
+        docs = np.frombuffer(self._docs, dtype=np.int32)
+        tfs = np.frombuffer(self._tfs, dtype=np.uint16)
+        order = np.lexsort((docs, terms))
+        indptr = np.zeros(len(self.vocab) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(terms, minlength=len(self.vocab)), out=indptr[1:])
+        return BM25Index(self.vocab, indptr, docs[order], tfs[order],
+                         np.frombuffer(self.doc_len, dtype=np.int32).copy(), k1=k1, b=b)
+
+
+class BM25Index:
+    """
+    BM25 over array-backed postings in CSR layout.
+
+    `indptr[t]:indptr[t + 1]` slices `doc_ids` / `tfs` for term id `t`;
+    `vocab` maps terms to ids and `doc_len` holds token counts per document.
+    Saved as `.npy` files plus `vocab.json` / `meta.json` and loaded with
+    `mmap_mode='r'`. A query touches only its terms' postings and scores them
+    with one `bincount` per term.
+
+    Args:
+        vocab (dict): term -> id.
+        indptr, doc_ids, tfs, doc_len (array): The postings.
+        k1, b (float): BM25 parameters.
+    """
+
+    def __init__(self, vocab, indptr, doc_ids, tfs, doc_len, k1=K1, b=B, meta=None):
+        self.vocab = vocab
+        self.indptr = indptr
+        self.doc_ids = doc_ids
+        self.tfs = tfs
+        self.doc_len = doc_len
+        self.k1 = k1
+        self.b = b
+        self.meta = meta or {}
+        count = len(doc_len)
+        avgdl = float(np.mean(doc_len)) if count else 0.0
+        self.avgdl = avgdl
+        # per-document length normalization, k1 * (1 - b + b * dl / avgdl)
+        self._norm = (k1 * (1 - b + b * np.asarray(doc_len, dtype=np.float32) / avgdl)
+                      if count else np.empty(0, dtype=np.float32))
+
+    def __len__(self):
+        return len(self.doc_len)
+
+    def idf(self, term_id):
+        df = int(self.indptr[term_id + 1] - self.indptr[term_id])
+        return math.log(1 + (len(self) - df + 0.5) / (df + 0.5))
+
+    def scores(self, query):
+        """
+        Returns the dense (n,) BM25 score vector of a query string.
+        """
+        scores = np.zeros(len(self), dtype=np.float32)
+        for term, qtf in Counter(tokenize(query)).items():
+            term_id = self.vocab.get(term)
+            if term_id is None:
+                continue
+            start, end = int(self.indptr[term_id]), int(self.indptr[term_id + 1])
+            docs = self.doc_ids[start:end]
+            tfs = np.asarray(self.tfs[start:end], dtype=np.float32)
+            weights = self.idf(term_id) * qtf * tfs * (self.k1 + 1) / (tfs + self._norm[docs])
+            scores += np.bincount(docs, weights=weights, minlength=len(self)).astype(np.float32)
+        return scores
+
+    @metrics.timed("search.seconds", index="bm25")
+    def search(self, query, k=10, mask=None):
+        """
+        Top-k documents for a query string.
+
+        Args:
+            query (str): Query text.
+            k (int): Results.
+            mask (array): Optional boolean row mask (see ExactSearch.mask).
+
+        Returns:
+            tuple: (scores, indices) of shape (k,), best first; documents
+                without any query term are never returned (index -1).
+        """
+        scores = self.scores(query)
+        if mask is not None:
+            scores[~mask] = 0
+        best_scores, best = top_k(scores[None, :], k)
+        best_scores, best = best_scores[0], best[0]
+        best = np.where(best_scores > 0, best, -1)
+        if len(best) < k:
+            best = np.pad(best, (0, k - len(best)), constant_values=-1)
+            best_scores = np.pad(best_scores, (0, k - len(best_scores)))
+        return best_scores, best
+
+    def save(self, path, **meta):
+        """
+        Writes the index to a directory; `meta` is stored in meta.json.
+        """
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        np.save(path / "indptr.npy", np.asarray(self.indptr))
+        np.save(path / "doc_ids.npy", np.asarray(self.doc_ids))
+        np.save(path / "tfs.npy", np.asarray(self.tfs))
+        np.save(path / "doc_len.npy", np.asarray(self.doc_len))
+        with open(path / "vocab.json", "w", encoding="utf-8") as f:
+            json.dump(sorted(self.vocab, key=self.vocab.get), f, ensure_ascii=False)
+        self.meta = dict(meta, count=len(self), vocab_size=len(self.vocab),
+                         postings=int(len(self.doc_ids)), k1=self.k1, b=self.b)
+        with open(path / "meta.json", "w", encoding="utf-8") as f:
+            json.dump(self.meta, f, indent=2)
+
+    @classmethod
+    def load(cls, path, mmap=True):
+        path = Path(path)
+        mode = "r" if mmap else None
+        with open(path / "meta.json", "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        with open(path / "vocab.json", "r", encoding="utf-8") as f:
+            vocab = {term: i for i, term in enumerate(json.load(f))}
+        return cls(vocab,
+                   np.load(path / "indptr.npy", mmap_mode=mode),
+                   np.load(path / "doc_ids.npy", mmap_mode=mode),
+                   np.load(path / "tfs.npy", mmap_mode=mode),
+                   np.load(path / "doc_len.npy", mmap_mode=mode),
+                   k1=meta['k1'], b=meta['b'], meta=meta)
+
+
+def index_store(store, index=None, k1=K1, b=B):
+    """
+    Builds (or extends) the BM25 index over the store's chunk texts.
+
+    Documents are the store's rows, so index ids equal store rows. With an
+    existing `index`, only rows past its end are tokenized.
+
+    Returns:
+        tuple: (BM25Index, number of rows added)
+    """
+    builder = BM25Builder(index)
+    start = len(builder)
+    for row in range(start, len(store)):
+        builder.add(store.string('text', row))
+    return builder.build(k1=k1, b=b), len(store) - start
+
+
+def text_checksum(store, count=None):
+    """
+    sha256 over the texts of the store's first `count` rows (all rows by
+    default): identifies the documents an index was built from.
+    """
+    digest = hashlib.sha256()
+    for row in range(len(store) if count is None else count):
+        digest.update(store.string('text', row).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+def index_meta(store):
+    """
+    Metadata saved with an index of all the store's rows, checked by
+    `indexed_rows()` before the index is reused.
+    """
+    return {'model': store.model, 'store_checksum': store.manifest['checksum'],
+            'text_checksum': text_checksum(store)}
+
+
+def indexed_rows(meta, store):
+    """
+    Returns how many leading store rows a saved index (its `meta`) covers,
+    or -1 if it was built from other data and must be rebuilt.
+
+    The texts of the rows the index covers are hashed and compared with the
+    saved `text_checksum`, so a store rebuilt with different text but the
+    same (or a larger) row count is caught; a store that only grew since
+    gives the covered prefix, to be extended by `index_store()`.
+    """
+    count = meta.get('count', -1)
+    if meta.get('model') != store.model or count > len(store):
+        return -1
+    if meta.get('text_checksum') != text_checksum(store, count):
+        return -1
+    return count
+
+
+def reciprocal_rank_fusion(rankings, k=RRF_K, limit=None):
+    """
+    Fuses ranked index lists with RRF: score(d) = sum 1 / (k + rank(d)).
+
+    Args:
+        rankings (list): Ranked arrays of row indices, best first; -1 is
+            ignored.
+        k (int): RRF damping constant.
+        limit (int): Number of fused results to return.
+
+    Returns:
+        list: (index, fused score) pairs, best first.
+    """
+    fused = {}
+    for ranking in rankings:
+        rank = 0
+        for index in ranking:
+            index = int(index)
+            if index < 0:
+                continue
+            rank += 1
+            fused[index] = fused.get(index, 0.0) + 1.0 / (k + rank)
+    results = sorted(fused.items(), key=lambda item: (-item[1], item[0]))
+    return results[:limit] if limit else results
+
+
+@metrics.timed("search.seconds", index="hybrid")
+def hybrid_search(query, query_vector, bm25, dense, k=10, candidates=50,
+                  source_types=None, number_range=None, rrf_k=RRF_K):
+    """
+    Lexical + vector retrieval fused with reciprocal-rank fusion.
+
+    Args:
+        query (str): Query text for BM25.
+        query_vector (array): Query embedding for the dense engine.
+        bm25 (BM25Index): Lexical index over the same rows as `dense`.
+        dense: ExactSearch or AnnIndex.
+        k (int): Fused results.
+        candidates (int): Results taken from each engine before fusion.
+
+    Returns:
+        list: (row index, fused score) pairs, best first.
+    """
+    filters = dense if hasattr(dense, 'mask') else dense.filters
+    mask = filters.mask(source_types, number_range) if filters is not None else None
+    _, lexical = bm25.search(query, candidates, mask=mask)
+    _, semantic = dense.search(np.atleast_2d(query_vector), candidates, source_types=source_types,
+                               number_range=number_range)
+    return reciprocal_rank_fusion([lexical, semantic[0]], k=rrf_k, limit=k)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build, update or query the BM25 index")
+    parser.add_argument("command", choices=["build", "update", "query"])
+    parser.add_argument("query", nargs="?")
+    parser.add_argument("--store", default=str(DEFAULT_STORE_DIR))
+    parser.add_argument("--out", default=str(DEFAULT_BM25_DIR))
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    store = EmbeddingStore(args.store)
+    if args.command == "query":
+        index = BM25Index.load(args.out)
+        started = time.perf_counter()
+        scores, rows = index.search(args.query, args.k)
+        elapsed = (time.perf_counter() - started) * 1000
+        for score, row in zip(scores, rows):
+            if row >= 0:
+                metadata = store.metadata(row)
+                print(f"{score:7.2f}  {metadata['source_type']:<9} {metadata['title']}  {metadata['url']}")
+        print(f"({elapsed:.2f} ms)")
+        return
+
+    existing = None
+    if args.command == "update" and (Path(args.out) / "meta.json").exists():
+        existing = BM25Index.load(args.out, mmap=False)
+        if indexed_rows(existing.meta, store) < 0:
+            print("Index does not match the store; rebuilding.")
+            existing = None
+    started = time.perf_counter()
+    index, added = index_store(store, existing)
+    index.save(args.out, **index_meta(store))
+    print(f"Indexed {added} new chunks ({len(index)} total, {len(index.vocab)} terms, "
+          f"{len(index.doc_ids)} postings) in {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+from src.embeddings.cache import text_hash
+from src.instrumentation import metrics
+from src.preprocessing.chunk_documents import count_tokens, get_encoding
+
+
+CONTEXT_TOKENS = 3000
+# Don't bother truncating a span into less room than this.
+MIN_SPAN_TOKENS = 64
+SEPARATOR = "\n\n"
+# Chunk ends are trimmed, so consecutive chunks of a page are separated by
+# the whitespace between them; a gap this short can hold nothing else.
+ADJACENT_GAP_CHARS = 2
+
+
+def merge_spans(chunks, scores=None, rows=None):
+    """
+    Merges overlapping or adjacent chunks of the same page.
+
+    Chunks carry `char_start` / `char_end` offsets into their document and
+    `page_content == document[char_start:char_end]`, so two chunks of one URL
+    whose ranges overlap are joined by appending only the part of the later
+    chunk past the earlier one's end. Ranges at most ADJACENT_GAP_CHARS apart
+    are consecutive chunks with the trimmed whitespace between them; they are
+    joined with newlines filling the gap, so a span's text stays as long as
+    its range. Chunks without offsets are kept as they are.
+
+    Args:
+        chunks (list): {'page_content', 'metadata'} chunks, best first.
+        scores (list): Relevance per chunk, higher is better; reciprocal
+            rank when None.
+        rows (list): Store row per chunk, reported in each span's `rows`;
+            positions in `chunks` when None.
+
+    Returns:
+        list: Span dicts ({'text', 'score', 'metadata', 'rows', 'char_start',
+            'char_end'}), best first. A span scores as its best chunk.
+    """
+    if scores is None:
+        scores = [1.0 / rank for rank in range(1, len(chunks) + 1)]
+    if rows is None:
+        rows = range(len(chunks))
+
+    by_url = {}
+    loose = []
+    for chunk, score, row in zip(chunks, scores, rows):
+        metadata = chunk['metadata']
+        start, end = metadata.get('char_start'), metadata.get('char_end')
+        item = {'text': chunk['page_content'], 'score': float(score), 'metadata': metadata,
+                'rows': [int(row)], 'char_start': start, 'char_end': end}
+        if start is None or end is None or start < 0:
+            loose.append(item)
+        else:
+            by_url.setdefault(metadata.get('url'), []).append(item)
+
+    spans = list(loose)
+    for items in by_url.values():
+        items.sort(key=lambda item: (item['char_start'], -item['char_end']))
+        current = items[0]
+        for item in items[1:]:
+            gap = item['char_start'] - current['char_end']
+            if gap <= ADJACENT_GAP_CHARS:
+                if item['char_end'] > current['char_end']:
+                    if gap > 0:
+                        current['text'] += "\n" * gap + item['text']
+                    else:
+                        current['text'] += item['text'][-gap:]
+                    current['char_end'] = item['char_end']
+                current['score'] = max(current['score'], item['score'])
+                current['rows'].extend(item['rows'])
+            else:
+                spans.append(current)
+                current = item
+        spans.append(current)
+
+    spans.sort(key=lambda span: -span['score'])
+    return spans
+
+
+def format_span(number, span):
+    metadata = span['metadata']
+    title = metadata.get('title') or metadata.get('name') or ""
+    return f"[{number}] {title} ({metadata.get('url')})\n{span['text']}"
+
+
+def _truncate(text, max_tokens):
+    encoding = get_encoding()
+    return encoding.decode(encoding.encode_ordinary(text)[:max_tokens])
+
+
+@metrics.timed("context.pack_seconds")
+def pack_context(chunks, scores=None, rows=None, max_tokens=CONTEXT_TOKENS):
+    """
+    Builds the numbered prompt context from retrieved chunks within a
+    token budget.
+
+    Overlapping chunks are merged per URL (`merge_spans`), spans whose text
+    was already used are dropped, and the highest-scoring spans are added
+    greedily while the whole context, headers and separators included,
+    stays within `max_tokens` as counted by the chunking encoding. A span
+    that does not fit is cut to the remaining budget when at least
+    MIN_SPAN_TOKENS remain, and skipped otherwise (a shorter later span may
+    still fit).
+
+    Args:
+        chunks (list): {'page_content', 'metadata'} chunks, best first.
+        scores (list): Relevance per chunk; reciprocal rank when None.
+        rows (list): Store row per chunk, for the citations.
+        max_tokens (int): Token budget for the context text.
+
+    Returns:
+        dict: {'text', 'tokens', 'citations'}; each citation has its number
+            `n`, title, url, source_urls, rows and character range.
+    """
+    blocks = []
+    citations = []
+    seen = set()
+    used = 0
+    for span in merge_spans(chunks, scores, rows):
+        digest = text_hash(span['text'])
+        if digest in seen:
+            continue
+        block = format_span(len(blocks) + 1, span)
+        candidate = SEPARATOR.join(blocks + [block])
+        tokens = count_tokens(candidate)
+        if tokens > max_tokens:
+            room = max_tokens - used - count_tokens(SEPARATOR if blocks else "")
+            if room < MIN_SPAN_TOKENS:
+                continue
+            block = _truncate(block, room)
+            candidate = SEPARATOR.join(blocks + [block])
+            tokens = count_tokens(candidate)
+            while tokens > max_tokens and block:
+                block = _truncate(block, count_tokens(block) - (tokens - max_tokens))
+                candidate = SEPARATOR.join(blocks + [block])
+                tokens = count_tokens(candidate)
+            if not block:
+                continue
+        seen.add(digest)
+        blocks.append(block)
+        used = tokens
+        metadata = span['metadata']
+        citations.append({
+            'n': len(blocks),
+            'title': metadata.get('title') or metadata.get('name'),
+            'url': metadata.get('url'),
+            'source_urls': metadata.get('source_urls') or [],
+            'rows': span['rows'],
+            'char_start': span['char_start'],
+            'char_end': span['char_end'],
+        })
+        if used >= max_tokens - MIN_SPAN_TOKENS:
+            break
+    return {'text': SEPARATOR.join(blocks), 'tokens': used, 'citations': citations}
@@ -0,0 +1,503 @@
+import argparse
+import os
+import re
+import sqlite3
+import threading
+import time
+from pathlib import Path
+
+from src.instrumentation import metrics
+from src.preprocessing.format_documents import PROCESSED_DATA_PATH, RAW_DATA_PATH
+from src.preprocessing.pipeline import load_raw_records
+from src.scraping.names import clean_character_name
+from src.scraping.storage import DEFAULT_STORE_ROOT
+
+
+DEFAULT_ENTITY_PATH = PROCESSED_DATA_PATH / "entities.sqlite"
+# rows per executemany while building
+INSERT_BATCH = 1000
+
+# Shortest name matched as part of a longer one ("Zoro" but not "D").
+MIN_PARTIAL_NAME = 3
+
+CHAPTER, EPISODE = 0, 1
+KIND_CODES = {'chapter': CHAPTER, 'episode': EPISODE}
+
+SCHEMA = """
+CREATE TABLE characters (
+    id INTEGER PRIMARY KEY,
+    key TEXT NOT NULL UNIQUE,
+    name TEXT NOT NULL,
+    url TEXT,
+    status TEXT,
+    affiliations TEXT,
+    bounty INTEGER,
+    manga_debut INTEGER,
+    anime_debut INTEGER
+);
+CREATE TABLE chapters (number INTEGER PRIMARY KEY, title TEXT, url TEXT, release_date TEXT);
+CREATE TABLE episodes (number INTEGER PRIMARY KEY, title TEXT, url TEXT, air_date TEXT);
+CREATE TABLE adaptations (
+    chapter INTEGER NOT NULL, episode INTEGER NOT NULL, PRIMARY KEY (chapter, episode)
+) WITHOUT ROWID;
+CREATE INDEX adaptations_episode ON adaptations (episode, chapter);
+CREATE TABLE appearances (
+    character INTEGER NOT NULL, kind INTEGER NOT NULL, number INTEGER NOT NULL,
+    PRIMARY KEY (character, kind, number)
+) WITHOUT ROWID;
+CREATE INDEX appearances_number ON appearances (kind, number, character);
+CREATE TABLE devil_fruits (
+    character INTEGER NOT NULL, english_name TEXT, japanese_name TEXT, meaning TEXT, type TEXT
+);
+CREATE INDEX characters_bounty ON characters (bounty DESC);
+"""
+
+_NUMBER = re.compile(r'\d+')
+_RANGE = re.compile(r'(\d+)(?:\s*[-–]\s*(\d+))?')
+
+
+def name_key(name):
+    return clean_character_name(name).casefold()
+
+
+def like_pattern(text):
+    """
+    `%text%` with LIKE wildcards in `text` escaped, for `LIKE ? ESCAPE '\\'`.
+    """
+    escaped = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"%{escaped}%"
+
+
+def parse_number(value):
+    """
+    First integer in a value ("Chapter 1", "1,500,000", 42), or None.
+    """
+    if isinstance(value, int):
+        return value
+    if not isinstance(value, str):
+        return None
+    match = _NUMBER.search(value.replace(',', ''))
+    return int(match.group()) if match else None
+
+
+def parse_chapter_ranges(source_chapters):
+    """
+    Expands an episode's `source_chapters` ("Chapter 1, Chapter 2-4 (p. 1-7)")
+    into chapter numbers. Parenthetical page notes are ignored.
+    """
+    if not isinstance(source_chapters, str):
+        return []
+    chapters = set()
+    for match in _RANGE.finditer(re.sub(r'\(.*?\)', '', source_chapters)):
+        low = int(match.group(1))
+        high = int(match.group(2)) if match.group(2) else low
+        if high < low or high - low > 100:
+            high = low
+        chapters.update(range(low, high + 1))
+    return sorted(chapters)
+
+
+def chapter_character_names(characters):
+    """
+    Flattens a chapter's nested {category: {subgroup: [names]}} table.
+    """
+    if not isinstance(characters, dict):
+        return []
+    names = []
+    for subgroups in characters.values():
+        if isinstance(subgroups, dict):
+            for members in subgroups.values():
+                names.extend(members or [])
+    return names
+
+
+def episode_character_names(characters):
+    if not isinstance(characters, str):
+        return []
+    return characters.split("\n")
+
+
+class _Builder:
+    """
+    Accumulates rows for the entity tables and writes them in batches.
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.ids = {}
+        self.rows = {'chapters': [], 'episodes': [], 'adaptations': [],
+                     'appearances': [], 'devil_fruits': []}
+        self.statements = {
+            'chapters': "INSERT OR REPLACE INTO chapters VALUES (?, ?, ?, ?)",
+            'episodes': "INSERT OR REPLACE INTO episodes VALUES (?, ?, ?, ?)",
+            'adaptations': "INSERT OR IGNORE INTO adaptations VALUES (?, ?)",
+            'appearances': "INSERT OR IGNORE INTO appearances VALUES (?, ?, ?)",
+            'devil_fruits': "INSERT INTO devil_fruits VALUES (?, ?, ?, ?, ?)",
+        }
+
+    def add(self, table, row):
+        rows = self.rows[table]
+        rows.append(row)
+        if len(rows) >= INSERT_BATCH:
+            self.flush(table)
+
+    def flush(self, table=None):
+        for name in [table] if table else list(self.rows):
+            if self.rows[name]:
+                self.conn.executemany(self.statements[name], self.rows[name])
+                self.rows[name] = []
+
+    def character_id(self, name):
+        """
+        Id of a character by name, inserting a bare row for unseen names.
+        """
+        key = name_key(name)
+        if not key:
+            return None
+        character = self.ids.get(key)
+        if character is None:
+            cursor = self.conn.execute("INSERT INTO characters (key, name) VALUES (?, ?)",
+                                       (key, clean_character_name(name)))
+            character = self.ids[key] = cursor.lastrowid
+        return character
+
+    def add_appearances(self, names, kind, number):
+        for name in names:
+            character = self.character_id(name)
+            if character is not None:
+                self.add('appearances', (character, kind, number))
+
+    def add_character(self, record):
+        name = record.get('name')
+        if not name or record.get('error'):
+            return
+        character = self.character_id(name)
+        affiliations = record.get('affiliations')
+        if isinstance(affiliations, list):
+            affiliations = "; ".join(affiliations)
+        self.conn.execute(
+            "UPDATE characters SET name = ?, url = ?, status = ?, affiliations = ?, bounty = ?,"
+            " manga_debut = ?, anime_debut = ? WHERE id = ?",
+            (clean_character_name(name), record.get('url'), record.get('status'), affiliations,
+             parse_number(record.get('bounty')), parse_number(record.get('manga_debut')),
+             parse_number(record.get('anime_debut')), character))
+        fruit = record.get('devil_fruit')
+        if isinstance(fruit, dict) and (fruit.get('english_name') or fruit.get('japanese_name')):
+            self.add('devil_fruits', (character, fruit.get('english_name'), fruit.get('japanese_name'),
+                                      fruit.get('meaning'), fruit.get('type')))
+
+
+def build_entity_index(path=DEFAULT_ENTITY_PATH, raw_dir=RAW_DATA_PATH,
+                       store_root=DEFAULT_STORE_ROOT):
+    """
+    Builds the entity index from the raw scraped records.
+
+    Characters come first so appearances attach to their rows; names seen
+    only in chapter/episode character lists get a bare row. The database is
+    written to a temporary file and swapped in, so readers never see a
+    half-built index.
+
+    Returns:
+        dict: Row counts per table.
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + ".tmp")
+    if tmp_path.exists():
+        tmp_path.unlink()
+
+    conn = sqlite3.connect(str(tmp_path))
+    conn.execute("PRAGMA journal_mode=OFF")
+    conn.execute("PRAGMA synchronous=OFF")
+    conn.executescript(SCHEMA)
+    builder = _Builder(conn)
+
+    for record in load_raw_records('characters', raw_dir, store_root):
+        builder.add_character(record)
+
+    for record in load_raw_records('chapters', raw_dir, store_root):
+        number = parse_number(record.get('chapter_number'))
+        if number is None:
+            continue
+        builder.add('chapters', (number, record.get('chapter_title'), record.get('url'),
+                                 record.get('release_date')))
+        builder.add_appearances(chapter_character_names(record.get('characters')), CHAPTER, number)
+
+    for record in load_raw_records('episodes', raw_dir, store_root):
+        number = parse_number(record.get('episode_number'))
+        if number is None:
+            continue
+        builder.add('episodes', (number, record.get('episode_title'), record.get('url'),
+                                 record.get('air_date')))
+        for chapter in parse_chapter_ranges(record.get('source_chapters')):
+            builder.add('adaptations', (chapter, number))
+        builder.add_appearances(episode_character_names(record.get('characters')), EPISODE, number)
+
+    builder.flush()
+    conn.commit()
+    counts = {table: conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+              for table in ('characters', 'chapters', 'episodes', 'adaptations',
+                            'appearances', 'devil_fruits')}
+    conn.execute("ANALYZE")
+    conn.close()
+    os.replace(tmp_path, path)
+    return counts
+
+
+class EntityIndex:
+    """
+    Read-only lookups over the entity index built by `build_entity_index`.
+
+    Every method is one or two indexed SQLite queries, so structured facts
+    (debuts, adaptations, devil fruit users, bounties) are answered without
+    an embedding call or an LLM round trip. `answer()` routes common
+    question phrasings to these lookups.
+
+    Args:
+        path (str | Path): SQLite file.
+    """
+
+    def __init__(self, path=DEFAULT_ENTITY_PATH):
+        self.path = Path(path)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(f"file:{self.path}?mode=ro", uri=True, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def _all(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchall()
+
+    def _one(self, sql, params=()):
+        with self._lock:
+            return self._conn.execute(sql, params).fetchone()
+
+    def character(self, name):
+        """
+        Looks a character up by exact name, else by the shortest name that
+        contains it as whole words ("Luffy" -> "Monkey D. Luffy"), preferring
+        scraped pages. Names shorter than MIN_PARTIAL_NAME only match exactly.
+
+        Returns:
+            dict: The character row, or None.
+        """
+        key = name_key(name)
+        if not key:
+            return None
+        row = self._one("SELECT * FROM characters WHERE key = ?", (key,))
+        if row is None and len(key) >= MIN_PARTIAL_NAME:
+            words = re.compile(rf'(?<!\w){re.escape(key)}(?!\w)')
+            candidates = self._all("SELECT * FROM characters WHERE key LIKE ? ESCAPE '\\'"
+                                   " ORDER BY url IS NULL, length(key)", (like_pattern(key),))
+            row = next((candidate for candidate in candidates if words.search(candidate['key'])),
+                       None)
+        return dict(row) if row is not None else None
+
+    def appearances(self, name, kind='chapter'):
+        """
+        Sorted chapter (or episode) numbers a character appears in.
+        """
+        character = self.character(name)
+        if character is None:
+            return []
+        return [row[0] for row in self._all(
+            "SELECT number FROM appearances WHERE character = ? AND kind = ? ORDER BY number",
+            (character['id'], KIND_CODES[kind]))]
+
+    def characters_in(self, kind, number):
+        """
+        Names of the characters appearing in a chapter or episode.
+        """
+        return [row[0] for row in self._all(
+            "SELECT c.name FROM appearances a JOIN characters c ON c.id = a.character"
+            " WHERE a.kind = ? AND a.number = ?", (KIND_CODES[kind], number))]
+
+    def episodes_for_chapter(self, chapter):
+        return [row[0] for row in self._all(
+            "SELECT episode FROM adaptations WHERE chapter = ? ORDER BY episode", (chapter,))]
+
+    def chapters_for_episode(self, episode):
+        return [row[0] for row in self._all(
+            "SELECT chapter FROM adaptations WHERE episode = ? ORDER BY chapter", (episode,))]
+
+    def fruit_users(self, fruit):
+        """
+        Characters whose devil fruit English or Japanese name contains `fruit`.
+
+        Returns:
+            list: (character name, english name, japanese name, type) tuples.
+        """
+        pattern = like_pattern(fruit.strip())
+        return [tuple(row) for row in self._all(
+            "SELECT c.name, f.english_name, f.japanese_name, f.type FROM devil_fruits f"
+            " JOIN characters c ON c.id = f.character"
+            " WHERE f.english_name LIKE ? ESCAPE '\\' OR f.japanese_name LIKE ? ESCAPE '\\'",
+            (pattern, pattern))]
+
+    def top_bounties(self, limit=10):
+        """
+        (name, bounty) pairs, highest bounty first.
+        """
+        return [tuple(row) for row in self._all(
+            "SELECT name, bounty FROM characters WHERE bounty IS NOT NULL"
+            " ORDER BY bounty DESC LIMIT ?", (limit,))]
+
+    def bounty_rank(self, name):
+        """
+        (bounty, 1-based rank) of a character, or None without a bounty.
+        """
+        character = self.character(name)
+        if character is None or character['bounty'] is None:
+            return None
+        higher = self._one("SELECT COUNT(*) FROM characters WHERE bounty > ?",
+                           (character['bounty'],))[0]
+        return character['bounty'], higher + 1
+
+    @metrics.timed("search.seconds", index="entities")
+    def answer(self, question):
+        """
+        Answers a structured question directly from the index.
+
+        Returns:
+            str: The answer, or None when the question is not one of the
+                supported patterns (the caller falls back to retrieval).
+        """
+        q = question.strip().rstrip('?').strip()
+        for pattern, handler in _QUESTION_HANDLERS:
+            match = pattern.search(q)
+            if match:
+                result = handler(self, match)
+                if result is not None:
+                    return result
+        return None
+
+
+def _format_numbers(numbers):
+    """
+    Compresses sorted numbers into ranges: [1, 2, 3, 7] -> "1-3, 7".
+    """
+    parts = []
+    start = previous = None
+    for number in numbers:
+        if previous is not None and number == previous + 1:
+            previous = number
+            continue
+        if start is not None:
+            parts.append(f"{start}-{previous}" if previous != start else str(start))
+        start = previous = number
+    if start is not None:
+        parts.append(f"{start}-{previous}" if previous != start else str(start))
+    return ", ".join(parts)
+
+
+def _answer_episodes(index, match):
+    chapter = int(match.group('number'))
+    episodes = index.episodes_for_chapter(chapter)
+    if not episodes:
+        return None
+    label = "Episode" if len(episodes) == 1 else "Episodes"
+    return f"Chapter {chapter} is adapted in {label} {_format_numbers(episodes)}."
+
+
+def _answer_chapters(index, match):
+    episode = int(match.group('number'))
+    chapters = index.chapters_for_episode(episode)
+    if not chapters:
+        return None
+    label = "Chapter" if len(chapters) == 1 else "Chapters"
+    return f"Episode {episode} adapts {label} {_format_numbers(chapters)}."
+
+
+def _answer_debut(index, match):
+    character = index.character(match.group('name'))
+    if character is None or (character['manga_debut'] is None and character['anime_debut'] is None):
+        return None
+    parts = []
+    if character['manga_debut'] is not None:
+        parts.append(f"Chapter {character['manga_debut']}")
+    if character['anime_debut'] is not None:
+        parts.append(f"Episode {character['anime_debut']}")
+    return f"{character['name']} debuted in {' and '.join(parts)}."
+
+
+def _answer_fruit(index, match):
+    users = index.fruit_users(match.group('fruit'))
+    if not users:
+        return None
+    return "; ".join(
+        f"{name} ate the {english or japanese}" + (f" ({fruit_type})" if fruit_type else "")
+        for name, english, japanese, fruit_type in users) + "."
+
+
+def _answer_bounty(index, match):
+    character = index.character(match.group('name'))
+    ranked = index.bounty_rank(match.group('name'))
+    if ranked is None:
+        return None
+    bounty, rank = ranked
+    return f"{character['name']}'s bounty is {bounty:,} berries (rank {rank} by bounty)."
+
+
+def _answer_top_bounties(index, match):
+    limit = int(match.group('limit') or 10)
+    rows = index.top_bounties(limit)
+    if not rows:
+        return None
+    return "\n".join(f"{i}. {name}: {bounty:,} berries" for i, (name, bounty) in enumerate(rows, 1))
+
+
+_QUESTION_HANDLERS = [
+    (re.compile(r'episodes?\b.*\b(?:adapt|cover|of|for)\w*\s+chapter\s+(?P<number>\d+)', re.I),
+     _answer_episodes),
+    (re.compile(r'chapter\s+(?P<number>\d+)\b.*\b(?:adapt|anime|episode)', re.I), _answer_episodes),
+    (re.compile(r'chapters?\b.*\b(?:does|did|in|of|for|by)\s+episode\s+(?P<number>\d+)', re.I),
+     _answer_chapters),
+    (re.compile(r'episode\s+(?P<number>\d+)\b.*\b(?:adapt|based|chapter)', re.I), _answer_chapters),
+    (re.compile(r'(?:top|highest|largest|biggest)\s+(?P<limit>\d+)?\s*bount', re.I),
+     _answer_top_bounties),
+    (re.compile(r"bounty of (?P<name>.+)$", re.I), _answer_bounty),
+    (re.compile(r"(?:what is|what's)\s+(?P<name>.+?)'s? bounty", re.I), _answer_bounty),
+    (re.compile(r"debut of (?P<name>.+)$", re.I), _answer_debut),
+    (re.compile(r"(?:what is|what's)\s+(?P<name>.+?)'s? debut", re.I), _answer_debut),
+    (re.compile(r"when did (?P<name>.+?) (?:first appear|debut)", re.I), _answer_debut),
+    (re.compile(r"who (?:ate|eats|has|uses|owns) (?:the )?(?P<fruit>.+)$", re.I), _answer_fruit),
+    (re.compile(r"user of (?:the )?(?P<fruit>.+)$", re.I), _answer_fruit),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build or query the structured entity index")
+    parser.add_argument("command", choices=["build", "ask"])
+    parser.add_argument("question", nargs="?")
+    parser.add_argument("--path", default=str(DEFAULT_ENTITY_PATH))
+    parser.add_argument("--raw-dir", default=str(RAW_DATA_PATH))
+    parser.add_argument("--store-root", default=str(DEFAULT_STORE_ROOT))
+    args = parser.parse_args()
+
+    if args.command == "build":
+        started = time.perf_counter()
+        counts = build_entity_index(args.path, args.raw_dir, args.store_root)
+        print(f"Built {args.path} in {time.perf_counter() - started:.1f}s")
+        for table, count in counts.items():
+            print(f"  {table}: {count}")
+        return
+
+    with EntityIndex(args.path) as index:
+        started = time.perf_counter()
+        answer = index.answer(args.question)
+        elapsed = (time.perf_counter() - started) * 1e6
+    print(answer if answer is not None else "No structured answer; use retrieval.")
+    print(f"({elapsed:.0f} us)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,197 @@
+import argparse
+import asyncio
+import functools
+import time
+from pathlib import Path
+
+from tqdm import tqdm
+
+from src.instrumentation import metrics
+from src.scraping import fetcher
+from src.scraping.parse_chapter import parse_chapter
+from src.scraping.parse_characters import parse_character
+from src.scraping.parse_episodes import parse_anime
+from src.scraping.storage import DEFAULT_STORE_ROOT, open_store
+
+
+ROOT = Path(__file__).resolve().parents[2]
+RAW_DATA_PATH = ROOT / "data" / "raw"
+BASE_URL = "https://onepiece.fandom.com/wiki/"
+
+# Latest chapter / episode numbers at the time of the last full crawl.
+DEFAULT_END = {'chapters': 1156, 'episodes': 1142}
+
+
+def _chapter_is_valid(data):
+    return bool(data) and data.get('chapter_number') is not None
+
+
+def _episode_is_valid(data):
+    return bool(data) and data.get('episode_number') is not None
+
+
+def _character_is_valid(data):
+    return bool(data) and 'error' not in data
+
+
+# kind -> (parser, validity check, indexed number field)
+TARGETS = {
+    'chapters': (parse_chapter, _chapter_is_valid, 'chapter_number'),
+    'episodes': (parse_anime, _episode_is_valid, 'episode_number'),
+    'characters': (parse_character, _character_is_valid, None),
+}
+
+
+def build_urls(kind, start=1, end=None, urls_file=None, base_url=BASE_URL):
+    """
+    Builds the list of URLs to crawl for a target.
+
+    Args:
+        kind (str): One of 'chapters', 'episodes' or 'characters'.
+        start (int): First chapter/episode number.
+        end (int): Last chapter/episode number (inclusive).
+        urls_file (str | Path): Text file with one character URL per line.
+        base_url (str): Wiki base URL, overridable for local fixtures.
+
+    Returns:
+        list: URLs in crawl order.
+    """
+    if kind == 'characters':
+        path = Path(urls_file) if urls_file else RAW_DATA_PATH / "one_piece_characters_urls.txt"
+        with open(path, "r", encoding="utf-8") as f:
+            return [line.strip() for line in f if line.strip()]
+
+    prefix = "Chapter_" if kind == 'chapters' else "Episode_"
+    return [f"{base_url}{prefix}{num}" for num in range(start, end + 1)]
+
+
+async def crawl_async(urls, parse_fn, concurrency=8, on_result=None, progress=None):
+    """
+    Runs `parse_fn` over `urls` with at most `concurrency` pages in flight.
+
+    The parsers are blocking, so each worker runs them on a thread; politeness
+    (per-host token bucket, Retry-After, backoff) is enforced by the shared
+    fetcher they all go through.
+
+    Args:
+        urls (list): URLs to crawl.
+        parse_fn (callable): Parser taking a URL and returning a dict or None.
+        concurrency (int): Number of pages fetched and parsed at once.
+        on_result (callable): Called as `on_result(url, data)` on the event
+            loop for every finished page, `data` being None on failure.
+        progress (tqdm): Optional progress bar updated once per page.
+    """
+    queue = asyncio.Queue()
+    for url in urls:
+        queue.put_nowait(url)
+
+    async def worker():
+        while True:
+            try:
+                url = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            try:
+                data = await asyncio.to_thread(parse_fn, url)
+            except Exception as e:
+                print(f"An error occurred parsing {url}: {e}")
+                data = None
+            if on_result:
+                on_result(url, data)
+            if progress is not None:
+                progress.update(1)
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+
+
+def crawl(kind, urls, store_root=DEFAULT_STORE_ROOT, concurrency=8, rate=4.0, burst=4,
+          max_retries=5, fast=False):
+    """
+    Crawls a target concurrently and appends successful records to its record store.
+
+    URLs already in the store (`data/raw/store/<kind>`) are skipped, so an
+    interrupted crawl resumes where it stopped.
+
+    Args:
+        kind (str): One of 'chapters', 'episodes' or 'characters'.
+        urls (list): URLs to crawl.
+        store_root (str | Path): Directory holding the record stores.
+        concurrency (int): Pages in flight at once.
+        rate (float): Sustained requests per second per host.
+        burst (int): Requests allowed back-to-back per host.
+        max_retries (int): Retries for throttled or failed requests.
+        fast (bool): Use the lxml content-only parse mode.
+
+    Returns:
+        dict: Counts of 'ok', 'failed' and 'skipped' pages.
+    """
+    parse_fn, is_valid, number_field = TARGETS[kind]
+    if fast:
+        parse_fn = functools.partial(parse_fn, fast=True)
+
+    store = open_store(kind, number_field=number_field, root=store_root)
+    todo = [url for url in urls if url not in store]
+    counts = {'ok': 0, 'failed': 0, 'skipped': len(urls) - len(todo)}
+    print(f"{len(todo)} {kind} to crawl ({counts['skipped']} already scraped).")
+
+    shared = fetcher.configure(pool_size=concurrency, rate=rate, burst=burst,
+                               max_retries=max_retries)
+    started = time.monotonic()
+
+    with store, tqdm(total=len(todo), desc=f"Crawling {kind}", unit="page") as progress:
+
+        def on_result(url, data):
+            if is_valid(data):
+                store.append(data)
+                counts['ok'] += 1
+                metrics.count("crawl.pages", kind=kind, outcome='ok')
+            else:
+                counts['failed'] += 1
+                metrics.count("crawl.pages", kind=kind, outcome='failed')
+            elapsed = time.monotonic() - started
+            progress.set_postfix(
+                ok=counts['ok'], failed=counts['failed'],
+                rate=f"{(counts['ok'] + counts['failed']) / elapsed:.1f}/s",
+                cached=shared.stats['not_modified'],
+                throttled=shared.stats['throttled'], refresh=False)
+
+        asyncio.run(crawl_async(todo, parse_fn, concurrency=concurrency,
+                                on_result=on_result, progress=progress))
+
+    elapsed = time.monotonic() - started
+    print(f"Crawl complete in {elapsed:.1f}s: {counts['ok']} ok, {counts['failed']} failed. "
+          f"Fetcher stats: {shared.stats}")
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Concurrent One Piece wiki crawler")
+    parser.add_argument("kind", choices=sorted(TARGETS))
+    parser.add_argument("--start", type=int, default=1)
+    parser.add_argument("--end", type=int, help="Defaults to the latest known number")
+    parser.add_argument("--urls-file", help="Character URL list (characters only)")
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--store-root", default=str(DEFAULT_STORE_ROOT),
+                        help="Directory holding the record stores")
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=4.0,
+                        help="Requests per second per host")
+    parser.add_argument("--burst", type=int, default=4)
+    parser.add_argument("--max-retries", type=int, default=5)
+    parser.add_argument("--fast", action="store_true",
+                        help="Parse only infobox and main content with lxml")
+    metrics.add_arguments(parser)
+    args = parser.parse_args()
+    metrics.start(args)
+
+    end = args.end or DEFAULT_END.get(args.kind)
+    urls = build_urls(args.kind, start=args.start, end=end,
+                      urls_file=args.urls_file, base_url=args.base_url)
+    crawl(args.kind, urls, store_root=args.store_root, concurrency=args.concurrency,
+          rate=args.rate, burst=args.burst, max_retries=args.max_retries,
+          fast=args.fast)
+    metrics.finish(args, command="crawl", kind=args.kind)
+
+
+if __name__ == "__main__":
+    main()
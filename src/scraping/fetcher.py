@@ -0,0 +1,241 @@
+import threading
+import time
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from src.instrumentation import metrics
+from src.scraping.html_store import DEFAULT_STORE_DIR, HtmlStore
+from src.scraping.ratelimit import HostRateLimiter, backoff_delay, parse_retry_after
+
+
+DEFAULT_HEADERS = {
+    'User-Agent': 'OnePieceRAGBot/1.0 (Learning Project; contact: jfcastaneda.led@gmail.com)',
+    'Accept-Encoding': 'gzip, deflate',
+}
+
+# Statuses worth retrying: throttling plus transient server/gateway errors.
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+
+class FetchedPage:
+    """
+    Minimal response object returned by the fetcher.
+
+    Exposes the parts of `requests.Response` the parsers rely on
+    (`status_code`, `content`, `raise_for_status`) and records whether the
+    body was served from the raw HTML store after a 304.
+    """
+
+    def __init__(self, url, status_code, content, headers=None, from_cache=False):
+        self.url = url
+        self.status_code = status_code
+        self.content = content
+        self.headers = headers or {}
+        self.from_cache = from_cache
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise requests.exceptions.HTTPError(
+                f"{self.status_code} Error for url: {self.url}")
+
+
+class Fetcher:
+    """
+    Pooled keep-alive HTTP client shared by all scrapers.
+
+    Args:
+        pool_size (int): Number of keep-alive connections kept per host.
+        headers (dict): Default headers sent with every request.
+        store (HtmlStore): Raw page store. Every 200 is written to it and its
+            ETag / Last-Modified validators are used for conditional GETs.
+            None always downloads the full page and keeps nothing.
+        timeout (float): Default request timeout in seconds.
+        rate_limiter (HostRateLimiter): Per-host limiter consulted before
+            every request, or None for no throttling.
+        max_retries (int): Retries for 429/5xx responses and connection
+            errors. 429 and 503 honor Retry-After, everything else uses
+            exponential backoff with jitter.
+    """
+
+    def __init__(self, pool_size=10, headers=None, store=None, timeout=10,
+                 rate_limiter=None, max_retries=0):
+        self.timeout = timeout
+        self.store = store
+        self.rate_limiter = rate_limiter
+        self.max_retries = max_retries
+        self.stats = {'requests': 0, 'not_modified': 0,
+                      'throttled': 0, 'retries': 0, 'errors': 0}
+        self._stats_lock = threading.Lock()
+        self.session = requests.Session()
+        self.session.headers.update(DEFAULT_HEADERS)
+        if headers:
+            self.session.headers.update(headers)
+
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def fetch(self, url, headers=None, timeout=None):
+        """
+        Fetches a page, revalidating against the store when possible.
+
+        Args:
+            url (str): The URL of the page to fetch.
+            headers (dict): Extra headers for this request only.
+            timeout (float): Overrides the default timeout.
+
+        Returns:
+            FetchedPage: The page. A 304 is returned as a 200 carrying the
+            stored body with `from_cache=True`.
+
+        Raises:
+            requests.exceptions.RequestException: On network errors.
+        """
+        request_headers = dict(headers) if headers else {}
+        validators = self.store.validators(url) if self.store is not None else None
+        if validators:
+            etag, last_modified = validators
+            if etag:
+                request_headers['If-None-Match'] = etag
+            if last_modified:
+                request_headers['If-Modified-Since'] = last_modified
+
+        response = self._get_with_retries(url, request_headers, timeout or self.timeout)
+
+        if response.status_code == 304 and validators:
+            content = self.store.read(url)
+            if content is not None:
+                self._count('not_modified')
+                return FetchedPage(url, 200, content,
+                                   headers=response.headers, from_cache=True)
+            # The stored body went missing; fetch it again unconditionally.
+            response = self._get_with_retries(url, dict(headers or {}),
+                                              timeout or self.timeout)
+
+        if response.status_code == 200 and self.store is not None:
+            self.store.put(url, response.content,
+                           etag=response.headers.get('ETag'),
+                           last_modified=response.headers.get('Last-Modified'))
+
+        return FetchedPage(url, response.status_code, response.content,
+                           headers=response.headers)
+
+    def get(self, url, params=None, headers=None, timeout=None):
+        """
+        Plain GET through the pooled session, rate limiter and retries,
+        bypassing the HTML store (for API calls).
+
+        Returns:
+            requests.Response: The final response.
+        """
+        return self._get_with_retries(url, dict(headers or {}), timeout or self.timeout,
+                                      params=params)
+
+    def _count(self, key):
+        with self._stats_lock:
+            self.stats[key] += 1
+
+    def _get_with_retries(self, url, headers, timeout, params=None):
+        attempt = 0
+        while True:
+            if self.rate_limiter:
+                self.rate_limiter.acquire(url)
+            self._count('requests')
+
+            try:
+                with metrics.timer("fetch.request_seconds"):
+                    response = self.session.get(url, params=params, headers=headers,
+                                                timeout=timeout)
+            except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+                self._count('errors')
+                metrics.count("fetch.errors", error=type(e).__name__)
+                if attempt >= self.max_retries:
+                    raise
+                time.sleep(backoff_delay(attempt))
+                attempt += 1
+                self._count('retries')
+                continue
+
+            metrics.count("fetch.responses", status=response.status_code)
+            if response.status_code not in RETRY_STATUSES:
+                return response
+
+            if response.status_code == 429:
+                self._count('throttled')
+            delay = None
+            if response.status_code in (429, 503):
+                delay = parse_retry_after(response.headers.get('Retry-After'))
+            if delay is None:
+                delay = backoff_delay(attempt)
+            # Pausing the host's bucket holds back every worker, not just this one.
+            if self.rate_limiter:
+                self.rate_limiter.pause(url, delay)
+
+            if attempt >= self.max_retries:
+                return response
+            if not self.rate_limiter:
+                time.sleep(delay)
+            attempt += 1
+            self._count('retries')
+
+
+_default_fetcher = None
+_default_lock = threading.Lock()
+
+
+def configure(pool_size=10, headers=None, store_dir=DEFAULT_STORE_DIR, timeout=10,
+              rate=None, burst=4, max_retries=0):
+    """
+    Replaces the shared fetcher used by the parsers.
+
+    Args:
+        pool_size (int): Keep-alive connections kept per host.
+        headers (dict): Default headers sent with every request.
+        store_dir (str | Path): Raw HTML store directory, or None to neither
+            keep pages nor send conditional GETs.
+        timeout (float): Default request timeout in seconds.
+        rate (float): Requests per second allowed per host, or None to
+            disable throttling.
+        burst (int): Token bucket size for the per-host limiter.
+        max_retries (int): Retries for throttled/failed requests.
+
+    Returns:
+        Fetcher: The new shared fetcher.
+    """
+    global _default_fetcher
+    store = HtmlStore(store_dir) if store_dir else None
+    rate_limiter = HostRateLimiter(rate=rate, burst=burst) if rate else None
+    with _default_lock:
+        _default_fetcher = Fetcher(pool_size=pool_size, headers=headers,
+                                   store=store, timeout=timeout,
+                                   rate_limiter=rate_limiter,
+                                   max_retries=max_retries)
+    return _default_fetcher
+
+
+def get_fetcher():
+    """
+    Returns the shared fetcher, creating it with default settings on first use.
+    """
+    global _default_fetcher
+    if _default_fetcher is None:
+        with _default_lock:
+            if _default_fetcher is None:
+                _default_fetcher = Fetcher(store=HtmlStore(DEFAULT_STORE_DIR))
+    return _default_fetcher
+
+
+def fetch_page(url, headers=None, timeout=None):
+    """
+    Fetches a page through the shared fetcher.
+
+    Args:
+        url (str): The URL of the page to fetch.
+        headers (dict): Extra headers for this request only.
+        timeout (float): Overrides the default timeout.
+
+    Returns:
+        FetchedPage: The fetched page.
+    """
+    return get_fetcher().fetch(url, headers=headers, timeout=timeout)
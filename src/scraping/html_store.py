@@ -0,0 +1,152 @@
+import gzip
+import hashlib
+import json
+import os
+import threading
+import time
+from pathlib import Path
+
+try:
+    import zstandard
+except ImportError:  # optional, gzip is used when it is not installed
+    zstandard = None
+
+
+ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_STORE_DIR = ROOT / "data" / "raw" / "html"
+
+
+def _compress(content):
+    if zstandard is not None:
+        return 'zst', zstandard.ZstdCompressor(level=10).compress(content)
+    return 'gz', gzip.compress(content, compresslevel=6)
+
+
+def _decompress(codec, data):
+    if codec == 'zst':
+        if zstandard is None:
+            raise RuntimeError("zstandard is required to read .zst pages")
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+
+class HtmlStore:
+    """
+    Compressed, content-addressed store of raw wiki pages.
+
+    Page bodies live in `objects/<sha[:2]>/<sha256>.html.<codec>` so an
+    unchanged page is stored once no matter how often it is fetched.
+    `index.jsonl` maps each URL to its current content hash and HTTP
+    validators; it is append-only and the last entry per URL wins.
+
+    Args:
+        root (str | Path): Store directory, defaults to `data/raw/html`.
+    """
+
+    def __init__(self, root=DEFAULT_STORE_DIR):
+        self.root = Path(root)
+        self.objects_dir = self.root / "objects"
+        self.index_path = self.root / "index.jsonl"
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._index = {}
+
+        if self.index_path.exists():
+            with open(self.index_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        # A crash mid-append can leave a partial last line.
+                        continue
+                    self._index[entry['url']] = entry
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, url):
+        return url in self._index
+
+    def urls(self):
+        """
+        Returns all stored URLs in first-seen order.
+        """
+        return list(self._index)
+
+    def entry(self, url):
+        """
+        Returns the index entry for a URL, or None.
+        """
+        return self._index.get(url)
+
+    def _object_path(self, sha256, codec):
+        return self.objects_dir / sha256[:2] / f"{sha256}.html.{codec}"
+
+    def read(self, url):
+        """
+        Returns the stored raw HTML bytes for a URL, or None.
+        """
+        entry = self._index.get(url)
+        if not entry:
+            return None
+        try:
+            data = self._object_path(entry['sha256'], entry['codec']).read_bytes()
+        except OSError:
+            return None
+        return _decompress(entry['codec'], data)
+
+    def validators(self, url):
+        """
+        Returns the (etag, last_modified) pair recorded for a URL, or None.
+        """
+        entry = self._index.get(url)
+        if not entry or not (entry.get('etag') or entry.get('last_modified')):
+            return None
+        return entry.get('etag'), entry.get('last_modified')
+
+    def put(self, url, content, etag=None, last_modified=None):
+        """
+        Stores a page body and records it as the current version of `url`.
+
+        Args:
+            url (str): Page URL.
+            content (bytes): Raw HTML as downloaded.
+            etag (str): ETag response header, if any.
+            last_modified (str): Last-Modified response header, if any.
+
+        Returns:
+            str: The sha256 content hash of the page.
+        """
+        sha256 = hashlib.sha256(content).hexdigest()
+
+        with self._lock:
+            current = self._index.get(url)
+            if (current and current['sha256'] == sha256
+                    and current.get('etag') == etag
+                    and current.get('last_modified') == last_modified):
+                return sha256
+
+            codec = current['codec'] if current and current['sha256'] == sha256 else None
+            if codec is None:
+                codec, data = _compress(content)
+                path = self._object_path(sha256, codec)
+                if not path.exists():
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    tmp_path = path.with_suffix(path.suffix + ".tmp")
+                    tmp_path.write_bytes(data)
+                    os.replace(tmp_path, path)
+
+            entry = {
+                'url': url,
+                'sha256': sha256,
+                'codec': codec,
+                'size': len(content),
+                'etag': etag,
+                'last_modified': last_modified,
+                'fetched_at': time.strftime('%Y-%m-%d %H:%M:%S'),
+            }
+            with open(self.index_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(entry) + "\n")
+            self._index[url] = entry
+
+        return sha256
@@ -0,0 +1,150 @@
+from bs4 import NavigableString, Tag
+
+
+def normalize_label(text):
+    """
+    Normalizes an infobox label for lookups: 'Occupations:' -> 'occupations'.
+    """
+    return text.strip().rstrip(':').strip().lower()
+
+
+class InfoboxFields:
+    """
+    Label -> value map of an `aside.portable-infobox`, built in one traversal.
+
+    Citations (`<sup>`) are stripped once up front. Both infobox layouts are
+    covered:
+
+    - the standard layout, where each field is a `div.pi-data` holding an
+      `h3` label and a `div.pi-data-value`, optionally inside a
+      `section.pi-group` introduced by an `h2.pi-header`;
+    - the dense minor-character layout, where several fields share one value
+      div as `<b>Label:</b> value <b>Label:</b> value`.
+
+    Args:
+        infobox (Tag): The `aside.portable-infobox` element.
+    """
+
+    def __init__(self, infobox):
+        for sup in infobox.find_all('sup'):
+            sup.decompose()
+
+        self.title = None
+        # (normalized label, raw label, value tag) in document order
+        self.items = []
+        # every div.pi-data-value in document order
+        self.values = []
+        # group header text -> (index into items, index into values)
+        self.groups = {}
+        # data-source attribute -> the field container
+        self.sources = {}
+        # normalized <b> label -> text up to the next <b>
+        self.inline = {}
+
+        for node in infobox.descendants:
+            if not isinstance(node, Tag):
+                continue
+            classes = node.get('class') or []
+
+            if node.name == 'h2':
+                text = node.get_text(strip=True)
+                if 'pi-title' in classes and self.title is None:
+                    self.title = text
+                if text not in self.groups:
+                    self.groups[text] = (len(self.items), len(self.values))
+            elif node.name == 'h3':
+                label = node.get_text(strip=True)
+                self.items.append(
+                    (normalize_label(label), label, node.find_next_sibling('div')))
+            elif node.name == 'div':
+                if 'pi-data-value' in classes:
+                    self.values.append(node)
+                source = node.get('data-source')
+                if source and source not in self.sources:
+                    self.sources[source] = node
+            elif node.name == 'b':
+                label = normalize_label(node.get_text(strip=True))
+                if label and label not in self.inline:
+                    self.inline[label] = self._inline_value(node)
+
+    @staticmethod
+    def _inline_value(label_tag):
+        parts = []
+        for sibling in label_tag.next_siblings:
+            if getattr(sibling, 'name', None) == 'b':
+                break
+            text = sibling if isinstance(sibling, NavigableString) else sibling.get_text()
+            cleaned = text.strip().replace(':', '').strip()
+            if cleaned:
+                parts.append(cleaned)
+        return " ".join(parts)
+
+    def value_tag(self, keyword):
+        """
+        Returns the value div of the first field whose label contains `keyword`.
+        """
+        keyword = keyword.lower()
+        for label, _, value in self.items:
+            if keyword in label and value is not None:
+                return value
+        return None
+
+    def text(self, keyword):
+        """
+        Returns the stripped text of the first field whose label contains `keyword`.
+        """
+        value = self.value_tag(keyword)
+        return value.get_text(strip=True) if value is not None else None
+
+    def inline_text(self, keyword):
+        """
+        Returns the `<b>`-layout value whose label contains `keyword`, or None.
+        """
+        keyword = keyword.lower()
+        for label, value in self.inline.items():
+            if keyword in label:
+                return value
+        return None
+
+    def group_text(self, group):
+        """
+        Returns the text of the first value at or after the `group` header.
+        """
+        if group not in self.groups:
+            return None
+        _, value_index = self.groups[group]
+        if value_index >= len(self.values):
+            return None
+        return self.values[value_index].get_text(strip=True)
+
+    def group_field_text(self, group, label):
+        """
+        Returns the text of the field labelled exactly `label` at or after the
+        `group` header.
+        """
+        if group not in self.groups:
+            return None
+        item_index, _ = self.groups[group]
+        for _, raw_label, value in self.items[item_index:]:
+            if raw_label == label and value is not None:
+                return value.get_text(strip=True)
+        return None
+
+    def source(self, key):
+        """
+        Returns the field container with the given `data-source`, or None.
+        """
+        return self.sources.get(key)
+
+
+def extract_infobox_fields(infobox):
+    """
+    Builds the label -> value map of a portable infobox in one traversal.
+
+    Args:
+        infobox (Tag): The `aside.portable-infobox` element.
+
+    Returns:
+        InfoboxFields: The normalized field map.
+    """
+    return InfoboxFields(infobox)
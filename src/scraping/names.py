@@ -0,0 +1,9 @@
+import re
+
+
+def clean_character_name(name):
+    """
+    Removes parenthetical notes like (flashback), (cover), etc., and strips whitespace.
+    """
+    cleaned_name = re.sub(r'\s*\(.*?\)', '', name)
+    return cleaned_name.strip()
@@ -1,30 +1,40 @@
 import requests
-from bs4 import BeautifulSoup
 import re
 from dateutil.parser import parse
 import json
 
+from src.instrumentation import metrics
+from src.scraping.fetcher import fetch_page
+from src.scraping.sections import index_sections
+from src.scraping.soup import make_soup
 
-def parse_chapter(url, headers=None):
+
+@metrics.timed("parse.page_seconds", kind="chapters")
+def parse_chapter(url, headers=None, html=None, fast=False):
     """
     Fetches and parses single chapter page from One Piece Fandom wiki.
     Returns dictionary of chapter data
     Missing fields are set to None
+    If `html` (raw page bytes) is given, it is parsed instead of fetching `url`.
+    `fast=True` parses only the infobox and main content with lxml.
     """
 
-    # SAFEGUARD: Handle network errors and bad HTTP responses upfront.
-    try:
-        response = requests.get(url, timeout=10, headers=headers)
-        if response.status_code != 200:
-            print(
-                f"Failed to retrieve the page {url}. Status code: {response.status_code}")
+    if html is None:
+        # SAFEGUARD: Handle network errors and bad HTTP responses upfront.
+        try:
+            response = fetch_page(url, headers=headers, timeout=10)
+            if response.status_code != 200:
+                print(
+                    f"Failed to retrieve the page {url}. Status code: {response.status_code}")
+                return None
+        except requests.exceptions.RequestException as e:
+            print(f"An error occurred fetching {url}: {e}")
             return None
-    except requests.exceptions.RequestException as e:
-        print(f"An error occurred fetching {url}: {e}")
-        return None
+        html = response.content
 
     # if request is successful, parse the content
-    soup = BeautifulSoup(response.content, 'html.parser')
+    soup = make_soup(html, fast=fast)
+    laps = metrics.lap_timer("parse.section_seconds", kind="chapters")
     chapter_data = {
         'url': url,
     }
@@ -65,18 +75,22 @@ def parse_chapter(url, headers=None):
         chapter_data['chapter_title'] = None
         chapter_data['chapter_number'] = None
         chapter_data['release_date'] = None
+    laps.lap("infobox")
 
     main_content = soup.find('div', class_='mw-parser-output')
 
     if main_content:
         print("Extracting main content data...")
+        sections = index_sections(main_content)
+        laps.lap("index_sections")
+
         # Short summary
         try:
-            heading = main_content.find('span', id='Short_Summary')
-            if heading:
-                # Use a loop to find all subsequent <p> tags until the next heading
+            section = sections.get('Short_Summary')
+            if section:
+                # Collect the <p> tags right after the heading
                 summary_ps = []
-                for sibling in heading.find_parent('h2').find_next_siblings():
+                for sibling in section.nodes:
                     if sibling.name == 'p':
                         summary_ps.append(sibling.get_text(strip=True))
                     else:
@@ -88,26 +102,19 @@ def parse_chapter(url, headers=None):
                 chapter_data['short_summary'] = None
         except AttributeError:
             chapter_data['short_summary'] = None
+        laps.lap("short_summary")
 
         # Long Summary
         try:
             # Find the heading, trying the ID first, then falling back to text search.
-            heading = main_content.find('span', id='Long_Summary')
-            if not heading:
-                all_spans = main_content.find_all('span', class_='mw-headline')
-                for span in all_spans:
-                    if span.get_text(strip=True) == "Long Summary":
-                        heading = span
-                        break
+            section = sections.get('Long_Summary') or sections.find_title("Long Summary")
 
             # If a heading was found, parse all content that follows it.
-            if heading:
-                # Find the parent heading tag (h2, h3, etc.) to start from.
-                parent_heading = heading.find_parent(re.compile(r'h[1-6]'))
+            if section:
                 summary_ps = []
 
                 # Iterate through all tags that come AFTER the heading.
-                for sibling in parent_heading.find_next_siblings():
+                for sibling in section.nodes:
                     # Stop condition: If we hit the next major heading, the section is over.
                     if sibling.name in ['h2', 'h3']:
                         break
@@ -128,13 +135,13 @@ def parse_chapter(url, headers=None):
         except AttributeError:
             # Catch any other unexpected parsing errors.
             chapter_data['long_summary'] = None
+        laps.lap("long_summary")
 
         # Characters
         try:
-            chars_heading = main_content.find('span', id='Characters')
-            if chars_heading:
-                table_tag = chars_heading.find_parent(
-                    'h3').find_next_sibling('table', class_='CharTable')
+            section = sections.get('Characters')
+            if section:
+                table_tag = section.first('table', class_='CharTable')
                 if table_tag:
                     character_groups = {}
                     rows = table_tag.find('tbody').find_all('tr')
@@ -189,12 +196,13 @@ def parse_chapter(url, headers=None):
         except (AttributeError, IndexError) as e:
             print(f"An error occurred while extracting characters: {e}")
             chapter_data['characters'] = None
+        laps.lap("characters")
 
         # Trivia
         try:
-            heading = main_content.find('span', id='Trivia')
-            if heading:
-                ul = heading.find_parent('h2').find_next_sibling('ul')
+            section = sections.get('Trivia')
+            if section:
+                ul = section.first('ul')
                 trivia = [li.get_text(strip=True)
                           for li in ul.find_all('li', recursive=False)]
                 chapter_data['trivia'] = "\n".join(trivia)
@@ -202,6 +210,7 @@ def parse_chapter(url, headers=None):
                 chapter_data['trivia'] = None
         except AttributeError:
             chapter_data['trivia'] = None
+        laps.lap("trivia")
 
     else:
         print("No main content found.")
@@ -1,14 +1,20 @@
 import requests
-from bs4 import BeautifulSoup
 import re
 
+from src.instrumentation import metrics
+from src.scraping.fetcher import fetch_page
+from src.scraping.infobox import extract_infobox_fields
+from src.scraping.sections import index_sections
+from src.scraping.soup import make_soup
 
-def get_page_soup(url):
+
+def get_page_soup(url, fast=False):
     """
     Fetches the content from a URL and returns a BeautifulSoup object.
 
     Args:
         url (str): The URL of the page to scrape.
+        fast (bool): Parse only the infobox and main content with lxml.
 
     Returns:
         BeautifulSoup: The parsed BeautifulSoup object of the page, or None if an error occurs.
@@ -17,9 +23,9 @@ def get_page_soup(url):
         'User-Agent': 'OnePieceRAGBot/1.0 Character Parser - jfcastaneda.led@gmail.com'
     }
     try:
-        response = requests.get(url, headers=scraper_headers)
+        response = fetch_page(url, headers=scraper_headers)
         response.raise_for_status()  # Raise an exception for bad status codes (4xx or 5xx)
-        return BeautifulSoup(response.content, 'html.parser')
+        return make_soup(response.content, fast=fast)
     except requests.exceptions.RequestException as e:
         print(f"Error fetching {url}: {e}")
         return None
@@ -42,39 +48,25 @@ def parse_infobox(soup):
     if not infobox:
         return {'error': 'No infobox found'}
 
+    # Build the label -> value map once; every field below reads from it
+    fields = extract_infobox_fields(infobox)
+
     # Parse name
-    try:
-        character_data['name'] = infobox.find(
-            'h2', class_='pi-title').get_text(strip=True)
-    except AttributeError:
-        character_data['name'] = None
+    character_data['name'] = fields.title
 
     # Parse affiliations
     try:
         affiliations = None
-        label_tag = infobox.find('h3', string=re.compile("Affiliations"))
-        if label_tag:
-            value_tag = label_tag.find_next_sibling('div')
-            if value_tag:
-                affiliation_links = value_tag.find_all('a')
-                affiliation_names = [link.get_text(
-                    strip=True) for link in affiliation_links]
-                affiliations = ", ".join(
-                    affiliation_names) if affiliation_names else None
+        value_tag = fields.value_tag("Affiliations")
+        if value_tag:
+            affiliation_names = [link.get_text(strip=True)
+                                 for link in value_tag.find_all('a')]
+            affiliations = ", ".join(
+                affiliation_names) if affiliation_names else None
 
         # Fallback
         if not affiliations:
-            label_tag = infobox.find('b', string=re.compile("Affiliations:"))
-            if label_tag:
-                value_parts = []
-                for sibling in label_tag.next_siblings:
-                    if getattr(sibling, 'name', None) == 'b':
-                        break
-                    if isinstance(sibling, str):
-                        cleaned = sibling.strip().replace(':', '').strip()
-                        if cleaned:
-                            value_parts.append(cleaned)
-                affiliations = " ".join(value_parts)
+            affiliations = fields.inline_text("Affiliations")
 
         character_data['affiliations'] = affiliations
     except:
@@ -83,169 +75,49 @@ def parse_infobox(soup):
     # Parse occupation
     try:
         occupations = None
-        label_tag = infobox.find('h3', string=re.compile("Occupation"))
-        if label_tag:
-            value_tag = label_tag.find_next_sibling('div')
-            if value_tag:
-                for sup in value_tag.find_all('sup'):
-                    sup.decompose()
+        value_tag = fields.value_tag("Occupation")
+        if value_tag:
+            occupation_list = [text.strip().replace(';', '')
+                               for text in value_tag.stripped_strings]
 
-                occupation_list = [text.strip().replace(';', '')
-                                   for text in value_tag.stripped_strings]
+            final_list = []
+            for item in occupation_list:
+                if item.startswith('(') and final_list:
+                    final_list[-1] += f" {item}"
+                else:
+                    final_list.append(item)
 
-                final_list = []
-                for item in occupation_list:
-                    if item.startswith('(') and final_list:
-                        final_list[-1] += f" {item}"
-                    else:
-                        final_list.append(item)
-
-                occupations = ", ".join(final_list) if final_list else None
+            occupations = ", ".join(final_list) if final_list else None
 
         # Fallback
         if not occupations:
-            label_tag = infobox.find('b', string=re.compile("Occupation(s)?:"))
-            if label_tag:
-                value_parts = []
-                for sibling in label_tag.next_siblings:
-                    if getattr(sibling, 'name', None) == 'b':
-                        break
-                    if isinstance(sibling, str):
-                        cleaned = sibling.strip().replace(':', '').strip()
-                        if cleaned:
-                            value_parts.append(cleaned)
-                occupations = " ".join(value_parts)
+            occupations = fields.inline_text("Occupation")
 
         character_data['occupations'] = occupations
     except:
         character_data['occupations'] = None
 
-    # Parse origin
-    try:
-        origin = None
-        origin_section = infobox.find('h2', string='Origin')
-        if origin_section:
-            origin_div = origin_section.find_next(
-                'div', class_='pi-data-value')
-            if origin_div:
-                origin = origin_div.get_text(strip=True)
-
-        if not origin:
-            label_tag = infobox.find('h3', string=re.compile("Origin"))
-            if label_tag:
-                value_tag = label_tag.find_next_sibling('div')
-                if value_tag:
-                    origin = value_tag.get_text(strip=True)
-
-        character_data['origin'] = origin
-    except:
-        character_data['origin'] = None
-
-    # Parse residence
-    try:
-        residence = None
-        residence_section = infobox.find('h2', string='Residence')
-        if residence_section:
-            residence_div = residence_section.find_next(
-                'div', class_='pi-data-value')
-            if residence_div:
-                residence = residence_div.get_text(strip=True)
-
-        if not residence:
-            label_tag = infobox.find('h3', string=re.compile("Residence"))
-            if label_tag:
-                value_tag = label_tag.find_next_sibling('div')
-                if value_tag:
-                    residence = value_tag.get_text(strip=True)
-
-        character_data['residence'] = residence
-    except:
-        character_data['residence'] = None
-
-    # Parse birthday
-    try:
-        birthday = None
-        birthday_section = infobox.find('h2', string='Birthday')
-        if birthday_section:
-            birthday_div = birthday_section.find_next(
-                'div', class_='pi-data-value')
-            if birthday_div:
-                birthday = birthday_div.get_text(strip=True)
-
-        if not birthday:
-            label_tag = infobox.find('h3', string=re.compile("Birthday"))
-            if label_tag:
-                value_tag = label_tag.find_next_sibling('div')
-                if value_tag:
-                    birthday = value_tag.get_text(strip=True)
-
-        character_data['birthday'] = birthday
-    except:
-        character_data['birthday'] = None
-
-    # Parse status
-    try:
-        status = None
-        status_section = infobox.find('h2', string='Status')
-        if status_section:
-            status_div = status_section.find_next(
-                'div', class_='pi-data-value')
-            if status_div:
-                status = status_div.get_text(strip=True)
-
-        if not status:
-            label_tag = infobox.find('h3', string=re.compile("Status"))
-            if label_tag:
-                value_tag = label_tag.find_next_sibling('div')
-                if value_tag:
-                    status = value_tag.get_text(strip=True)
-
-        character_data['status'] = status
-    except:
-        character_data['status'] = None
+    # Parse origin, residence, birthday and status: a dedicated group first,
+    # then the standard label
+    for key, label in [('origin', 'Origin'), ('residence', 'Residence'),
+                       ('birthday', 'Birthday'), ('status', 'Status')]:
+        try:
+            character_data[key] = fields.group_text(label) or fields.text(label)
+        except:
+            character_data[key] = None
 
     # Parse devil fruit
     try:
         devil_fruit_data = {
-            'english_name': None,
-            'japanese_name': None,
-            'meaning': None,
-            'type': None
+            'english_name': fields.group_field_text('Devil Fruit', 'English Name:'),
+            'japanese_name': fields.group_field_text('Devil Fruit', 'Japanese Name:'),
+            'meaning': fields.group_field_text('Devil Fruit', 'Meaning:'),
+            'type': fields.group_field_text('Devil Fruit', 'Type:'),
         }
 
-        df_section = infobox.find(
-            'h2', class_='pi-header', string='Devil Fruit')
-
-        if df_section:
-            eng_name_tag = df_section.find_next('h3', string='English Name:')
-            if eng_name_tag:
-                devil_fruit_data['english_name'] = eng_name_tag.find_next_sibling(
-                    'div').get_text(strip=True)
-
-            jpn_name_tag = df_section.find_next('h3', string='Japanese Name:')
-            if jpn_name_tag:
-                devil_fruit_data['japanese_name'] = jpn_name_tag.find_next_sibling(
-                    'div').get_text(strip=True)
-
-            meaning_tag = df_section.find_next('h3', string='Meaning:')
-            if meaning_tag:
-                devil_fruit_data['meaning'] = meaning_tag.find_next_sibling(
-                    'div').get_text(strip=True)
-
-            type_tag = df_section.find_next('h3', string='Type:')
-            if type_tag:
-                devil_fruit_data['type'] = type_tag.find_next_sibling(
-                    'div').get_text(strip=True)
-
         # Fallback
         if not devil_fruit_data.get('english_name'):
-            label_tag = infobox.find(
-                'h3', string=re.compile("Devil Fruit Name"))
-            if label_tag:
-                value_tag = label_tag.find_next_sibling('div')
-                if value_tag:
-                    devil_fruit_data['english_name'] = value_tag.get_text(
-                        strip=True)
+            devil_fruit_data['english_name'] = fields.text("Devil Fruit Name")
 
         if devil_fruit_data.get('english_name'):
             character_data['devil_fruit'] = devil_fruit_data
@@ -257,12 +129,11 @@ def parse_infobox(soup):
     # Parse bounty
     try:
         bounty = None
-        bounty_container = infobox.find('div', attrs={'data-source': 'bounty'})
+        bounty_container = fields.source('bounty')
 
         if bounty_container:
-            full_text = bounty_container.get_text()
-            match = re.search(r'([\d,]+)', full_text)
-
+            # Separate text nodes so the current and former bounties never merge
+            match = re.search(r'([\d,]+)', bounty_container.get_text(" "))
             if match:
                 bounty = match.group(1).replace(',', '')
 
@@ -273,24 +144,15 @@ def parse_infobox(soup):
     # Parse debut information
     try:
         manga_debut, anime_debut = None, None
-        label_tag = infobox.find(
-            'h3', string=lambda text: text and "Debut" in text.strip())
+        debut_text = fields.text("Debut")
 
-        if label_tag:
-            value_tag = label_tag.find_next_sibling('div')
-            if value_tag:
-                for sup in value_tag.find_all('sup'):
-                    sup.decompose()
-
-                debut_text = value_tag.get_text(strip=True)
-                parts = re.split(r'[;,]', debut_text)
-
-                for part in parts:
-                    part = part.strip()
-                    if part.startswith("Chapter"):
-                        manga_debut = part
-                    elif part.startswith("Episode"):
-                        anime_debut = part
+        if debut_text:
+            for part in re.split(r'[;,]', debut_text):
+                part = part.strip()
+                if part.startswith("Chapter"):
+                    manga_debut = part
+                elif part.startswith("Episode"):
+                    anime_debut = part
 
         character_data['manga_debut'] = manga_debut
         character_data['anime_debut'] = anime_debut
@@ -317,18 +179,19 @@ def parse_main_content(soup):
     if not main_content:
         return {'error': 'No main content found'}
 
-    def parse_section(main_content, section_id_pattern):
+    laps = metrics.lap_timer("parse.section_seconds", kind="characters")
+    sections = index_sections(main_content)
+    laps.lap("index_sections")
+
+    def parse_section(section):
         """
         A generic function to parse a specific section from the main content area.
         """
-        section_header = main_content.find('span', id=section_id_pattern)
-        if not section_header:
+        if not section:
             return None
 
         section_texts = []
-        element = section_header.find_parent('h2')
-
-        for sibling in element.find_next_siblings():
+        for sibling in section.nodes:
             if sibling.name == 'h2':
                 break
 
@@ -347,9 +210,7 @@ def parse_main_content(soup):
     # Parse general info (content before first h2)
     try:
         general_info_texts = []
-        for element in main_content.find_all(recursive=False):
-            if element.name == 'h2':
-                break
+        for element in sections.lead:
             if element.name in ['p']:
                 for sup in element.find_all('sup'):
                     sup.decompose()
@@ -359,23 +220,28 @@ def parse_main_content(soup):
             general_info_texts) if general_info_texts else None
     except:
         content_data['general_info'] = None
+    laps.lap("general_info")
 
     # Parse specific sections
-    content_data['appearance'] = parse_section(main_content, "Appearance")
-    content_data['personality'] = parse_section(main_content, "Personality")
-    content_data['history'] = parse_section(main_content, "History")
+    content_data['appearance'] = parse_section(sections.get("Appearance"))
+    laps.lap("appearance")
+    content_data['personality'] = parse_section(sections.get("Personality"))
+    laps.lap("personality")
+    content_data['history'] = parse_section(sections.get("History"))
+    laps.lap("history")
     content_data['abilities'] = parse_section(
-        main_content, re.compile(r'^Abilities_and'))
+        sections.find(re.compile(r'^Abilities_and')))
+    laps.lap("abilities")
     content_data['relationships'] = parse_section(
-        main_content, "Relationships")
+        sections.get("Relationships"))
+    laps.lap("relationships")
 
     # Parse trivia
     try:
-        trivia_header = main_content.find('span', id='Trivia')
-        if trivia_header:
+        section = sections.get('Trivia')
+        if section:
             trivia_texts = []
-            element = trivia_header.find_parent('h2')
-            for sibling in element.find_next_siblings():
+            for sibling in section.nodes:
                 if sibling.name == 'h2':
                     break
                 if sibling.name == 'ul':
@@ -389,22 +255,30 @@ def parse_main_content(soup):
             content_data['trivia'] = None
     except:
         content_data['trivia'] = None
+    laps.lap("trivia")
 
     return content_data
 
 
-def parse_character(url):
+@metrics.timed("parse.page_seconds", kind="characters")
+def parse_character(url, html=None, fast=False):
     """
     Orchestrator function to parse complete character information.
 
     Args:
         url (str): URL of the character page
+        html (bytes): Raw page HTML. When given, it is parsed instead of
+            fetching `url`.
+        fast (bool): Parse only the infobox and main content with lxml.
 
     Returns:
         dict: Complete dictionary containing all character information
     """
     # Get the soup object
-    soup = get_page_soup(url)
+    if html is None:
+        soup = get_page_soup(url, fast=fast)
+    else:
+        soup = make_soup(html, fast=fast)
     if not soup:
         return {'url': url, 'error': 'Failed to fetch page'}
 
@@ -412,7 +286,8 @@ def parse_character(url):
     character_data = {'url': url}
 
     # Parse infobox
-    infobox_data = parse_infobox(soup)
+    with metrics.timer("parse.section_seconds", kind="characters", section="infobox"):
+        infobox_data = parse_infobox(soup)
     if 'error' in infobox_data:
         character_data.update(infobox_data)
         return character_data
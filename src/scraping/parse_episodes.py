@@ -1,26 +1,36 @@
 # add necessary imports
 import requests
-from bs4 import BeautifulSoup
 import re
 from dateutil.parser import parse
 
+from src.instrumentation import metrics
+from src.scraping.fetcher import fetch_page
+from src.scraping.sections import index_sections
+from src.scraping.soup import make_soup
 
-def parse_anime(url, headers=None):
+
+@metrics.timed("parse.page_seconds", kind="episodes")
+def parse_anime(url, headers=None, html=None, fast=False):
     """
     Fetches and parses a single anime episode page with robust safeguards.
     Returns a dictionary of episode data, or None if the page fails to load.
     Missing fields within the page will be set to None.
+    If `html` (raw page bytes) is given, it is parsed instead of fetching `url`.
+    `fast=True` parses only the infobox and main content with lxml.
     """
-    try:
-        response = requests.get(url, timeout=10, headers=headers)
-        if response.status_code != 200:
-            # Return None for pages that don't exist (like future episodes)
+    if html is None:
+        try:
+            response = fetch_page(url, headers=headers, timeout=10)
+            if response.status_code != 200:
+                # Return None for pages that don't exist (like future episodes)
+                return None
+        except requests.exceptions.RequestException as e:
+            print(f"An error occurred fetching {url}: {e}")
             return None
-    except requests.exceptions.RequestException as e:
-        print(f"An error occurred fetching {url}: {e}")
-        return None
+        html = response.content
 
-    soup = BeautifulSoup(response.content, 'html.parser')
+    soup = make_soup(html, fast=fast)
+    laps = metrics.lap_timer("parse.section_seconds", kind="episodes")
     episode_data = {'url': url}
 
     # From infobox
@@ -65,17 +75,20 @@ def parse_anime(url, headers=None):
     else:
         episode_data.update({'episode_number': None, 'episode_title': None,
                             'air_date': None, 'source_chapters': None})
+    laps.lap("infobox")
 
     # from Main Content ---
     main_content = soup.find('div', class_='mw-parser-output')
     if main_content:
+        sections = index_sections(main_content)
+        laps.lap("index_sections")
+
         def get_summary_text(summary_id):
             try:
-                heading = main_content.find('span', id=summary_id)
-                if heading:
+                section = sections.get(summary_id)
+                if section:
                     summary_ps = []
-                    parent_heading = heading.find_parent(re.compile(r'h[1-6]'))
-                    for sibling in parent_heading.find_next_siblings():
+                    for sibling in section.nodes:
                         if sibling.name in ['h2', 'h3']:
                             break
                         if sibling.name == 'p':
@@ -86,15 +99,15 @@ def parse_anime(url, headers=None):
                 return None
 
         episode_data['short_summary'] = get_summary_text('Short_Summary')
+        laps.lap("short_summary")
         episode_data['long_summary'] = get_summary_text('Long_Summary')
+        laps.lap("long_summary")
 
         try:
             characters = None
-            heading = main_content.find(
-                'span', id='Characters_in_Order_of_Appearance')
-            if heading:
-                parent_heading = heading.find_parent(re.compile(r'h[1-6]'))
-                next_element = parent_heading.find_next_sibling()
+            section = sections.get('Characters_in_Order_of_Appearance')
+            if section:
+                next_element = section.nodes[0] if section.nodes else None
                 ul_tag = None
                 if next_element:
                     if next_element.name == 'ul':
@@ -106,13 +119,13 @@ def parse_anime(url, headers=None):
             episode_data['characters'] = characters
         except AttributeError:
             episode_data['characters'] = None
+        laps.lap("characters")
 
         try:
             notes = None
-            heading = main_content.find('span', id='Anime_Notes')
-            if heading:
-                ul_tag = heading.find_parent(
-                    re.compile(r'h[1-6]')).find_next_sibling('ul')
+            section = sections.get('Anime_Notes')
+            if section:
+                ul_tag = section.first('ul')
                 if ul_tag:
                     notes_list = [li.get_text(strip=True) for li in ul_tag.find_all(
                         'li', recursive=False)]
@@ -120,13 +133,13 @@ def parse_anime(url, headers=None):
             episode_data['anime_notes'] = notes
         except AttributeError:
             episode_data['anime_notes'] = None
+        laps.lap("anime_notes")
 
         try:
             trivia = None
-            heading = main_content.find('span', id='Trivia')
-            if heading:
-                ul_tag = heading.find_parent(
-                    re.compile(r'h[1-6]')).find_next_sibling('ul')
+            section = sections.get('Trivia')
+            if section:
+                ul_tag = section.first('ul')
                 if ul_tag:
                     for sup in ul_tag.find_all('sup'):
                         sup.decompose()
@@ -136,6 +149,7 @@ def parse_anime(url, headers=None):
             episode_data['trivia'] = trivia
         except AttributeError:
             episode_data['trivia'] = None
+        laps.lap("trivia")
     else:
         episode_data.update({'short_summary': None, 'long_summary': None,
                             'characters': None, 'anime_notes': None, 'trivia': None})
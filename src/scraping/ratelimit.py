@@ -0,0 +1,124 @@
+import random
+import threading
+import time
+from datetime import timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+
+    Args:
+        rate (float): Tokens added per second (sustained requests per second).
+        capacity (int): Maximum burst size.
+    """
+
+    def __init__(self, rate, capacity=1):
+        self.rate = float(rate)
+        self.capacity = max(1, int(capacity))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._blocked_until = 0.0
+        self._lock = threading.Lock()
+
+    def _refill(self, now):
+        elapsed = now - self._updated
+        self._tokens = min(self.capacity, self._tokens + elapsed * self.rate)
+        self._updated = now
+
+    def acquire(self):
+        """
+        Blocks until a token is available, then consumes it.
+        """
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                if now < self._blocked_until:
+                    wait = self._blocked_until - now
+                else:
+                    self._refill(now)
+                    if self._tokens >= 1:
+                        self._tokens -= 1
+                        return
+                    wait = (1 - self._tokens) / self.rate
+            time.sleep(wait)
+
+    def pause(self, seconds):
+        """
+        Stops handing out tokens for `seconds` (e.g. after a 429) and drains
+        the bucket so traffic resumes at the sustained rate, not in a burst.
+        """
+        with self._lock:
+            self._blocked_until = max(self._blocked_until, time.monotonic() + seconds)
+            self._tokens = 0.0
+            self._updated = self._blocked_until
+
+
+class HostRateLimiter:
+    """
+    One token bucket per host, created on first use.
+
+    Args:
+        rate (float): Sustained requests per second allowed per host.
+        burst (int): Requests allowed back-to-back before throttling kicks in.
+    """
+
+    def __init__(self, rate=2.0, burst=4):
+        self.rate = rate
+        self.burst = burst
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def _bucket(self, url):
+        host = urlsplit(url).netloc
+        with self._lock:
+            bucket = self._buckets.get(host)
+            if bucket is None:
+                bucket = TokenBucket(self.rate, self.burst)
+                self._buckets[host] = bucket
+        return bucket
+
+    def acquire(self, url):
+        self._bucket(url).acquire()
+
+    def pause(self, url, seconds):
+        self._bucket(url).pause(seconds)
+
+
+def backoff_delay(attempt, base=1.0, cap=60.0):
+    """
+    Exponential backoff with full jitter.
+
+    Args:
+        attempt (int): Zero-based retry attempt.
+        base (float): Delay ceiling of the first retry in seconds.
+        cap (float): Upper bound for the delay ceiling.
+
+    Returns:
+        float: Seconds to wait before the next attempt.
+    """
+    return random.uniform(0, min(cap, base * (2 ** attempt)))
+
+
+def parse_retry_after(value):
+    """
+    Parses a Retry-After header given either as seconds or as an HTTP date.
+
+    Returns:
+        float: Seconds to wait, or None if the header is missing or malformed.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isascii() and value.isdigit():
+        return float(value)
+    try:
+        retry_at = parsedate_to_datetime(value)
+    except (TypeError, ValueError):
+        return None
+    if retry_at.tzinfo is None:
+        # HTTP dates are always GMT
+        retry_at = retry_at.replace(tzinfo=timezone.utc)
+    return max(0.0, retry_at.timestamp() - time.time())
@@ -0,0 +1,203 @@
+import argparse
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+from src.instrumentation import metrics, profiling
+from src.instrumentation.profiling import SlowestProfiles
+from src.scraping.crawl import TARGETS
+from src.scraping.html_store import DEFAULT_STORE_DIR, HtmlStore
+
+
+CHAPTER_URL = re.compile(r'/wiki/Chapter_\d+$')
+EPISODE_URL = re.compile(r'/wiki/Episode_\d+$')
+
+
+def kind_for_url(url):
+    """
+    Returns the crawl target ('chapters', 'episodes' or 'characters') a URL belongs to.
+    """
+    if CHAPTER_URL.search(url):
+        return 'chapters'
+    if EPISODE_URL.search(url):
+        return 'episodes'
+    return 'characters'
+
+
+def select_urls(store, kind=None):
+    """
+    Returns the stored URLs, optionally restricted to one crawl target.
+    """
+    return [url for url in store.urls() if kind is None or kind_for_url(url) == kind]
+
+
+_NO_PROFILES = SlowestProfiles()
+
+
+def reparse_page(store, url, fast=False, profiles=_NO_PROFILES):
+    """
+    Parses one stored page with the parser for its URL.
+    `fast=True` uses the lxml content-only parse mode; `profiles`
+    (SlowestProfiles) profiles the parse.
+
+    Returns:
+        dict: The parsed record, or None if the page is missing or invalid
+            (including a page the parser fails on, which is logged).
+    """
+    html = store.read(url)
+    if html is None:
+        metrics.count("reparse.pages", outcome='missing')
+        return None
+    parse_fn, is_valid, _ = TARGETS[kind_for_url(url)]
+    try:
+        with profiles.profile(url):
+            data = parse_fn(url, html=html, fast=fast)
+        valid = is_valid(data)
+    except Exception as e:
+        print(f"An error occurred parsing {url}: {e}")
+        valid = False
+    if not valid:
+        metrics.count("reparse.pages", outcome='invalid')
+        return None
+    metrics.count("reparse.pages", outcome='ok')
+    return data
+
+
+def replay(store=None, kind=None, urls=None, fast=False, profiles=_NO_PROFILES):
+    """
+    Re-parses stored pages without any network I/O.
+
+    Args:
+        store (HtmlStore): Raw page store, defaults to `data/raw/html`.
+        kind (str): Restrict to 'chapters', 'episodes' or 'characters'.
+        urls (list): Explicit URLs to replay instead of the whole store.
+        fast (bool): Use the lxml content-only parse mode.
+        profiles (SlowestProfiles): Keeps profiles of the slowest pages.
+
+    Yields:
+        tuple: (url, record) in store order, record being None on failure.
+    """
+    if store is None:
+        store = HtmlStore()
+    for url in urls if urls is not None else select_urls(store, kind):
+        yield url, reparse_page(store, url, fast=fast, profiles=profiles)
+
+
+_worker_store = None
+_worker_fast = False
+
+
+def _init_worker(store_dir, fast):
+    global _worker_store, _worker_fast
+    # drop the series copied from the parent at fork, or they are merged twice
+    metrics.REGISTRY.reset()
+    _worker_store = HtmlStore(store_dir)
+    _worker_fast = fast
+
+
+def _parse_chunk(urls):
+    started = time.perf_counter()
+    results = [reparse_page(_worker_store, url, fast=_worker_fast) for url in urls]
+    elapsed = time.perf_counter() - started
+    # Hand this chunk's metrics to the parent, which merges them.
+    recorded = None
+    if metrics.enabled():
+        recorded = metrics.REGISTRY.snapshot()
+        metrics.REGISTRY.reset()
+    return os.getpid(), elapsed, results, recorded
+
+
+def replay_parallel(store_dir=DEFAULT_STORE_DIR, urls=None, kind=None,
+                    workers=None, chunk_size=32, worker_stats=None, fast=False):
+    """
+    Re-parses stored pages on a process pool, streaming results in input order.
+
+    URLs are split into chunks of `chunk_size` so each task amortizes the
+    inter-process overhead over many pages. Each worker opens its own
+    HtmlStore.
+
+    Args:
+        store_dir (str | Path): Raw HTML store directory.
+        urls (list): URLs to replay, defaults to every stored URL of `kind`.
+        kind (str): Restrict to 'chapters', 'episodes' or 'characters'.
+        workers (int): Worker processes, defaults to the CPU count.
+        chunk_size (int): Pages per work unit.
+        worker_stats (dict): If given, filled with
+            `{pid: {'pages': n, 'seconds': busy_time}}`.
+        fast (bool): Use the lxml content-only parse mode.
+
+    Workers record metrics when they are enabled in the parent (through
+    the environment, see `metrics.start`) and return them with each chunk.
+
+    Yields:
+        tuple: (url, record) in input order, record being None on failure.
+    """
+    if urls is None:
+        urls = select_urls(HtmlStore(store_dir), kind)
+    chunks = [urls[i:i + chunk_size] for i in range(0, len(urls), chunk_size)]
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(str(store_dir), fast)) as executor:
+        for chunk, (pid, elapsed, results, recorded) in zip(chunks, executor.map(_parse_chunk, chunks)):
+            if recorded is not None:
+                metrics.REGISTRY.merge(recorded)
+            if worker_stats is not None:
+                stats = worker_stats.setdefault(pid, {'pages': 0, 'seconds': 0.0})
+                stats['pages'] += len(chunk)
+                stats['seconds'] += elapsed
+            yield from zip(chunk, results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-parse the raw HTML store offline")
+    parser.add_argument("out", help="Output JSONL file")
+    parser.add_argument("--kind", choices=sorted(TARGETS))
+    parser.add_argument("--store", default=str(DEFAULT_STORE_DIR))
+    parser.add_argument("--workers", type=int, default=os.cpu_count(),
+                        help="Worker processes; 1 parses in this process")
+    parser.add_argument("--chunk-size", type=int, default=32)
+    parser.add_argument("--fast", action="store_true",
+                        help="Parse only infobox and main content with lxml")
+    metrics.add_arguments(parser)
+    profiling.add_arguments(parser)
+    args = parser.parse_args()
+    metrics.start(args)
+    profiles = profiling.from_args(args)
+    if profiles.n and args.workers != 1:
+        print("Profiling parses in this process (--workers 1)")
+        args.workers = 1
+
+    worker_stats = {}
+    if args.workers == 1:
+        results = replay(HtmlStore(args.store), kind=args.kind, fast=args.fast, profiles=profiles)
+    else:
+        results = replay_parallel(args.store, kind=args.kind, workers=args.workers,
+                                  chunk_size=args.chunk_size, worker_stats=worker_stats,
+                                  fast=args.fast)
+
+    ok, failed = 0, 0
+    started = time.monotonic()
+    Path(args.out).parent.mkdir(parents=True, exist_ok=True)
+    with open(args.out, "w", encoding="utf-8") as f:
+        for url, data in results:
+            if data is None:
+                failed += 1
+                continue
+            f.write(json.dumps(data, ensure_ascii=False) + "\n")
+            ok += 1
+
+    elapsed = time.monotonic() - started
+    print(f"Re-parsed {ok} pages ({failed} failed) in {elapsed:.1f}s "
+          f"({(ok + failed) / max(elapsed, 1e-9):.1f} pages/s) -> {args.out}")
+    for pid, stats in sorted(worker_stats.items()):
+        rate = stats['pages'] / stats['seconds'] if stats['seconds'] else 0.0
+        print(f"  worker {pid}: {stats['pages']} pages, {rate:.1f} pages/s")
+    metrics.finish(args, command="reparse", kind=args.kind)
+    profiling.finish(profiles, args)
+
+
+if __name__ == "__main__":
+    main()
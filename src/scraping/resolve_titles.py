@@ -0,0 +1,222 @@
+import argparse
+import json
+import os
+import re
+from pathlib import Path
+
+from src.scraping.crawl import BASE_URL, RAW_DATA_PATH
+from src.scraping.fetcher import configure, get_fetcher
+from src.scraping.names import clean_character_name
+from src.scraping.storage import DEFAULT_STORE_ROOT, RecordStore
+
+
+API_URL = "https://onepiece.fandom.com/api.php"
+DEFAULT_CACHE_PATH = RAW_DATA_PATH / "title_cache.json"
+
+# MediaWiki accepts at most 50 titles per query for regular clients.
+MAX_TITLES_PER_QUERY = 50
+# Characters MediaWiki never allows in a title; such names can't be pages.
+ILLEGAL_TITLE_CHARS = re.compile(r'[#<>\[\]|{}]')
+
+
+def collect_character_names(episodes):
+    """
+    Collects the cleaned character names from the episodes' `characters` field.
+
+    Args:
+        episodes (iterable): Episode records.
+
+    Returns:
+        set: Unique non-empty names.
+    """
+    names = set()
+    for episode in episodes:
+        characters = episode.get('characters')
+        if not isinstance(characters, str):
+            continue
+        for name in characters.split("\n"):
+            cleaned_name = clean_character_name(name)
+            if cleaned_name:
+                names.add(cleaned_name)
+    return names
+
+
+def title_to_url(title, base_url=BASE_URL):
+    return f"{base_url}{title.replace(' ', '_')}"
+
+
+class TitleResolver:
+    """
+    Resolves wiki page names to canonical titles through the MediaWiki API.
+
+    Names are sent up to 50 at a time as `action=query&titles=A|B|...&redirects`,
+    so normalization (case, underscores) and redirects are resolved by the
+    wiki itself and aliases collapse onto the page they redirect to. Results,
+    including names with no page, are cached in a JSON file so later runs only
+    query names they have never seen.
+
+    Args:
+        api_url (str): The wiki's `api.php` endpoint.
+        fetcher (Fetcher): HTTP client; the shared fetcher by default, so API
+            calls share its session, rate limiter and retries.
+        cache_path (str | Path): JSON cache of name -> title (null = no page),
+            or None to disable caching.
+        batch_size (int): Titles per query, capped at 50.
+    """
+
+    def __init__(self, api_url=API_URL, fetcher=None, cache_path=DEFAULT_CACHE_PATH,
+                 batch_size=MAX_TITLES_PER_QUERY):
+        self.api_url = api_url
+        self.fetcher = fetcher if fetcher is not None else get_fetcher()
+        self.cache_path = Path(cache_path) if cache_path else None
+        self.batch_size = max(1, min(batch_size, MAX_TITLES_PER_QUERY))
+        self.cache = {}
+        self.stats = {'queries': 0, 'cached': 0, 'resolved': 0, 'missing': 0}
+        if self.cache_path is not None and self.cache_path.exists():
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                self.cache = json.load(f)
+
+    def save(self):
+        """
+        Writes the cache file (atomically).
+        """
+        if self.cache_path is None:
+            return
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = Path(str(self.cache_path) + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.cache, f, ensure_ascii=False, indent=1, sort_keys=True)
+        os.replace(tmp_path, self.cache_path)
+
+    def resolve(self, names, refresh_missing=False):
+        """
+        Resolves names to canonical page titles.
+
+        Args:
+            names (iterable): Page names, e.g. "Luffy" or "monkey_D._Luffy".
+            refresh_missing (bool): Re-query names cached as having no page.
+
+        Returns:
+            dict: name -> canonical title, or None when there is no such page.
+        """
+        results = {}
+        pending = []
+        for name in dict.fromkeys(names):
+            if name in self.cache and not (refresh_missing and self.cache[name] is None):
+                results[name] = self.cache[name]
+                self.stats['cached'] += 1
+            elif not name.strip() or ILLEGAL_TITLE_CHARS.search(name):
+                results[name] = self.cache[name] = None
+                self.stats['missing'] += 1
+            else:
+                pending.append(name)
+
+        for i in range(0, len(pending), self.batch_size):
+            batch = pending[i:i + self.batch_size]
+            resolved = self._query(batch)
+            for name in batch:
+                title = resolved.get(name)
+                results[name] = self.cache[name] = title
+                self.stats['resolved' if title else 'missing'] += 1
+            self.save()
+
+        return results
+
+    def _query(self, names):
+        params = {
+            'action': 'query',
+            'titles': "|".join(names),
+            'redirects': 1,
+            'format': 'json',
+            'formatversion': 2,
+        }
+        response = self.fetcher.get(self.api_url, params=params)
+        response.raise_for_status()
+        self.stats['queries'] += 1
+        query = response.json().get('query', {})
+
+        # name -> normalized title -> (redirect target ...) -> page
+        normalized = {n['from']: n['to'] for n in query.get('normalized', [])}
+        redirects = {r['from']: r['to'] for r in query.get('redirects', [])}
+        existing = {page['title'] for page in query.get('pages', [])
+                    if not page.get('missing') and not page.get('invalid')}
+
+        resolved = {}
+        for name in names:
+            title = normalized.get(name, name)
+            seen = set()
+            while title in redirects and title not in seen:
+                seen.add(title)
+                title = redirects[title]
+            resolved[name] = title if title in existing else None
+        return resolved
+
+
+def resolve_character_urls(names, resolver, base_url=BASE_URL, refresh_missing=False):
+    """
+    Resolves character names to deduplicated canonical page URLs.
+
+    Returns:
+        tuple: (sorted canonical URLs, sorted names without a page,
+            canonical URL -> names that resolved to it)
+    """
+    aliases = {}
+    invalid_names = []
+    for name, title in resolver.resolve(sorted(names), refresh_missing).items():
+        if title is None:
+            invalid_names.append(name)
+        else:
+            aliases.setdefault(title_to_url(title, base_url), []).append(name)
+    return sorted(aliases), sorted(invalid_names), aliases
+
+
+def load_episodes(raw_dir=RAW_DATA_PATH, store_root=DEFAULT_STORE_ROOT):
+    """
+    Loads episode records from the record store, or the legacy JSON file.
+    """
+    store_dir = Path(store_root) / "episodes"
+    if store_dir.exists():
+        with RecordStore(store_dir) as store:
+            return list(store.records())
+    with open(Path(raw_dir) / "one_piece_episodes.json", "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Resolve episode character names to canonical wiki URLs")
+    parser.add_argument("--api-url", default=API_URL)
+    parser.add_argument("--base-url", default=BASE_URL)
+    parser.add_argument("--raw-dir", default=str(RAW_DATA_PATH))
+    parser.add_argument("--store-root", default=str(DEFAULT_STORE_ROOT))
+    parser.add_argument("--cache", default=str(DEFAULT_CACHE_PATH))
+    parser.add_argument("--out", default=str(RAW_DATA_PATH / "one_piece_characters_urls.txt"))
+    parser.add_argument("--batch-size", type=int, default=MAX_TITLES_PER_QUERY)
+    parser.add_argument("--rate", type=float, default=2.0, help="API requests per second")
+    parser.add_argument("--refresh-missing", action="store_true",
+                        help="Re-query names previously cached as having no page")
+    args = parser.parse_args()
+
+    fetcher = configure(store_dir=None, rate=args.rate, max_retries=5)
+    resolver = TitleResolver(args.api_url, fetcher=fetcher, cache_path=args.cache,
+                             batch_size=args.batch_size)
+
+    names = collect_character_names(load_episodes(args.raw_dir, args.store_root))
+    print(f"Total unique character names: {len(names)}")
+    urls, invalid_names, aliases = resolve_character_urls(
+        names, resolver, args.base_url, refresh_missing=args.refresh_missing)
+
+    with open(args.out, "w", encoding="utf-8") as f:
+        for url in urls:
+            f.write(f"{url}\n")
+    invalid_path = Path(args.out).with_name("one_piece_invalid_character_names.txt")
+    with open(invalid_path, "w", encoding="utf-8") as f:
+        for name in invalid_names:
+            f.write(f"{name}\n")
+
+    merged = sum(len(names) - 1 for names in aliases.values())
+    print(f"{len(urls)} pages ({merged} aliases merged), {len(invalid_names)} names without a page")
+    print(f"API queries: {resolver.stats['queries']}, cached names: {resolver.stats['cached']}")
+
+
+if __name__ == "__main__":
+    main()
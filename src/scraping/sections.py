@@ -0,0 +1,154 @@
+from bs4 import Tag
+
+
+HEADING_LEVELS = {'h1': 1, 'h2': 2, 'h3': 3, 'h4': 4, 'h5': 5, 'h6': 6}
+
+
+class Section:
+    """
+    One heading of the article body and the block nodes that belong to it.
+
+    `nodes` are the sibling tags following the heading up to the next heading
+    of the same or a higher level, so an h2 section also contains its h3
+    subheadings and their content.
+    """
+
+    def __init__(self, section_id, title, level, heading):
+        self.id = section_id
+        self.title = title
+        self.level = level
+        self.heading = heading
+        self.nodes = []
+
+    def first(self, name, class_=None):
+        """
+        Returns the first block node with the given tag name (and class), or None.
+        """
+        for node in self.nodes:
+            if node.name == name and (class_ is None or class_ in node.get('class', [])):
+                return node
+        return None
+
+
+class SectionIndex:
+    """
+    Heading -> block nodes map of `div.mw-parser-output`, built in one pass.
+
+    Walks the direct children of the article body once. Headings are keyed by
+    the id of their `mw-headline` span (or the heading's own id) and by their
+    visible title; the first occurrence wins, as with `find()`.
+
+    Headings nested in wrapper divs (tabbers, collapsible blocks) are not
+    children of the body. The first lookup that misses indexes those too, in
+    one pass over the descendants; their nodes are the heading's own
+    following siblings, as `find_next_siblings()` would give.
+
+    Args:
+        main_content (Tag): The `div.mw-parser-output` element.
+    """
+
+    def __init__(self, main_content):
+        self.lead = []
+        self.sections = {}
+        self._by_title = {}
+        self._main_content = main_content
+        self._nested_indexed = False
+
+        open_sections = []
+        in_lead = True
+        for node in main_content.children:
+            if not isinstance(node, Tag):
+                continue
+
+            level = HEADING_LEVELS.get(node.name)
+            if level is None:
+                for section in open_sections:
+                    section.nodes.append(node)
+                if in_lead:
+                    self.lead.append(node)
+                continue
+
+            in_lead = False
+            while open_sections and open_sections[-1].level >= level:
+                open_sections.pop()
+            for section in open_sections:
+                section.nodes.append(node)
+
+            section = self._make_section(node, level)
+            open_sections.append(section)
+            self._add(section)
+
+    def _add(self, section):
+        if section.id and section.id not in self.sections:
+            self.sections[section.id] = section
+        if section.title and section.title not in self._by_title:
+            self._by_title[section.title] = section
+
+    def _index_nested(self):
+        """
+        Adds the headings below the body's direct children, once.
+        """
+        if self._nested_indexed:
+            return
+        self._nested_indexed = True
+        for heading in self._main_content.find_all(list(HEADING_LEVELS)):
+            if heading.parent is self._main_content:
+                continue
+            level = HEADING_LEVELS[heading.name]
+            section = self._make_section(heading, level)
+            for node in heading.next_siblings:
+                if not isinstance(node, Tag):
+                    continue
+                if HEADING_LEVELS.get(node.name, 7) <= level:
+                    break
+                section.nodes.append(node)
+            self._add(section)
+
+    @staticmethod
+    def _make_section(heading, level):
+        headline = heading.find('span', class_='mw-headline')
+        id_span = headline if headline is not None and headline.get('id') else heading.find('span', id=True)
+        section_id = id_span.get('id') if id_span is not None else heading.get('id')
+        title = (headline or heading).get_text(strip=True)
+        return Section(section_id, title, level, heading)
+
+    def get(self, section_id):
+        """
+        Returns the section with this heading id, or None.
+        """
+        if section_id not in self.sections:
+            self._index_nested()
+        return self.sections.get(section_id)
+
+    def find(self, pattern):
+        """
+        Returns the first section whose id matches a compiled regex, or None.
+        """
+        for nested in (False, True):
+            if nested:
+                self._index_nested()
+            for section_id, section in self.sections.items():
+                if pattern.search(section_id):
+                    return section
+        return None
+
+    def find_title(self, title):
+        """
+        Returns the first section whose visible heading text equals `title`.
+        """
+        if title not in self._by_title:
+            self._index_nested()
+        return self._by_title.get(title)
+
+
+def index_sections(main_content):
+    """
+    Builds the section index of an article body.
+
+    Args:
+        main_content (Tag): The `div.mw-parser-output` element.
+
+    Returns:
+        SectionIndex: Heading -> block nodes map shared by all parsers.
+    """
+    return SectionIndex(main_content)
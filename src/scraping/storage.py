@@ -0,0 +1,278 @@
+import argparse
+import json
+import os
+import re
+from pathlib import Path
+
+
+ROOT = Path(__file__).resolve().parents[2]
+DEFAULT_STORE_ROOT = ROOT / "data" / "raw" / "store"
+
+SNAPSHOT_FILE = "snapshot.jsonl"
+SEGMENT_PATTERN = re.compile(r'^segment-(\d{6})\.jsonl$')
+
+
+class RecordStore:
+    """
+    Append-only JSONL checkpoint store for scraped records.
+
+    Records are appended to numbered segment files; nothing is ever rewritten
+    in place, so a crash can at worst lose the unsynced tail of the current
+    segment. On open, the snapshot and segments are scanned once to build an
+    in-memory index of key -> file offset (and of record numbers), which makes
+    "already scraped?" checks O(1) and resume instant. A later record with the
+    same key supersedes the earlier one; `compact()` folds everything into a
+    deduplicated snapshot.
+
+    Args:
+        root (str | Path): Store directory.
+        key (str): Record field used as the unique key.
+        number_field (str): Optional field indexed for `has_number()`
+            (e.g. 'chapter_number').
+        fsync_every (int): Appends between fsyncs; 1 syncs every record.
+        segment_max_records (int): Appends before rolling to a new segment.
+        max_segments (int): Compact on open when more segments than this exist.
+    """
+
+    def __init__(self, root, key='url', number_field=None, fsync_every=50,
+                 segment_max_records=10000, max_segments=8):
+        self.root = Path(root)
+        self.key = key
+        self.number_field = number_field
+        self.fsync_every = max(1, fsync_every)
+        self.segment_max_records = segment_max_records
+        self.root.mkdir(parents=True, exist_ok=True)
+
+        self._index = {}
+        self._numbers = {}
+        self._file = None
+        self._segment_records = 0
+        self._unsynced = 0
+
+        data_files = self._data_files()
+        for path in data_files:
+            self._load_file(path, newest=path == data_files[-1] and path.name != SNAPSHOT_FILE)
+
+        if len(self._segments()) > max_segments:
+            self.compact()
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, key):
+        return key in self._index
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+    def _segments(self):
+        return sorted(p for p in self.root.iterdir() if SEGMENT_PATTERN.match(p.name))
+
+    def segment_count(self):
+        return len(self._segments())
+
+    def _data_files(self):
+        snapshot = self.root / SNAPSHOT_FILE
+        return ([snapshot] if snapshot.exists() else []) + self._segments()
+
+    def _load_file(self, path, newest=False):
+        """
+        Indexes the records of one data file.
+
+        Only the newest segment is ever written by a crashing process, so an
+        unterminated last line there is a torn append and is truncated away.
+        Any other undecodable line is skipped (and reported) rather than cut,
+        so one bad line never drops the valid records after it.
+        """
+        offset = 0
+        with open(path, "rb") as f:
+            for line in f:
+                if not line.endswith(b"\n") and newest:
+                    print(f"Truncating partial record at {path.name}:{offset}")
+                    f.close()
+                    os.truncate(path, offset)
+                    return
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    print(f"Skipping unreadable record at {path.name}:{offset}")
+                else:
+                    self._index_record(record, path.name, offset)
+                offset += len(line)
+
+    def _index_record(self, record, file_name, offset):
+        key = record.get(self.key)
+        if key is None:
+            return
+        self._index[key] = (file_name, offset)
+        if self.number_field and record.get(self.number_field) is not None:
+            self._numbers[record[self.number_field]] = key
+
+    def has_number(self, number):
+        """
+        Returns True if a record with this `number_field` value is stored.
+        """
+        return number in self._numbers
+
+    def _open_segment(self):
+        segments = self._segments()
+        last = int(SEGMENT_PATTERN.match(segments[-1].name).group(1)) if segments else 0
+        path = self.root / f"segment-{last + 1:06d}.jsonl"
+        self._file = open(path, "ab")
+        self._segment_records = 0
+
+    def append(self, record):
+        """
+        Appends a record, superseding any earlier record with the same key.
+
+        Args:
+            record (dict): Record containing the `key` field.
+        """
+        if record.get(self.key) is None:
+            raise ValueError(f"Record has no '{self.key}' field")
+        if self._file is None or self._segment_records >= self.segment_max_records:
+            self.close()
+            self._open_segment()
+
+        line = (json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8")
+        offset = self._file.tell()
+        self._file.write(line)
+        self._index_record(record, os.path.basename(self._file.name), offset)
+        self._segment_records += 1
+        self._unsynced += 1
+        if self._unsynced >= self.fsync_every:
+            self.flush()
+
+    def flush(self):
+        """
+        Flushes buffered appends and fsyncs them to disk.
+        """
+        if self._file is not None and self._unsynced:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._unsynced = 0
+
+    def close(self):
+        if self._file is not None:
+            self.flush()
+            self._file.close()
+            self._file = None
+
+    def get(self, key):
+        """
+        Returns the latest record stored under `key`, or None.
+        """
+        location = self._index.get(key)
+        if location is None:
+            return None
+        self.flush()
+        file_name, offset = location
+        with open(self.root / file_name, "rb") as f:
+            f.seek(offset)
+            return json.loads(f.readline())
+
+    def records(self):
+        """
+        Yields the latest version of every record, in first-seen key order.
+        """
+        self.flush()
+        by_file = {}
+        for file_name, offset in self._index.values():
+            by_file.setdefault(file_name, set()).add(offset)
+
+        latest = {}
+        for file_name, offsets in by_file.items():
+            with open(self.root / file_name, "rb") as f:
+                for offset in sorted(offsets):
+                    f.seek(offset)
+                    record = json.loads(f.readline())
+                    latest[record[self.key]] = record
+
+        for key in self._index:
+            yield latest[key]
+
+    def compact(self):
+        """
+        Rewrites the store as a single deduplicated snapshot and drops the
+        segments. The snapshot is written to a temporary file and swapped in
+        atomically, so a crash during compaction leaves the store intact.
+        """
+        self.close()
+        snapshot = self.root / SNAPSHOT_FILE
+        tmp_path = self.root / (SNAPSHOT_FILE + ".tmp")
+
+        index = {}
+        with open(tmp_path, "wb") as f:
+            for record in self.records():
+                index[record[self.key]] = f.tell()
+                f.write((json.dumps(record, ensure_ascii=False) + "\n").encode("utf-8"))
+            f.flush()
+            os.fsync(f.fileno())
+
+        segments = self._segments()
+        os.replace(tmp_path, snapshot)
+        for path in segments:
+            path.unlink()
+
+        self._index = {key: (SNAPSHOT_FILE, offset) for key, offset in index.items()}
+
+    def export_json(self, path):
+        """
+        Writes all records as one JSON array (the format the notebooks read).
+        """
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(list(self.records()), f, ensure_ascii=False, indent=4)
+
+
+def open_store(name, number_field=None, root=DEFAULT_STORE_ROOT, **kwargs):
+    """
+    Opens the record store `data/raw/store/<name>`.
+    """
+    return RecordStore(Path(root) / name, number_field=number_field, **kwargs)
+
+
+def import_records(store, path):
+    """
+    Appends records from a legacy JSON array or JSONL file to a store.
+
+    Returns:
+        int: Number of records imported.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        if str(path).endswith(".jsonl"):
+            records = (json.loads(line) for line in f if line.strip())
+        else:
+            records = json.load(f)
+        count = 0
+        for record in records:
+            store.append(record)
+            count += 1
+    store.flush()
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Manage scraped record stores")
+    parser.add_argument("command", choices=["import", "export", "compact", "stats"])
+    parser.add_argument("name", help="Store name, e.g. chapters")
+    parser.add_argument("path", nargs="?", help="Input file for import, output file for export")
+    parser.add_argument("--root", default=str(DEFAULT_STORE_ROOT))
+    args = parser.parse_args()
+
+    with open_store(args.name, root=args.root) as store:
+        if args.command == "import":
+            print(f"Imported {import_records(store, args.path)} records into {args.name}.")
+        elif args.command == "export":
+            store.export_json(args.path)
+            print(f"Exported {len(store)} records to {args.path}.")
+        elif args.command == "compact":
+            store.compact()
+            print(f"Compacted {args.name} to {len(store)} records.")
+        print(f"{args.name}: {len(store)} records, {store.segment_count()} segments.")
+
+
+if __name__ == "__main__":
+    main()
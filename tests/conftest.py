@@ -0,0 +1,52 @@
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pytest
+
+
+class LocalServer:
+    """
+    Scripted HTTP server: `routes` maps a path to a function taking the
+    request (path, query, headers) and returning (status, headers, body).
+    Every request is logged in `requests`.
+    """
+
+    def __init__(self):
+        self.routes = {}
+        self.requests = []
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                parts = urlsplit(self.path)
+                request = {'path': parts.path, 'query': parse_qs(parts.query),
+                           'headers': dict(self.headers)}
+                server.requests.append(request)
+                route = server.routes.get(parts.path)
+                status, headers, body = route(request) if route else (404, {}, b"")
+                self.send_response(status)
+                for name, value in headers.items():
+                    self.send_header(name, value)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        self.httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.url = f"http://127.0.0.1:{self.httpd.server_address[1]}"
+        self.thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+
+    def hits(self, path):
+        return [request for request in self.requests if request['path'] == path]
+
+
+@pytest.fixture
+def http_server():
+    server = LocalServer()
+    server.thread.start()
+    yield server
+    server.httpd.shutdown()
+    server.httpd.server_close()
@@ -0,0 +1,30 @@
+import json
+
+import numpy as np
+import pytest
+
+from src.embeddings.store import EmbeddingStore
+from src.retrieval.ann import build_index, index_paths, save_index
+
+pytest.importorskip("faiss")
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = EmbeddingStore.create(tmp_path / "store", "hashing-16", 16, dtype="float32")
+    chunks = [{'page_content': f"chunk {i}", 'metadata': {'source_type': 'chapter'}}
+              for i in range(400)]
+    store.append(np.random.default_rng(0).normal(size=(400, 16)), chunks)
+    return store
+
+
+@pytest.mark.parametrize("kind, params, factory", [
+    ('ivf_pq', {'nlist': 4, 'pq_m': 2}, "IVF4,PQ2x8"),
+    ('hnsw', {'hnsw_m': 8}, "HNSW8,Flat"),
+])
+def test_saved_factory_records_build_parameters(tmp_path, store, kind, params, factory):
+    index = build_index(store.vectors, kind, **params)
+    save_index(index, tmp_path / "ann", kind, store, **params)
+
+    with open(index_paths(tmp_path / "ann", kind)[1], encoding="utf-8") as f:
+        assert json.load(f)['factory'] == factory
@@ -0,0 +1,56 @@
+import numpy as np
+
+from src.retrieval.answer_cache import AnswerCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def _vector(*values):
+    return np.array(values, dtype=np.float32)
+
+
+def test_expired_best_match_does_not_hide_a_live_one():
+    clock = Clock()
+    cache = AnswerCache(dim=3, ttl=10, threshold=0.9, clock=clock)
+    cache.put("who is the straw hat captain", _vector(1, 0, 0), "old")
+    clock.now = 8
+    cache.put("who captains the straw hats", _vector(1, 0.2, 0), "new")
+    clock.now = 12
+
+    hit = cache.get("straw hat captain?", _vector(1, 0.01, 0))
+
+    assert hit is not None and hit['answer'] == "new"
+    assert cache.stats['expired'] == 1
+    assert (cache.stats['hits'], cache.stats['misses']) == (1, 0)
+
+
+def test_exact_hits_count_only_live_entries():
+    clock = Clock()
+    cache = AnswerCache(dim=3, ttl=10, clock=clock)
+    cache.put("Who is Zoro?", _vector(0, 1, 0), "a swordsman")
+    assert cache.get("who is  zoro?")['answer'] == "a swordsman"
+    clock.now = 20
+
+    assert cache.get("Who is Zoro?") is None
+    assert cache.stats['exact_hits'] == 1
+    assert (cache.stats['hits'], cache.stats['misses'], cache.stats['expired']) == (1, 1, 1)
+
+
+def test_replacing_an_answer_is_not_an_eviction():
+    cache = AnswerCache(dim=3, max_entries=2)
+    cache.put("Who is Nami?", _vector(0, 0, 1), "a navigator")
+    cache.put("who is nami?", _vector(0, 0, 1), "the navigator")
+    assert len(cache) == 1
+    assert cache.stats['evicted'] == 0
+    assert cache.get("Who is Nami?")['answer'] == "the navigator"
+
+    cache.put("Who is Usopp?", _vector(0, 1, 0), "a sniper")
+    cache.put("Who is Sanji?", _vector(1, 0, 0), "a cook")
+    assert cache.stats['evicted'] == 1
+    assert cache.get("Who is Nami?") is None
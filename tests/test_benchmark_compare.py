@@ -0,0 +1,31 @@
+from benchmarks.run import compare, mismatched_settings
+
+
+def test_ratios_and_wall_time_are_not_scored():
+    baseline = {'dedup': {'chunks_per_s': 1000.0, 'unique_fraction': 0.015, 'seconds': 1.0,
+                          'peak_rss_mb': 70.0}}
+    results = {'dedup': {'chunks_per_s': 900.0, 'unique_fraction': 0.38, 'seconds': 9.0,
+                         'peak_rss_mb': 70.0}}
+
+    rows = compare(results, baseline)
+
+    assert [row[1] for row in rows] == ['chunks_per_s', 'peak_rss_mb']
+    assert not any(row[-1] for row in rows)
+
+
+def test_latency_and_memory_regressions():
+    baseline = {'exact_search': {'n10000_p50_ms': 10.0, 'n10000_p99_ms': 0.2, 'peak_rss_mb': 100.0}}
+    results = {'exact_search': {'n10000_p50_ms': 20.0, 'n10000_p99_ms': 0.4, 'peak_rss_mb': 200.0}}
+
+    regressed = {metric: flag for _, metric, _, _, _, flag in compare(results, baseline)}
+
+    # under MIN_DELTA_MS, doubling a sub-millisecond latency is noise
+    assert regressed == {'n10000_p50_ms': True, 'n10000_p99_ms': False, 'peak_rss_mb': True}
+
+
+def test_only_the_stage_settings_matter():
+    baseline = {'copies': 50, 'repeat': 5, 'sizes': [10000]}
+
+    assert mismatched_settings('dedup', dict(baseline, copies=2), baseline) == {'copies': (50, 2)}
+    assert mismatched_settings('parse', dict(baseline, copies=2), baseline) == {}
+    assert mismatched_settings('bm25_search', dict(baseline, sizes=[5]), baseline) == {'sizes': ([10000], [5])}
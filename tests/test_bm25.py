@@ -0,0 +1,46 @@
+import numpy as np
+
+from src.embeddings.store import EmbeddingStore
+from src.retrieval.bm25 import BM25Index, index_meta, index_store, indexed_rows
+
+
+def _store(path, texts):
+    store = EmbeddingStore.create(path, "hashing-8", 8)
+    chunks = [{'page_content': text, 'metadata': {'source_type': 'chapter', 'title': text}}
+              for text in texts]
+    store.append(np.ones((len(texts), 8)), chunks)
+    return store
+
+
+def _saved_index(store, path):
+    index, _ = index_store(store)
+    index.save(path, **index_meta(store))
+    return BM25Index.load(path, mmap=False)
+
+
+def test_grown_store_reuses_the_covered_rows(tmp_path):
+    store = _store(tmp_path / "store", ["luffy punches kaido", "zoro gets lost"])
+    index = _saved_index(store, tmp_path / "bm25")
+    store.append(np.ones((1, 8)), [{'page_content': "usopp lies", 'metadata': {'source_type': 'chapter'}}])
+
+    assert indexed_rows(index.meta, store) == 2
+    extended, added = index_store(store, index)
+    assert added == 1
+    assert extended.search("usopp", 1)[1][0] == 2
+
+
+def test_rebuilt_store_with_other_text_is_not_reused(tmp_path):
+    store = _store(tmp_path / "store", ["luffy punches kaido", "zoro gets lost"])
+    index = _saved_index(store, tmp_path / "bm25")
+    rebuilt = _store(tmp_path / "store", ["usopp lies", "luffy punches kaido"])
+
+    assert len(rebuilt) == len(index)
+    assert indexed_rows(index.meta, rebuilt) == -1
+
+
+def test_index_without_checksum_is_rebuilt(tmp_path):
+    store = _store(tmp_path / "store", ["luffy punches kaido"])
+    index, _ = index_store(store)
+    index.save(tmp_path / "bm25", model=store.model)
+
+    assert indexed_rows(BM25Index.load(tmp_path / "bm25").meta, store) == -1
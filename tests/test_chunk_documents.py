@@ -0,0 +1,39 @@
+import pytest
+
+from src.preprocessing.chunk_documents import chunk_text, count_tokens, get_encoding
+
+
+@pytest.fixture(scope="module", autouse=True)
+def encoding():
+    pytest.importorskip("tiktoken")
+    try:
+        return get_encoding()
+    except Exception as exc:  # the BPE file is downloaded on first use
+        pytest.skip(f"cl100k_base unavailable: {exc}")
+
+
+TEXT = ("# Title: Romance Dawn\n## Chapter Number: 1\n\n## Summary\n"
+        + " ".join(f"Luffy meets Koby{i}, 2024-07-{i % 28:02d}!!  Zoro's 三刀流 ...\n" for i in range(300))
+        + "\n## Characters\n" + "Gomu" * 900)
+
+
+@pytest.mark.parametrize("max_tokens, overlap", [(400, 50), (64, 16), (7, 2)])
+def test_token_counts_are_exact_and_within_budget(max_tokens, overlap):
+    chunks = chunk_text(TEXT, max_tokens, overlap)
+    assert len(chunks) > 1
+    for start, end, tokens, _ in chunks:
+        assert tokens == count_tokens(TEXT[start:end])
+        assert tokens <= max_tokens
+
+
+def test_chunks_cover_the_text():
+    covered = set()
+    for start, end, _, _ in chunk_text(TEXT, 64, 16):
+        covered.update(range(start, end))
+    assert all(i in covered for i, c in enumerate(TEXT) if not c.isspace())
+
+
+def test_sections_are_recorded():
+    sections = [section for _, _, _, section in chunk_text(TEXT)]
+    assert sections[0] == "Title"
+    assert "Summary" in sections and sections[-1] == "Characters"
@@ -0,0 +1,30 @@
+from src.retrieval.context import merge_spans
+
+
+def _chunk(text, start, url="https://example.org/wiki/Luffy"):
+    return {'page_content': text, 'metadata': {'url': url, 'char_start': start,
+                                               'char_end': start + len(text)}}
+
+
+def test_chunks_separated_by_trimmed_whitespace_are_merged():
+    document = "## Summary\nLuffy sets sail.\n\n## History\nHe eats the Gomu Gomu no Mi."
+    split = document.index("## History")
+    first = _chunk(document[:split].rstrip(), 0)
+    second = _chunk(document[split:], split)
+
+    spans = merge_spans([second, first], rows=[7, 3])
+
+    assert len(spans) == 1
+    assert spans[0]['rows'] == [3, 7]
+    assert (spans[0]['char_start'], spans[0]['char_end']) == (0, len(document))
+    assert len(spans[0]['text']) == len(document)
+    assert spans[0]['text'] == document
+
+
+def test_overlapping_chunks_are_joined_once_and_distant_ones_kept_apart():
+    document = "Zoro gets lost. Zoro finds a sword. Zoro gets lost again. " * 4
+    spans = merge_spans([_chunk(document[:40], 0), _chunk(document[30:70], 30),
+                         _chunk(document[150:200], 150)])
+
+    assert [(span['char_start'], span['char_end']) for span in spans] == [(0, 70), (150, 200)]
+    assert spans[0]['text'] == document[:70]
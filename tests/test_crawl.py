@@ -0,0 +1,81 @@
+import asyncio
+import functools
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+from src.scraping import fetcher
+from src.scraping.crawl import build_urls, crawl, crawl_async
+from src.scraping.storage import open_store
+
+PAGES = Path(__file__).resolve().parents[1] / "benchmarks" / "fixtures" / "pages"
+
+
+def test_build_urls(tmp_path):
+    assert build_urls('chapters', 3, 5, base_url="http://wiki/") == [
+        "http://wiki/Chapter_3", "http://wiki/Chapter_4", "http://wiki/Chapter_5"]
+    assert build_urls('episodes', 7, 7) == ["https://onepiece.fandom.com/wiki/Episode_7"]
+
+    urls_file = tmp_path / "urls.txt"
+    urls_file.write_text("http://wiki/Nami\n\n  http://wiki/Zoro  \n")
+    assert build_urls('characters', urls_file=urls_file) == ["http://wiki/Nami", "http://wiki/Zoro"]
+
+
+def test_crawl_async_bounds_concurrency_and_survives_parser_errors():
+    lock = threading.Lock()
+    in_flight = [0, 0]  # current, peak
+    results = {}
+
+    def parse(url):
+        with lock:
+            in_flight[0] += 1
+            in_flight[1] = max(in_flight[1], in_flight[0])
+        time.sleep(0.02)
+        with lock:
+            in_flight[0] -= 1
+        if url.endswith("3"):
+            raise ValueError("no infobox")
+        return {'url': url}
+
+    urls = [f"page{i}" for i in range(10)]
+    asyncio.run(crawl_async(urls, parse, concurrency=3, on_result=results.__setitem__))
+
+    assert sorted(results) == sorted(urls)
+    assert results["page3"] is None
+    assert results["page4"] == {'url': "page4"}
+    assert 1 < in_flight[1] <= 3
+
+
+@pytest.fixture
+def wiki(http_server, tmp_path, monkeypatch):
+    """
+    Serves the fixture chapters under /wiki/ and keeps the crawl's fetcher
+    and HTML store out of the repository.
+    """
+    for name in ("Chapter_1", "Chapter_1044"):
+        body = (PAGES / f"{name}.html").read_bytes()
+        http_server.routes[f"/wiki/{name}"] = lambda request, body=body: (200, {}, body)
+    monkeypatch.setattr(fetcher, "_default_fetcher", None)
+    monkeypatch.setattr(fetcher, "configure",
+                        functools.partial(fetcher.configure, store_dir=tmp_path / "html"))
+    return http_server
+
+
+def test_crawl_stores_valid_pages_and_resumes(wiki, tmp_path):
+    base_url = wiki.url + "/wiki/"
+    urls = [base_url + "Chapter_1", base_url + "Chapter_2", base_url + "Chapter_1044"]
+
+    counts = crawl('chapters', urls, store_root=tmp_path / "store", concurrency=2, rate=100,
+                   max_retries=0)
+
+    assert counts == {'ok': 2, 'failed': 1, 'skipped': 0}
+    with open_store('chapters', number_field='chapter_number', root=tmp_path / "store") as store:
+        assert sorted(record['chapter_number'] for record in store.records()) == [1, 1044]
+
+    again = crawl('chapters', urls, store_root=tmp_path / "store", rate=100, max_retries=0)
+    assert again == {'ok': 0, 'failed': 1, 'skipped': 2}
+    assert len(wiki.hits("/wiki/Chapter_1")) == 1
+    assert len(wiki.hits("/wiki/Chapter_2")) == 2
+
@@ -0,0 +1,63 @@
+import random
+
+import pytest
+
+from src.preprocessing.dedup import dedup_chunks
+
+
+def _text(rng, words=60):
+    return " ".join(rng.choice(["luffy", "zoro", "nami", "usopp", "sanji", "chopper", "robin",
+                                "franky", "brook", "jinbe", "sea", "king", "ship", "island"])
+                    for _ in range(words))
+
+
+def _corpus(seed=0, pages=40):
+    rng = random.Random(seed)
+    boilerplate = [_text(rng) for _ in range(5)]
+    chunks = []
+    for page in range(pages):
+        url = f"https://example.org/wiki/Page_{page}"
+        texts = [_text(rng), rng.choice(boilerplate), _text(rng)]
+        if page % 3 == 0:
+            # a near copy: one word changed
+            texts.append(boilerplate[page % 5].replace("sea", "sky", 1))
+        chunks.extend({'page_content': text, 'metadata': {'url': url, 'token_count': len(text) // 4}}
+                      for text in texts)
+    return chunks
+
+
+def _edit(chunks):
+    rng = random.Random(1)
+    # Page_0 holds the first copy of the boilerplate, i.e. leads its buckets
+    edited = [chunk for chunk in chunks
+              if not chunk['metadata']['url'].endswith(("/Page_0", "/Page_7"))]
+    edited[10] = dict(edited[10], page_content=_text(rng))
+    edited[20] = dict(edited[20], page_content=edited[1]['page_content'])
+    edited.insert(30, {'page_content': edited[4]['page_content'],
+                       'metadata': {'url': "https://example.org/wiki/New", 'token_count': 90}})
+    return edited
+
+
+@pytest.mark.parametrize("threshold", [0.8, 0.5])
+def test_incremental_run_matches_a_full_run(tmp_path, threshold):
+    state = tmp_path / "dedup_state.npz"
+    chunks = _corpus()
+    first, _ = dedup_chunks(chunks, threshold=threshold, state_path=state)
+    assert first == dedup_chunks(chunks, threshold=threshold)[0]
+
+    edited = _edit(chunks)
+    unique, report = dedup_chunks(edited, threshold=threshold, state_path=state)
+    full, full_report = dedup_chunks(edited, threshold=threshold)
+
+    assert report['signatures_reused'] == len(edited) - 3
+    assert unique == full
+    assert dict(report, signatures_reused=0) == full_report
+    assert report['chunks_saved'] > 0
+
+
+def test_changed_parameters_recompute_everything(tmp_path):
+    state = tmp_path / "dedup_state.npz"
+    chunks = _corpus()
+    dedup_chunks(chunks, state_path=state)
+    assert dedup_chunks(chunks, state_path=state)[1]['signatures_reused'] == len(chunks)
+    assert dedup_chunks(chunks, threshold=0.7, state_path=state)[1]['signatures_reused'] == 0
@@ -0,0 +1,90 @@
+import types
+
+import numpy as np
+import pytest
+
+from src.embeddings import embed as embed_module
+from src.embeddings.backends import HashingBackend
+from src.embeddings.cache import EmbeddingCache, text_hash
+from src.embeddings.embed import Embedder, embed_query
+
+
+class FlakyBackend(HashingBackend):
+    """
+    Hashing backend whose first `failures` calls raise.
+    """
+
+    def __init__(self, failures, dim=8):
+        super().__init__(dim)
+        self.failures = failures
+        self.calls = []
+
+    def embed(self, texts):
+        self.calls.append(list(texts))
+        if len(self.calls) <= self.failures:
+            raise ConnectionError("503 Service Unavailable")
+        return super().embed(texts)
+
+
+def _chunks(*texts):
+    return [{'page_content': text, 'metadata': {'token_count': 3}} for text in texts]
+
+
+@pytest.fixture
+def cache(tmp_path):
+    with EmbeddingCache(tmp_path / "cache.sqlite") as cache:
+        yield cache
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    recorded = []
+    monkeypatch.setattr(embed_module, "time", types.SimpleNamespace(sleep=recorded.append))
+    return recorded
+
+
+def test_run_embeds_each_new_text_once_and_reuses_the_cache(cache):
+    backend = HashingBackend(dim=8)
+    texts = ["luffy", "zoro", "luffy", "nami", "zoro"]
+
+    stats = Embedder(backend, cache, batch_size=2).run(_chunks(*texts), progress=False)
+
+    assert stats == {'chunks': 5, 'cached': 0, 'embedded': 3, 'requests': 2, 'retries': 0}
+    assert cache.count(backend.name) == 3
+    vectors = cache.get_many(backend.name, [text_hash("nami")])
+    np.testing.assert_allclose(vectors[text_hash("nami")], backend.embed(["nami"])[0], rtol=1e-6)
+
+    again = Embedder(backend, cache, batch_size=2).run(_chunks("luffy", "usopp", "zoro"),
+                                                         progress=False)
+    assert again == {'chunks': 3, 'cached': 2, 'embedded': 1, 'requests': 1, 'retries': 0}
+
+
+def test_failed_batches_are_retried_with_backoff(cache, sleeps):
+    backend = FlakyBackend(failures=2)
+
+    stats = Embedder(backend, cache, max_retries=3).run(_chunks("luffy", "zoro"), progress=False)
+
+    assert (stats['embedded'], stats['requests'], stats['retries']) == (2, 1, 2)
+    assert backend.calls == [["luffy", "zoro"]] * 3
+    assert len(sleeps) == 2 and 0 <= sleeps[0] <= 1 and 0 <= sleeps[1] <= 2
+
+
+def test_gives_up_after_max_retries(cache, sleeps):
+    backend = FlakyBackend(failures=10)
+
+    with pytest.raises(ConnectionError):
+        Embedder(backend, cache, max_retries=1).run(_chunks("luffy"), progress=False)
+    assert len(backend.calls) == 2
+    assert cache.count(backend.name) == 0
+
+
+def test_queries_are_not_written_to_the_chunk_cache(cache):
+    backend = HashingBackend(dim=8)
+    Embedder(backend, cache).run(_chunks("luffy"), progress=False)
+
+    vector = embed_query("who is luffy's first mate?", backend, cache)
+
+    np.testing.assert_allclose(vector, backend.embed(["who is luffy's first mate?"])[0])
+    assert cache.count(backend.name) == 1
+    np.testing.assert_array_equal(embed_query("luffy", FlakyBackend(failures=10), cache),
+                                  cache.get_many(backend.name, [text_hash("luffy")])[text_hash("luffy")])
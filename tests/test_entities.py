@@ -0,0 +1,38 @@
+import sqlite3
+
+import pytest
+
+from src.retrieval.entities import SCHEMA, EntityIndex, _Builder
+
+
+@pytest.fixture
+def index(tmp_path):
+    path = tmp_path / "entities.sqlite"
+    conn = sqlite3.connect(str(path))
+    conn.executescript(SCHEMA)
+    builder = _Builder(conn)
+    for name, fruit in [("Monkey D. Luffy", "Gomu Gomu no Mi"), ("Higuma", None),
+                        ("Roronoa Zoro", None), ("Mr. 100%_Fake", "Bara_Bara no Mi")]:
+        builder.add_character({'name': name, 'url': f"https://example.org/wiki/{name}",
+                               'devil_fruit': {'english_name': fruit} if fruit else None})
+    builder.flush()
+    conn.commit()
+    conn.close()
+    with EntityIndex(path) as index:
+        yield index
+
+
+def test_partial_names_match_whole_words(index):
+    assert index.character("Luffy")['name'] == "Monkey D. Luffy"
+    assert index.character("zoro")['name'] == "Roronoa Zoro"
+    assert index.character("a") is None
+    assert index.character("D") is None
+    assert index.character("Lu") is None
+    assert index.character("uffy") is None
+
+
+def test_like_wildcards_are_literal(index):
+    assert index.character("100%_fake")['name'] == "Mr. 100%_Fake"
+    assert index.character("1_0") is None
+    assert [row[0] for row in index.fruit_users("Bara_Bara")] == ["Mr. 100%_Fake"]
+    assert index.fruit_users("%") == []
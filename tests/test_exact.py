@@ -0,0 +1,110 @@
+import numpy as np
+import pytest
+
+from src.retrieval.exact import ExactSearch
+
+
+SOURCE_TYPES = ['chapter', 'episode', 'character']
+
+
+@pytest.fixture
+def data():
+    rng = np.random.default_rng(0)
+    vectors = rng.standard_normal((500, 16)).astype(np.float32)
+    vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+    source_type = rng.integers(0, 3, size=500)
+    number = np.where(source_type == 2, -1, rng.integers(1, 1100, size=500))
+    queries = rng.standard_normal((4, 16)).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+    return vectors, source_type, number, queries
+
+
+def _brute_force(vectors, queries, k, mask=None):
+    scores = queries @ vectors.T
+    if mask is not None:
+        scores[:, ~mask] = -np.inf
+    order = np.argsort(-scores, axis=1, kind='stable')[:, :k]
+    return np.take_along_axis(scores, order, axis=1), order
+
+
+@pytest.mark.parametrize("block_rows", [500, 64, 7])
+def test_matches_brute_force(data, block_rows):
+    vectors, source_type, number, queries = data
+    engine = ExactSearch(vectors, source_type, number, SOURCE_TYPES, block_rows=block_rows)
+
+    scores, indices = engine.search(queries, k=10)
+
+    expected_scores, expected_indices = _brute_force(vectors, queries, 10)
+    np.testing.assert_array_equal(indices, expected_indices)
+    np.testing.assert_allclose(scores, expected_scores, rtol=1e-5)
+
+
+def test_float16_vectors_and_single_query(data):
+    vectors, source_type, number, queries = data
+    engine = ExactSearch(vectors.astype(np.float16), source_type, number, SOURCE_TYPES,
+                         block_rows=64)
+
+    _, indices = engine.search(queries[0] * 3, k=5)
+
+    _, expected = _brute_force(vectors.astype(np.float16).astype(np.float32), queries[:1], 5)
+    np.testing.assert_array_equal(indices, expected)
+
+
+@pytest.mark.parametrize("source_types, number_range", [
+    (['character'], None),                      # selective: gathers the rows
+    (['chapter', 'episode'], None),             # broad: masks the scores
+    (None, (100, 400)),
+    (None, (None, 50)),
+    (['episode'], (500, None)),
+])
+def test_prefilters(data, source_types, number_range):
+    vectors, source_type, number, queries = data
+    engine = ExactSearch(vectors, source_type, number, SOURCE_TYPES, block_rows=64)
+    mask = np.ones(len(vectors), dtype=bool)
+    if source_types:
+        mask &= np.isin(source_type, [SOURCE_TYPES.index(t) for t in source_types])
+    if number_range:
+        low, high = number_range
+        mask &= (number >= 0) & (number >= (low or 0)) & (number <= (high or np.inf))
+
+    scores, indices = engine.search(queries, k=10, source_types=source_types,
+                                    number_range=number_range)
+
+    assert mask[indices].all()
+    _, expected = _brute_force(vectors, queries, 10, mask)
+    np.testing.assert_array_equal(indices, expected)
+
+
+@pytest.mark.parametrize("source_types, number_range, matching", [
+    (['character'], (1, 10), 0),                # numbered ranges exclude characters
+    (['chapter'], None, None),                  # gathered rows, fewer than k
+    (['chapter', 'episode'], None, None),       # masked scores over a small store
+    (['manga'], None, 0),                       # unknown source type
+])
+def test_pads_when_fewer_than_k_rows_match(data, source_types, number_range, matching):
+    vectors, source_type, number, queries = data
+    vectors, source_type, number = vectors[:12], source_type[:12], number[:12]
+    engine = ExactSearch(vectors, source_type, number, SOURCE_TYPES, block_rows=5)
+    mask = engine.mask(source_types, number_range)
+    if matching is None:
+        matching = int(mask.sum())
+    assert matching < 10
+
+    scores, indices = engine.search(queries, k=10, source_types=source_types,
+                                    number_range=number_range)
+
+    assert scores.shape == indices.shape == (4, 10)
+    assert (indices[:, matching:] == -1).all()
+    assert np.isneginf(scores[:, matching:]).all()
+    assert (indices[:, :matching] >= 0).all() and np.isfinite(scores[:, :matching]).all()
+    assert mask[indices[:, :matching]].all()
+
+
+def test_k_larger_than_store(data):
+    vectors, source_type, number, queries = data
+    engine = ExactSearch(vectors[:3], source_type[:3], number[:3], SOURCE_TYPES)
+
+    scores, indices = engine.search(queries, k=5)
+
+    assert (np.sort(indices[:, :3], axis=1) == [0, 1, 2]).all()
+    assert (indices[:, 3:] == -1).all() and np.isneginf(scores[:, 3:]).all()
@@ -0,0 +1,111 @@
+import types
+
+import pytest
+import requests
+
+from src.scraping import fetcher as fetcher_module
+from src.scraping.fetcher import Fetcher
+from src.scraping.html_store import HtmlStore
+
+
+@pytest.fixture
+def sleeps(monkeypatch):
+    """
+    Records the fetcher's sleeps instead of waiting.
+    """
+    recorded = []
+    monkeypatch.setattr(fetcher_module, "time", types.SimpleNamespace(sleep=recorded.append))
+    return recorded
+
+
+def _sequence(*responses):
+    remaining = list(responses)
+    return lambda request: remaining.pop(0) if len(remaining) > 1 else remaining[0]
+
+
+def test_stored_page_is_revalidated_with_a_conditional_get(http_server, tmp_path):
+    def page(request):
+        if request['headers'].get('If-None-Match') == '"v1"':
+            return 304, {'ETag': '"v1"'}, b""
+        return 200, {'ETag': '"v1"', 'Last-Modified': "Sat, 01 Jun 2024 00:00:00 GMT"}, b"<p>Luffy</p>"
+    http_server.routes['/page'] = page
+    fetcher = Fetcher(store=HtmlStore(tmp_path))
+    url = http_server.url + "/page"
+
+    first = fetcher.fetch(url)
+    second = fetcher.fetch(url)
+
+    assert (first.status_code, first.from_cache) == (200, False)
+    assert (second.status_code, second.from_cache, second.content) == (200, True, b"<p>Luffy</p>")
+    sent = http_server.hits('/page')[1]['headers']
+    assert sent['If-None-Match'] == '"v1"'
+    assert sent['If-Modified-Since'] == "Sat, 01 Jun 2024 00:00:00 GMT"
+    assert fetcher.stats['not_modified'] == 1
+
+
+def test_304_without_stored_body_refetches_unconditionally(http_server, tmp_path):
+    store = HtmlStore(tmp_path)
+    http_server.routes['/page'] = _sequence((200, {'ETag': '"v1"'}, b"one"), (304, {}, b""),
+                                            (200, {'ETag': '"v1"'}, b"two"))
+    fetcher = Fetcher(store=store)
+    url = http_server.url + "/page"
+    fetcher.fetch(url)
+    store.read = lambda url: None
+
+    page = fetcher.fetch(url)
+
+    assert (page.content, page.from_cache) == (b"two", False)
+    assert 'If-None-Match' not in http_server.hits('/page')[2]['headers']
+
+
+def test_429_waits_for_retry_after(http_server, sleeps):
+    http_server.routes['/api'] = _sequence((429, {'Retry-After': "7"}, b""), (200, {}, b"ok"))
+    fetcher = Fetcher(max_retries=2)
+
+    response = fetcher.get(http_server.url + "/api")
+
+    assert response.status_code == 200
+    assert sleeps == [7.0]
+    assert fetcher.stats['throttled'] == 1 and fetcher.stats['retries'] == 1
+
+
+def test_429_pauses_the_host_instead_of_sleeping(http_server, sleeps):
+    class Limiter:
+        def __init__(self):
+            self.paused = []
+
+        def acquire(self, url):
+            pass
+
+        def pause(self, url, seconds):
+            self.paused.append(seconds)
+
+    http_server.routes['/api'] = _sequence((429, {'Retry-After': "3"}, b""), (200, {}, b"ok"))
+    limiter = Limiter()
+    fetcher = Fetcher(max_retries=1, rate_limiter=limiter)
+
+    assert fetcher.get(http_server.url + "/api").status_code == 200
+    assert limiter.paused == [3.0] and sleeps == []
+
+
+def test_server_errors_back_off_then_give_up(http_server, sleeps, monkeypatch):
+    monkeypatch.setattr(fetcher_module, "backoff_delay", lambda attempt: 0.5 * 2 ** attempt)
+    http_server.routes['/flaky'] = _sequence((503, {}, b""), (502, {}, b""), (200, {}, b"ok"))
+
+    assert Fetcher(max_retries=2).get(http_server.url + "/flaky").status_code == 200
+    assert sleeps == [0.5, 1.0]
+
+    http_server.routes['/down'] = _sequence((500, {}, b""))
+    fetcher = Fetcher(max_retries=1)
+    assert fetcher.get(http_server.url + "/down").status_code == 500
+    assert len(http_server.hits('/down')) == 2
+    assert fetcher.stats['retries'] == 1
+
+
+def test_connection_errors_are_retried_then_raised(sleeps, monkeypatch):
+    monkeypatch.setattr(fetcher_module, "backoff_delay", lambda attempt: 0.0)
+    fetcher = Fetcher(max_retries=2, timeout=1)
+
+    with pytest.raises(requests.exceptions.ConnectionError):
+        fetcher.get("http://127.0.0.1:9/unreachable")
+    assert fetcher.stats['errors'] == 3 and fetcher.stats['retries'] == 2
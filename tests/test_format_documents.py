@@ -0,0 +1,40 @@
+import json
+
+import pytest
+
+from src.preprocessing.format_documents import iter_json_array
+
+
+@pytest.mark.parametrize("buffer_size", [1, 2, 3, 5, 7, 1 << 16])
+def test_elements_split_across_reads(tmp_path, buffer_size):
+    data = [12345, 678, -0.25e10, "Gomu Gomu", {'chapter': 1050, 'arcs': [1, 22]}, True, None, 9]
+    path = tmp_path / "records.json"
+    path.write_text(json.dumps(data, indent=1))
+
+    assert list(iter_json_array(path, buffer_size=buffer_size)) == data
+
+
+@pytest.mark.parametrize("text, expected", [("[12345, 678]", [12345, 678]),
+                                             ("[1.5,2e3 ,-7]", [1.5, 2000.0, -7])])
+def test_number_at_the_end_of_a_read(tmp_path, text, expected):
+    path = tmp_path / "numbers.json"
+    path.write_text(text)
+
+    for buffer_size in range(1, len(text) + 1):
+        assert list(iter_json_array(path, buffer_size=buffer_size)) == expected
+
+
+@pytest.mark.parametrize("text", ["[1, 2", "[12", '{"a": 1}', "[1 2]"])
+def test_malformed_input_raises(tmp_path, text):
+    path = tmp_path / "bad.json"
+    path.write_text(text)
+
+    with pytest.raises(ValueError):
+        list(iter_json_array(path, buffer_size=2))
+
+
+def test_empty_array(tmp_path):
+    path = tmp_path / "empty.json"
+    path.write_text(" [ ] ")
+
+    assert list(iter_json_array(path)) == []
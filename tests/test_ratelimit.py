@@ -0,0 +1,108 @@
+from email.utils import format_datetime
+from datetime import datetime, timezone
+
+import pytest
+
+from src.scraping import ratelimit
+from src.scraping.ratelimit import (
+    HostRateLimiter, TokenBucket, backoff_delay, parse_retry_after,
+)
+
+NOW = datetime(2024, 6, 1, 12, 0, 0, tzinfo=timezone.utc).timestamp()
+
+
+class FakeClock:
+    """
+    Stands in for the `time` module: sleeping advances the clock.
+    """
+
+    def __init__(self):
+        self.now = 100.0
+        self.sleeps = []
+
+    def monotonic(self):
+        return self.now
+
+    def time(self):
+        return NOW + self.now
+
+    def sleep(self, seconds):
+        self.sleeps.append(seconds)
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(ratelimit, "time", clock)
+    return clock
+
+
+def _acquire_times(clock, acquire, count):
+    times = []
+    for _ in range(count):
+        acquire()
+        times.append(clock.now - 100.0)
+    return times
+
+
+def test_bucket_allows_a_burst_then_paces_at_the_rate(clock):
+    bucket = TokenBucket(rate=2, capacity=3)
+    assert _acquire_times(clock, bucket.acquire, 5) == [0, 0, 0, 0.5, 1.0]
+
+    clock.now += 10  # refills, but never beyond the capacity
+    assert _acquire_times(clock, bucket.acquire, 4) == [11, 11, 11, 11.5]
+
+
+def test_pause_blocks_then_resumes_at_the_sustained_rate(clock):
+    bucket = TokenBucket(rate=2, capacity=4)
+    bucket.acquire()
+    bucket.pause(3)
+    bucket.pause(1)  # a shorter pause doesn't cut the longer one
+
+    assert _acquire_times(clock, bucket.acquire, 3) == [3.5, 4.0, 4.5]
+
+
+def test_hosts_are_limited_independently(clock):
+    limiter = HostRateLimiter(rate=1, burst=1)
+    limiter.acquire("https://onepiece.fandom.com/wiki/Chapter_1")
+    limiter.acquire("https://example.org/a")
+    assert clock.sleeps == []
+
+    limiter.pause("https://example.org/b", 30)
+    limiter.acquire("https://onepiece.fandom.com/wiki/Chapter_2")
+    assert clock.now == 101.0
+    limiter.acquire("https://example.org/c")
+    assert clock.now == 131.0
+
+
+def test_backoff_ceiling_doubles_up_to_the_cap(monkeypatch):
+    monkeypatch.setattr(ratelimit.random, "uniform", lambda low, high: (low, high))
+    assert [backoff_delay(attempt)[1] for attempt in range(8)] == [1, 2, 4, 8, 16, 32, 60, 60]
+    assert backoff_delay(2, base=0.5, cap=1.5) == (0, 1.5)
+
+    monkeypatch.undo()
+    assert all(0 <= backoff_delay(3) <= 8 for _ in range(100))
+
+
+@pytest.mark.parametrize("value, seconds", [
+    ("120", 120.0),
+    (" 7 ", 7.0),
+    ("0", 0.0),
+    (None, None),
+    ("", None),
+    ("soon", None),
+    ("-5", None),
+    ("1.5", None),
+    ("٣", None),
+    ("Wed, 32 Oct 2015 07:28:00 GMT", None),
+])
+def test_parse_retry_after_seconds_and_garbage(clock, value, seconds):
+    assert parse_retry_after(value) == seconds
+
+
+def test_parse_retry_after_http_date(clock):
+    later = datetime.fromtimestamp(clock.time() + 90, timezone.utc)
+    assert parse_retry_after(format_datetime(later, usegmt=True)) == pytest.approx(90)
+    assert parse_retry_after(later.strftime("%a, %d %b %Y %H:%M:%S")) == pytest.approx(90)
+    assert parse_retry_after("Sat, 01 Jan 2000 00:00:00 GMT") == 0.0
@@ -0,0 +1,34 @@
+import pytest
+
+from src.scraping import reparse
+from src.scraping.html_store import HtmlStore
+
+URLS = ["https://example.org/wiki/Nami", "https://example.org/wiki/Broken",
+        "https://example.org/wiki/Usopp"]
+
+
+def _parse(url, html=None, fast=False):
+    if "Broken" in url:
+        raise AttributeError("'NoneType' object has no attribute 'find_all'")
+    return {'url': url, 'name': html.decode()}
+
+
+@pytest.fixture
+def store_dir(tmp_path, monkeypatch):
+    monkeypatch.setitem(reparse.TARGETS, 'characters', (_parse, bool, None))
+    store = HtmlStore(tmp_path / "html")
+    for url in URLS:
+        store.put(url, url.rsplit("/", 1)[1].encode())
+    return tmp_path / "html"
+
+
+def test_parser_error_fails_only_its_page(store_dir):
+    results = dict(reparse.replay(HtmlStore(store_dir)))
+    assert results[URLS[1]] is None
+    assert [results[url]['name'] for url in (URLS[0], URLS[2])] == ["Nami", "Usopp"]
+
+
+def test_parser_error_does_not_abort_the_pool(store_dir):
+    results = list(reparse.replay_parallel(store_dir, urls=URLS, workers=1, chunk_size=1))
+    assert [url for url, _ in results] == URLS
+    assert [data is not None for _, data in results] == [True, False, True]
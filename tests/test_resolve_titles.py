@@ -0,0 +1,89 @@
+import json
+
+import pytest
+
+from src.scraping.fetcher import Fetcher
+from src.scraping.resolve_titles import MAX_TITLES_PER_QUERY, TitleResolver, resolve_character_urls
+
+
+PAGES = {"Monkey D. Luffy", "Roronoa Zoro", "Nami"} | {f"Marine {i}" for i in range(60)}
+REDIRECTS = {"Luffy": "Straw Hat", "Straw Hat": "Monkey D. Luffy", "Zoro": "Roronoa Zoro",
+             "Loop A": "Loop B", "Loop B": "Loop A"}
+
+
+def _normalize(title):
+    title = title.replace("_", " ").strip()
+    return title[:1].upper() + title[1:]
+
+
+def api(request):
+    """
+    The subset of MediaWiki's action=query&titles=...&redirects answer the
+    resolver reads (formatversion=2).
+    """
+    titles = request['query']['titles'][0].split("|")
+    if len(titles) > MAX_TITLES_PER_QUERY:
+        return 400, {}, b"too many titles"
+    normalized, redirects, pages = [], [], []
+    for title in titles:
+        target = _normalize(title)
+        if target != title:
+            normalized.append({'from': title, 'to': target})
+        seen = set()
+        while target in REDIRECTS and target not in seen:
+            seen.add(target)
+            redirects.append({'from': target, 'to': REDIRECTS[target]})
+            target = REDIRECTS[target]
+        pages.append({'title': target} if target in PAGES else {'title': target, 'missing': True})
+    body = {'batchcomplete': True,
+            'query': {'normalized': normalized, 'redirects': redirects, 'pages': pages}}
+    return 200, {'Content-Type': "application/json"}, json.dumps(body).encode()
+
+
+@pytest.fixture
+def resolver(http_server, tmp_path):
+    http_server.routes['/api.php'] = api
+    return TitleResolver(http_server.url + "/api.php", fetcher=Fetcher(),
+                         cache_path=tmp_path / "title_cache.json")
+
+
+def test_normalization_and_redirect_chains(resolver):
+    resolved = resolver.resolve(["monkey_D._Luffy", "Luffy", "Zoro", "nami", "Loop A", "Buggy"])
+
+    assert resolved == {"monkey_D._Luffy": "Monkey D. Luffy", "Luffy": "Monkey D. Luffy",
+                        "Zoro": "Roronoa Zoro", "nami": "Nami", "Loop A": None, "Buggy": None}
+
+
+def test_aliases_collapse_onto_one_url(resolver):
+    urls, missing, aliases = resolve_character_urls(["Luffy", "monkey_D._Luffy", "Buggy"], resolver,
+                                                    base_url="https://wiki/")
+
+    assert urls == ["https://wiki/Monkey_D._Luffy"]
+    assert missing == ["Buggy"]
+    assert sorted(aliases["https://wiki/Monkey_D._Luffy"]) == ["Luffy", "monkey_D._Luffy"]
+
+
+def test_batches_stay_within_the_api_limit(resolver, http_server):
+    names = [f"marine_{i}" for i in range(60)] + ["Nami"]
+
+    resolved = resolver.resolve(names)
+
+    assert all(resolved[f"marine_{i}"] == f"Marine {i}" for i in range(60))
+    batches = [len(r['query']['titles'][0].split("|")) for r in http_server.hits('/api.php')]
+    assert batches == [50, 11]
+    assert resolver.stats['queries'] == 2
+
+
+def test_results_and_missing_names_are_cached(resolver, http_server, tmp_path):
+    resolver.resolve(["Luffy", "Buggy", "Bad|Name"])
+    assert len(http_server.hits('/api.php')) == 1
+    assert http_server.hits('/api.php')[0]['query']['titles'] == ["Luffy|Buggy"]
+
+    reopened = TitleResolver(resolver.api_url, fetcher=Fetcher(), cache_path=tmp_path / "title_cache.json")
+    assert reopened.resolve(["Luffy", "Buggy", "Bad|Name"]) == {
+        "Luffy": "Monkey D. Luffy", "Buggy": None, "Bad|Name": None}
+    assert len(http_server.hits('/api.php')) == 1
+    assert reopened.stats['cached'] == 3
+
+    reopened.resolve(["Luffy", "Buggy"], refresh_missing=True)
+    assert http_server.hits('/api.php')[1]['query']['titles'] == ["Buggy"]
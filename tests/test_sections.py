@@ -0,0 +1,56 @@
+import re
+
+import pytest
+from bs4 import BeautifulSoup
+
+from src.scraping.parse_characters import parse_main_content
+from src.scraping.sections import index_sections
+
+
+PAGE = """
+<div class="mw-parser-output">
+  <p>Lead.</p>
+  <h2><span class="mw-headline" id="Appearance">Appearance</span></h2>
+  <p>Straw hat.</p>
+  <div class="tabber">
+    <h2><span class="mw-headline" id="Abilities_and_Powers">Abilities and Powers</span></h2>
+    <p>Rubber body.</p>
+    <h3><span class="mw-headline" id="Haki">Haki</span></h3>
+    <p>All three colors.</p>
+    <h2 id="Trivia">Trivia</h2>
+    <ul><li>Likes meat.<sup>[1]</sup></li></ul>
+  </div>
+  <h2><span class="mw-headline" id="Appearance">Second Appearance</span></h2>
+</div>
+"""
+
+
+@pytest.fixture
+def soup():
+    return BeautifulSoup(PAGE, "html.parser")
+
+
+def test_headings_inside_wrapper_divs_are_found(soup):
+    sections = index_sections(soup.find('div', class_='mw-parser-output'))
+
+    trivia = sections.get('Trivia')
+    assert trivia is not None and [node.name for node in trivia.nodes] == ['ul']
+    abilities = sections.find(re.compile(r'^Abilities_and'))
+    assert [node.get_text() for node in abilities.nodes if node.name == 'p'] == ["Rubber body.", "All three colors."]
+    assert sections.find_title("Haki").level == 3
+    assert sections.get('Long_Summary') is None
+
+
+def test_direct_children_still_win(soup):
+    sections = index_sections(soup.find('div', class_='mw-parser-output'))
+
+    assert sections.get('Appearance').title == "Appearance"
+    assert [node.name for node in sections.get('Appearance').nodes] == ['p', 'div']
+
+
+def test_character_parser_reads_nested_sections(soup):
+    content = parse_main_content(soup)
+
+    assert content['trivia'] == "Likes meat."
+    assert content['abilities'] == "Rubber body. All three colors."
+    assert content['appearance'] == "Straw hat."
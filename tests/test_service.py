@@ -0,0 +1,43 @@
+import asyncio
+
+from src.app.llm import FakeLLM
+from src.retrieval import context
+from src.app.service import RagService
+from src.embeddings.backends import HashingBackend
+from src.embeddings.store import EmbeddingStore
+from src.retrieval.answer_cache import AnswerCache
+
+
+TEXTS = ["Luffy punches Kaido on the roof.", "Zoro gets lost in Wano.", "Usopp lies about giants."]
+
+
+def _events(service, query):
+    async def collect():
+        return [event async for event in service.ask(query)]
+    return asyncio.run(collect())
+
+
+def test_cache_hit_sources_match_the_llm_path(tmp_path, monkeypatch):
+    # count words instead of cl100k tokens, so no encoding download is needed
+    monkeypatch.setattr(context, 'count_tokens', lambda text: len(text.split()))
+    backend = HashingBackend(dim=16)
+    store = EmbeddingStore.create(tmp_path / "store", backend.name, backend.dim)
+    chunks = [{'page_content': text,
+               'metadata': {'source_type': 'chapter', 'title': f"Chapter {i}",
+                            'url': f"https://example.org/wiki/Chapter_{i}",
+                            'char_start': 0, 'char_end': len(text)}}
+              for i, text in enumerate(TEXTS)]
+    store.append(backend.embed(TEXTS), chunks)
+    service = RagService(store, backend, FakeLLM(first_token_delay=0, tokens_per_second=0),
+                         answer_cache=AnswerCache(backend.dim), k=2, workers=1)
+    try:
+        first = _events(service, "Who punches Kaido?")
+        second = _events(service, "Who punches Kaido?")
+    finally:
+        service.close()
+
+    assert [event['source'] for event in (first[-1], second[-1])] == ['llm', 'cache']
+    llm_sources, cached_sources = first[0], second[0]
+    assert llm_sources['type'] == cached_sources['type'] == 'sources'
+    assert cached_sources.keys() == llm_sources.keys()
+    assert cached_sources == llm_sources
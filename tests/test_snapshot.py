@@ -0,0 +1,37 @@
+import numpy as np
+
+from src.app.snapshot import MANIFEST_FILE, build_snapshot, list_versions, open_snapshot, prune
+from src.embeddings.store import EmbeddingStore
+from src.retrieval.bm25 import index_meta, index_store
+
+
+def _store(path, texts, seed=0):
+    store = EmbeddingStore.create(path, "hashing-8", 8)
+    chunks = [{'page_content': text, 'metadata': {'source_type': 'chapter', 'title': text}}
+              for text in texts]
+    store.append(np.random.default_rng(seed).normal(size=(len(texts), 8)), chunks)
+    return store
+
+
+def test_stale_bm25_with_same_row_count_is_rebuilt(tmp_path):
+    store = _store(tmp_path / "store", ["usopp lies", "zoro gets lost"])
+    index, _ = index_store(store)
+    index.save(tmp_path / "bm25", **index_meta(store))
+    _store(tmp_path / "store", ["luffy punches kaido", "zoro gets lost"], seed=1)
+
+    version = build_snapshot(tmp_path / "serving", tmp_path / "store", tmp_path / "bm25",
+                             entities_path=None)
+    snapshot = open_snapshot(tmp_path / "serving")
+    assert snapshot.version == version
+    assert snapshot.bm25.search("luffy kaido", 1)[1][0] == 0
+
+
+def test_builds_in_progress_are_not_versions(tmp_path):
+    root = tmp_path / "serving"
+    for name in ("20240101-000000-aaaaaaaa", "20240102-000000-bbbbbbbb", ".20240103-000000-cccccccc.tmp"):
+        (root / name).mkdir(parents=True)
+        (root / name / MANIFEST_FILE).write_text("{}")
+
+    assert list_versions(root) == ["20240101-000000-aaaaaaaa", "20240102-000000-bbbbbbbb"]
+    assert prune(root, keep=1) == ["20240101-000000-aaaaaaaa"]
+    assert (root / ".20240103-000000-cccccccc.tmp").exists()
@@ -0,0 +1,60 @@
+import json
+
+from src.scraping.storage import RecordStore
+
+
+def _fill(root, count, **kwargs):
+    with RecordStore(root, **kwargs) as store:
+        for i in range(count):
+            store.append({'url': f"u{i}", 'n': i})
+
+
+def test_torn_tail_of_newest_segment_is_truncated(tmp_path):
+    _fill(tmp_path, 3)
+    segment = tmp_path / "segment-000001.jsonl"
+    with open(segment, "ab") as f:
+        f.write(b'{"url": "u3", "n"')
+
+    with RecordStore(tmp_path) as store:
+        assert [r['url'] for r in store.records()] == ["u0", "u1", "u2"]
+        store.append({'url': "u3", 'n': 3})
+    assert segment.read_bytes().endswith(b"}\n")
+    assert len(RecordStore(tmp_path)) == 4
+
+
+def test_corrupt_middle_line_keeps_later_records(tmp_path):
+    _fill(tmp_path, 5)
+    segment = tmp_path / "segment-000001.jsonl"
+    lines = segment.read_bytes().splitlines(keepends=True)
+    lines[1] = b"{not json\n"
+    segment.write_bytes(b"".join(lines))
+    size = segment.stat().st_size
+
+    store = RecordStore(tmp_path)
+    assert [r['url'] for r in store.records()] == ["u0", "u2", "u3", "u4"]
+    assert segment.stat().st_size == size
+
+
+def test_unterminated_line_of_older_file_is_not_cut(tmp_path):
+    _fill(tmp_path, 2)
+    _fill(tmp_path, 1)
+    first = tmp_path / "segment-000001.jsonl"
+    first.write_bytes(first.read_bytes() + b'{"url": "u9"')
+    size = first.stat().st_size
+
+    store = RecordStore(tmp_path)
+    assert "u0" in store and "u1" in store
+    assert first.stat().st_size == size
+
+
+def test_snapshot_is_never_truncated(tmp_path):
+    _fill(tmp_path, 3)
+    RecordStore(tmp_path).compact()
+    snapshot = tmp_path / "snapshot.jsonl"
+    snapshot.write_bytes(snapshot.read_bytes().rstrip(b"\n"))
+    size = snapshot.stat().st_size
+
+    store = RecordStore(tmp_path)
+    assert len(store) == 3
+    assert snapshot.stat().st_size == size
+    assert json.loads(snapshot.read_bytes().splitlines()[-1])['url'] == "u2"
@@ -0,0 +1,35 @@
+import hashlib
+
+import numpy as np
+
+from src.embeddings.store import NPY_HEADER_SIZE, VECTORS_FILE, EmbeddingStore
+
+
+def _chunks(n, start=0):
+    return [{'page_content': f"chunk {i}", 'metadata': {'source_type': 'chapter', 'number': i}}
+            for i in range(start, start + n)]
+
+
+def _file_checksum(path):
+    return hashlib.sha256((path / VECTORS_FILE).read_bytes()[NPY_HEADER_SIZE:]).hexdigest()
+
+
+def test_checksum_covers_every_append_without_rehashing(tmp_path, monkeypatch):
+    rng = np.random.default_rng(0)
+    store = EmbeddingStore.create(tmp_path, "hashing-8", 8)
+    reads = []
+    original = EmbeddingStore._vector_digest
+    monkeypatch.setattr(EmbeddingStore, '_vector_digest',
+                        lambda self: reads.append(len(self)) or original(self))
+    for start in range(0, 12, 4):
+        store.append(rng.normal(size=(4, 8)), _chunks(4, start))
+
+    assert reads == [0]
+    assert store.manifest['checksum'] == _file_checksum(tmp_path)
+
+    reopened = EmbeddingStore(tmp_path)
+    reopened.append(rng.normal(size=(3, 8)), _chunks(3, 12))
+    assert reads == [0, 12]
+    assert len(reopened) == 15
+    assert reopened.manifest['checksum'] == _file_checksum(tmp_path)
+    assert EmbeddingStore(tmp_path).verify()